@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+import six
+
+from .ignore import PathMatcher, walk_filtered
+
+
+log = logging.getLogger(__name__)
+
+
+def _update_stat(digest, path, name):
+    st = os.lstat(path)
+    # repr() keeps the full precision of the timestamps, whereas str() rounds them to 10 ms on Python 2.
+    digest.update('{0}\0{1}\0{2}\0{3!r}\0{4!r}\0{5}\n'.format(name, st.st_mode, st.st_size, st.st_mtime, st.st_ctime,
+                                                           st.st_ino).encode('utf-8'))
+
+
+def _update_path(digest, path, name, matcher):
+    _update_stat(digest, path, name)
+    if os.path.isdir(path) and not os.path.islink(path):
+        for sub_path, rel_path, __, excluded in walk_filtered(path, matcher):
+            if not excluded:
+                _update_stat(digest, sub_path, rel_path)
+
+
+class ContextCache(object):
+    """
+    Stores packed context tarballs of :class:`~dockermap.build.dockerfile.DockerFile` instances in a directory, so that
+    unchanged contexts do not have to be packed again. Tarballs are identified by a digest over the Dockerfile content,
+    the options used for generating the tarball (compression, deterministic mode, and exclusion patterns), and the path,
+    size, modification and change time, and inode of every file and archive added to the Dockerfile. Excluded files are
+    not considered, and excluded directories are not traversed. File contents are not read for this purpose.
+
+    When the total size of the cached tarballs exceeds ``max_size``, the least recently used ones are removed.
+
+    :param cache_dir: Directory to store the tarballs in. It is created if it does not exist.
+    :type cache_dir: unicode
+    :param max_size: Maximum total size of the cache in bytes. Default is 2 GiB.
+    :type max_size: int
+    """
+    def __init__(self, cache_dir, max_size=2 * 1024 ** 3):
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(self, dockerfile, compression='gz', deterministic=False, exclude_patterns=None):
+        """
+        Generates the cache key for a Dockerfile. The Dockerfile is finalized.
+
+        :param dockerfile: Dockerfile object.
+        :type dockerfile: dockermap.build.dockerfile.DockerFile
+        :param compression: Compression of the context tarball.
+        :type compression: unicode
+        :param deterministic: Whether the context tarball is generated in deterministic mode.
+        :type deterministic: bool
+        :param exclude_patterns: Exclusion patterns applied to the context.
+        :type exclude_patterns: list[unicode]
+        :return: Hexadecimal digest.
+        :rtype: unicode
+        """
+        dockerfile.finalize()
+        digest = hashlib.sha1()
+        content = dockerfile.getvalue()
+        if isinstance(content, six.text_type):
+            content = content.encode('utf-8')
+        digest.update(content)
+        digest.update('\0{0}\0{1:d}\n'.format(compression or '', bool(deterministic)).encode('utf-8'))
+        for pattern in exclude_patterns or ():
+            digest.update('{0}\n'.format(pattern).encode('utf-8'))
+        digest.update(b'\0')
+        matcher = PathMatcher(exclude_patterns or ())
+        for path, arcname in dockerfile._files:
+            _update_path(digest, path, arcname, matcher)
+        for archive, __ in dockerfile._archives:
+            _update_stat(digest, archive, archive)
+        return digest.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self._cache_dir, '{0}.tar'.format(key))
+
+    def get(self, key):
+        """
+        Looks up a cached context tarball, and marks it as recently used.
+
+        :param key: Cache key, as generated by :meth:`get_key`.
+        :type key: unicode
+        :return: Path to the tarball, or ``None`` if it is not cached.
+        :rtype: unicode
+        """
+        path = self._get_path(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            log.debug("Context %s not found in cache.", key)
+            return None
+        log.debug("Using cached context %s.", key)
+        return path
+
+    def store(self, key, context):
+        """
+        Stores a finalized context tarball in the cache and removes the least recently used tarballs, if the cache
+        exceeds its maximum size. The file position of the context is reset afterwards.
+
+        :param key: Cache key, as generated by :meth:`get_key`.
+        :type key: unicode
+        :param context: Finalized context object, which has been written to a temporary file.
+        :type context: dockermap.build.context.DockerContext
+        :return: Path to the cached tarball.
+        :rtype: unicode
+        """
+        path = self._get_path(key)
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self._cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                context.fileobj.seek(0)
+                shutil.copyfileobj(context.fileobj, f)
+            os.rename(temp_path, path)
+        except:
+            os.unlink(temp_path)
+            raise
+        finally:
+            context.fileobj.seek(0)
+        self.prune(path)
+        return path
+
+    def prune(self, keep=None):
+        """
+        Removes the least recently used tarballs, until the total size is within the limit.
+
+        :param keep: Path to a tarball that should not be removed.
+        :type keep: unicode
+        """
+        entries = []
+        total_size = 0
+        for filename in os.listdir(self._cache_dir):
+            if not filename.endswith('.tar'):
+                continue
+            path = os.path.join(self._cache_dir, filename)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+            total_size += st.st_size
+        entries.sort()
+        for __, size, path in entries:
+            if total_size <= self._max_size:
+                break
+            if path == keep:
+                continue
+            os.unlink(path)
+            total_size -= size
+            log.debug("Removed context %s from cache.", path)
+
+    @property
+    def cache_dir(self):
+        """
+        Directory of the cached tarballs.
+
+        :return: Directory path.
+        :rtype: unicode
+        """
+        return self._cache_dir
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import multiprocessing
+import struct
+import zlib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+GZIP_HEADER = struct.pack(str('<BBBBIBB'), 0x1f, 0x8b, zlib.DEFLATED, 0, 0, 0, 255)
+
+
+def compress_gzip_member(data, level=6):
+    """
+    Compresses a block of data into a single, complete gzip member. Concatenated members form a valid multi-member gzip
+    stream, which decompresses to the concatenated data.
+
+    :param data: Data to compress.
+    :type data: bytes
+    :param level: Compression level (1-9).
+    :type level: int
+    :return: Gzip member, including header and trailer.
+    :rtype: bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    trailer = struct.pack(str('<II'), zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return b''.join((GZIP_HEADER, body, trailer))
+
+
+class ParallelGzipWriter(object):
+    """
+    Write-only file-like object, that compresses written data in independent blocks on a pool of threads, similar to
+    `pigz`. Compressed blocks are written to ``fileobj`` in their original order, as members of a gzip stream. Since
+    blocks are compressed without a shared dictionary, the result is slightly larger than from a single gzip stream.
+
+    :param fileobj: File-like object to write the compressed stream to. It is not closed by :meth:`close`.
+    :param level: Compression level (1-9). Default is 6.
+    :type level: int
+    :param workers: Number of threads. By default uses the number of CPUs.
+    :type workers: int
+    :param block_size: Size of uncompressed blocks.
+    :type block_size: int
+    """
+    def __init__(self, fileobj, level=None, workers=None, block_size=1024 * 1024):
+        self._fileobj = fileobj
+        self._level = 6 if level is None else level
+        self._block_size = block_size
+        self._buffer = []
+        self._buffered = 0
+        self._position = 0
+        self._members = 0
+        self._pending = deque()
+        self._workers = workers or multiprocessing.cpu_count()
+        self._pool = None
+        self.closed = False
+
+    def _write_member(self, member):
+        self._fileobj.write(member)
+        self._members += 1
+
+    def _submit(self, data):
+        if self._workers == 1:
+            self._write_member(compress_gzip_member(data, self._level))
+            return
+        if self._pool is None:
+            self._pool = ThreadPool(self._workers)
+        self._pending.append(self._pool.apply_async(compress_gzip_member, (data, self._level)))
+        while len(self._pending) > self._workers * 2:
+            self._write_member(self._pending.popleft().get())
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self._position += len(data)
+        if self._buffered >= self._block_size:
+            block = b''.join(self._buffer)
+            for offset in range(0, len(block) - self._block_size + 1, self._block_size):
+                self._submit(block[offset:offset + self._block_size])
+            remainder = len(block) % self._block_size
+            self._buffer = [block[-remainder:]] if remainder else []
+            self._buffered = remainder
+
+    def tell(self):
+        """
+        Returns the position in the uncompressed data.
+
+        :return: Number of bytes written.
+        :rtype: int
+        """
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """
+        Compresses the remaining data and writes all pending blocks. Closes the thread pool.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._buffered or not (self._members or self._pending):
+                self._submit(b''.join(self._buffer))
+                self._buffer = []
+                self._buffered = 0
+            while self._pending:
+                self._write_member(self._pending.popleft().get())
+        finally:
+            self.terminate()
+
+    def terminate(self):
+        """
+        Discards pending blocks and closes the thread pool, without writing any further data.
+        """
+        self.closed = True
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    @property
+    def members(self):
+        """
+        Number of gzip members written.
+
+        :return: Number of compressed blocks.
+        :rtype: int
+        """
+        return self._members
@@ -1,10 +1,182 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
+import gzip
+import io
+import logging
+import mmap
+import os
+import posixpath
+import sys
 import tarfile
+import threading
+import time
+from tempfile import NamedTemporaryFile
+
+import six
+from six.moves import queue
 
 from .buffer import DockerTempFile
+from .compression import ParallelGzipWriter
 from .dockerfile import DockerFile
+from .ignore import PathMatcher, walk_filtered
+
+
+log = logging.getLogger(__name__)
+
+COMPRESSION_MAGIC = (b'\x1f\x8b', b'BZh', b'\xfd7zXZ')
+
+
+class StreamCancelledError(Exception):
+    """
+    Raised in the thread writing a streamed context, when the stream is no longer being read from.
+    """
+    pass
+
+
+class StreamWriter(object):
+    """
+    Write-only file-like object, which passes written data on to a queue in chunks of (at least) ``chunk_size``. Writes
+    block if the queue is full, until the chunks are read from :attr:`queue`.
+
+    :param chunk_size: Minimum size of a chunk.
+    :type chunk_size: int
+    :param queue_size: Maximum number of chunks in the queue.
+    :type queue_size: int
+    """
+    name = None
+
+    def __init__(self, chunk_size, queue_size):
+        self.queue = queue.Queue(queue_size)
+        self.cancelled = False
+        self._chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+
+    def put(self, item):
+        """
+        Puts an item into the queue, waiting until space is available.
+
+        :param item: Item to put into the queue.
+        :raise StreamCancelledError: If the stream has been cancelled while waiting.
+        """
+        while True:
+            if self.cancelled:
+                raise StreamCancelledError("Context stream has been cancelled.")
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffered:
+            chunk = b''.join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            self.put(chunk)
+
+    def close(self):
+        self.cancelled = True
+
+
+def get_stream_encoding(compression):
+    """
+    Returns the content encoding for the Docker Remote API, that corresponds to a compression method of the tarball.
+
+    :param compression: Compression; `gz`, `bz2`, or ``None``.
+    :type compression: unicode
+    :return: Stream encoding; `gzip`, `bzip2`, or ``None``.
+    :rtype: unicode
+    """
+    if compression == 'gz':
+        return 'gzip'
+    elif compression == 'bz2':
+        return 'bzip2'
+    return None
+
+
+def _is_compressed(name):
+    with open(name, 'rb') as f:
+        magic = f.read(6)
+    return magic.startswith(COMPRESSION_MAGIC)
+
+
+def _get_fileno(fileobj):
+    try:
+        return fileobj.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+class FastCopyTarFile(tarfile.TarFile):
+    """
+    Tar file, which copies the contents of regular files into an uncompressed archive file without passing them through
+    Python buffers, if :attr:`fast_copy` is set. It uses :func:`os.sendfile` where available, and otherwise writes from
+    a memory-mapped source file.
+
+    If :attr:`normalize` is set, the modification time of all members is set to :attr:`normalized_mtime`, and their
+    owner to ``root`` (uid and gid ``0``, without user and group names).
+    """
+    fast_copy = False
+    normalize = False
+    normalized_mtime = 0
+
+    def _copy_data(self, fileobj, size):
+        out_file = self.fileobj
+        out_file.flush()
+        offset = fileobj.tell()
+        if hasattr(os, 'sendfile'):
+            out_fd = out_file.fileno()
+            in_fd = fileobj.fileno()
+            sent = 0
+            while sent < size:
+                count = os.sendfile(out_fd, in_fd, offset + sent, size - sent)
+                if not count:
+                    raise IOError("end of file reached")
+                sent += count
+            out_file.seek(os.lseek(out_fd, 0, os.SEEK_CUR))
+        elif offset == 0:
+            src_map = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if len(src_map) < size:
+                    raise IOError("end of file reached")
+                if six.PY2:
+                    out_file.write(buffer(src_map, 0, size))
+                else:
+                    out_file.write(memoryview(src_map)[:size])
+            finally:
+                src_map.close()
+        else:
+            tarfile.copyfileobj(fileobj, out_file, size)
+
+    def addfile(self, tarinfo, fileobj=None):
+        if self.normalize:
+            tarinfo = copy.copy(tarinfo)
+            tarinfo.mtime = self.normalized_mtime
+            tarinfo.uid = tarinfo.gid = 0
+            tarinfo.uname = tarinfo.gname = ''
+        if not (self.fast_copy and fileobj is not None and tarinfo.size and _get_fileno(fileobj) is not None):
+            return super(FastCopyTarFile, self).addfile(tarinfo, fileobj)
+        self._check('aw')
+        tarinfo = copy.copy(tarinfo)
+        buf = tarinfo.tobuf(self.format, self.encoding, self.errors)
+        self.fileobj.write(buf)
+        self.offset += len(buf)
+        self._copy_data(fileobj, tarinfo.size)
+        blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+        if remainder > 0:
+            self.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+            blocks += 1
+        self.offset += blocks * tarfile.BLOCKSIZE
+        self.members.append(tarinfo)
 
 
 class DockerContext(DockerTempFile):
@@ -12,26 +184,76 @@ class DockerContext(DockerTempFile):
     Class for constructing a Docker context tarball, that can be sent to the remote API. If a :class:`~DockerFile`
     instance is added, the resulting Dockerfile and files added there are considered automatically.
 
+    By default, the tarball is written into a temporary file. If ``stream`` is set, files and archives are only
+    recorded; the tarball is generated while iterating over the context object, which yields chunks of at least
+    ``stream_chunk_size`` bytes. Packing and compression run on a separate thread, so that they can overlap with the
+    upload; at most ``stream_queue_size`` chunks are held in memory.
+
     :param dockerfile: Optional :class:`~DockerFile` instance, or file path to a Dockerfile.
     :type dockerfile: DockerFile or unicode
-    :param compression: Compression for the tarball; default is gzip (`gz`); use `bz2` for bzip2.
+    :param compression: Compression for the tarball; default is gzip (`gz`); use `bz2` for bzip2, or ``None`` for an
+     uncompressed tarball. Uncompressed tarballs written to a temporary file copy file contents without Python-level
+     buffers (see :class:`FastCopyTarFile`).
     :type compression: unicode
     :param encoding: Encoding for the tarfile; default is `utf-8`.
     :type encoding: unicode
     :param finalize: Finalize the tarball immediately.
     :type finalize: bool
+    :param stream: Generate the tarball as a stream of chunks, instead of writing it into a temporary file.
+    :type stream: bool
+    :param compression_level: Gzip compression level (1-9).
+    :type compression_level: int
+    :param compression_workers: Number of threads for gzip compression. If this or ``compression_level`` is set, the
+     tarball is compressed in independent blocks of ``compression_block_size``, which form a multi-member gzip stream
+     (see :class:`~dockermap.build.compression.ParallelGzipWriter`). Set to ``0`` for using all CPUs.
+    :type compression_workers: int
+    :param exclude_patterns: Patterns in the format of ``.dockerignore`` (see
+     :class:`~dockermap.build.ignore.PathMatcher`), which are applied to all directories added to the context. They are
+     matched against paths relative to each directory.
+    :type exclude_patterns: list[unicode]
+    :param deterministic: Generate a reproducible tarball: Directories are added in sorted order, modification times
+     and owners of all members are normalized (see :class:`FastCopyTarFile`), and the gzip header does not contain a
+     timestamp or file name. The same files then result in an identical tarball, regardless of checkout time or user.
+    :type deterministic: bool
     :param kwargs: Additional kwargs for :func:`tarfile.open`.
     """
-    def __init__(self, dockerfile=None, compression='gz', encoding='utf-8', finalize=False, **kwargs):
-        super(DockerContext, self).__init__()
-        open_mode = 'w:{0}'.format(compression or '')
-        if compression == 'gz':
-            self._stream_encoding = 'gzip'
-        elif compression == 'bz2':
-            self._stream_encoding = 'bzip2'
+    stream_chunk_size = 1024 * 1024
+    stream_queue_size = 4
+    compression_block_size = 1024 * 1024
+
+    def __init__(self, dockerfile=None, compression='gz', encoding='utf-8', finalize=False, stream=False,
+                 compression_level=None, compression_workers=None, exclude_patterns=None, deterministic=False,
+                 **kwargs):
+        super(DockerContext, self).__init__(stream=stream)
+        self._exclude = PathMatcher(exclude_patterns) if exclude_patterns else None
+        self._exclude_stats = dict(files=0, directories=0, size=0)
+        self._archive_roots = {}
+        self._deterministic = deterministic
+        if compression == 'gz' and (compression_level is not None or compression_workers is not None):
+            self._compression_writer = ParallelGzipWriter(self._fileobj, compression_level, compression_workers,
+                                                          self.compression_block_size)
+            tar_fileobj = self._compression_writer
+            tar_compression = ''
+        elif compression == 'gz' and deterministic:
+            self._compression_writer = gzip.GzipFile(filename='', mode='wb', fileobj=self._fileobj, mtime=0)
+            tar_fileobj = self._compression_writer
+            tar_compression = ''
+        else:
+            self._compression_writer = None
+            tar_fileobj = self._fileobj
+            tar_compression = compression or ''
+        if stream:
+            open_mode = 'w|{0}'.format(tar_compression)
+            self._operations = []
         else:
-            self._stream_encoding = None
-        self.tarfile = tarfile.open(mode=open_mode, fileobj=self._fileobj, encoding=encoding, **kwargs)
+            open_mode = 'w:{0}'.format(tar_compression)
+            self._operations = None
+        self._stream_thread = None
+        self._stream_encoding = get_stream_encoding(compression)
+        self.tarfile = FastCopyTarFile.open(mode=open_mode, fileobj=tar_fileobj, encoding=encoding, **kwargs)
+        self.tarfile.fast_copy = not (stream or tar_compression or self._compression_writer)
+        self.tarfile.normalize = deterministic
+        self._pack_time = 0.0
         if dockerfile is not None:
             self.add_dockerfile(dockerfile)
         if finalize:
@@ -39,37 +261,200 @@ class DockerContext(DockerTempFile):
                 raise ValueError("Cannot finalize the docker context tarball without a dockerfile object.")
             self.finalize()
 
-    def add(self, name, *args, **kwargs):
+    def __iter__(self):
         """
-        Add a file or directory to the context tarball.
+        Generates the tarball in chunks. In streaming mode, this can only be done once.
+
+        :return: Iterator over chunks of the tarball.
+        :rtype: collections.Iterator[bytes]
+        """
+        if self._operations is None:
+            self.finalize()
+            return iter(lambda: self._fileobj.read(self.stream_chunk_size), b'')
+        if self._stream_thread is not None:
+            raise ValueError("The context stream has already been generated.")
+        self.finalize()
+        self._stream_thread = threading.Thread(target=self._write_stream, name='DockerContextStream')
+        self._stream_thread.daemon = True
+        self._stream_thread.start()
+        return self._read_stream()
+
+    def init_fileobj(self, stream=False):
+        if stream:
+            return StreamWriter(self.stream_chunk_size, self.stream_queue_size)
+        return NamedTemporaryFile('wb+')
+
+    def _run(self, func, *args, **kwargs):
+        if self._operations is None:
+            start_time = time.time()
+            func(*args, **kwargs)
+            self._pack_time += time.time() - start_time
+        else:
+            self.check_not_finalized()
+            self._operations.append((func, args, kwargs))
+
+    def _close_tarfile(self):
+        if self.tarfile.closed:
+            return
+        start_time = time.time()
+        self.tarfile.close()
+        if self._compression_writer is not None:
+            self._compression_writer.close()
+        self._pack_time += time.time() - start_time
+        size = self.tarfile.offset
+        log.info("Packed context of %.1f MB in %.2f s (%.1f MB/s).", size / 1048576.0, self._pack_time,
+                 size / 1048576.0 / self._pack_time if self._pack_time else 0.0)
+        stats = self._exclude_stats
+        if stats['files'] or stats['directories']:
+            log.info("Excluded %d files (%.1f MB) and %d directories from the context.", stats['files'],
+                     stats['size'] / 1048576.0, stats['directories'])
+
+    def _write_stream(self):
+        writer = self._fileobj
+        try:
+            start_time = time.time()
+            for func, args, kwargs in self._operations:
+                func(*args, **kwargs)
+            self._operations = []
+            self._pack_time = time.time() - start_time
+            self._close_tarfile()
+            writer.flush()
+            writer.put(None)
+        except StreamCancelledError:
+            pass
+        except Exception:
+            try:
+                writer.put(sys.exc_info())
+            except StreamCancelledError:
+                pass
+
+    def _read_stream(self):
+        writer = self._fileobj
+        try:
+            while True:
+                chunk = writer.queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, tuple):
+                    six.reraise(*chunk)
+                yield chunk
+        finally:
+            writer.cancelled = True
+            self._stream_thread.join()
+
+    def _copy_archive(self, name, roots):
+        # Copies headers and contents of an uncompressed archive without unpacking them. Headers are read while
+        # seeking over member contents; the archive data (up to the end-of-archive marker) is copied in one go.
+        with open(name, 'rb') as f:
+            with tarfile.open(fileobj=f, mode='r:') as st:
+                end_offset = 0
+                while True:
+                    member = st.next()
+                    if member is None:
+                        break
+                    if posixpath.sep not in member.name:
+                        roots.append(member.name)
+                    end_offset = st.offset
+                    del st.members[:]
+            f.seek(0)
+            if self.tarfile.fast_copy:
+                self.tarfile._copy_data(f, end_offset)
+            else:
+                tarfile.copyfileobj(f, self.tarfile.fileobj, end_offset)
+        self.tarfile.offset += end_offset
+
+    def _unpack_archive(self, name, arcname, roots):
+        with tarfile.open(name, 'r|*') as st:
+            while True:
+                member = st.next()
+                if member is None:
+                    break
+                if posixpath.sep not in member.name:
+                    roots.append(member.name)
+                if arcname:
+                    member = copy.copy(member)
+                    member.name = posixpath.join(arcname, member.name)
+                    if member.islnk():
+                        member.linkname = posixpath.join(arcname, member.linkname)
+                self.tarfile.addfile(member, st.extractfile(member) if member.isreg() else None)
+                del st.members[:]
+
+    def _addarchive(self, name, arcname=None):
+        roots = []
+        if arcname or self.tarfile.normalize or _is_compressed(name):
+            self._unpack_archive(name, arcname, roots)
+        else:
+            self._copy_archive(name, roots)
+        self._archive_roots[name] = roots
+
+    def _add_filtered(self, name, arcname, matcher, args, kwargs):
+        add = self.tarfile.add
+        stats = self._exclude_stats
+        if matcher is None:
+            matcher = PathMatcher(())
+        add(name, arcname, False, *args, **kwargs)
+        for path, rel_path, is_dir, excluded in walk_filtered(name, matcher):
+            if not excluded:
+                add(path, posixpath.join(arcname, rel_path), False, *args, **kwargs)
+            elif is_dir:
+                stats['directories'] += 1
+            else:
+                stats['files'] += 1
+                stats['size'] += os.lstat(path).st_size
+
+    def add(self, name, arcname=None, recursive=True, *args, **kwargs):
+        """
+        Add a file or directory to the context tarball. Directories are traversed recursively (unless ``recursive`` is
+        set to ``False``), skipping paths that match the exclusion patterns. Excluded directories are not traversed,
+        unless an exception pattern (starting with ``!``) may apply to a path below them. With exclusion patterns or in
+        deterministic mode, directory contents are added in sorted order.
 
         :param name: File or directory path.
         :type name: unicode
+        :param arcname: Path in the tarball. By default the same as ``name``.
+        :type arcname: unicode
+        :param recursive: Add the contents of directories.
+        :type recursive: bool
         :param args: Additional args for :meth:`tarfile.TarFile.add`.
-        :param kwargs: Additional kwargs for :meth:`tarfile.TarFile.add`.
+        :param kwargs: Additional kwargs for :meth:`tarfile.TarFile.add`. The keyword argument ``exclude_patterns``
+         sets patterns in the format of ``.dockerignore``, relative to the directory ``name``, which override the
+         patterns passed to the constructor.
         """
-        self.tarfile.add(name, *args, **kwargs)
+        exclude_patterns = kwargs.pop('exclude_patterns', None)
+        if exclude_patterns is not None:
+            matcher = PathMatcher(exclude_patterns)
+        else:
+            matcher = self._exclude
+        if (matcher or self._deterministic) and recursive and os.path.isdir(name) and not os.path.islink(name):
+            if arcname is None:
+                arcname = name
+            self._run(self._add_filtered, name, arcname, matcher, args, kwargs)
+        else:
+            self._run(self.tarfile.add, name, arcname, recursive, *args, **kwargs)
 
     def addfile(self, *args, **kwargs):
         """
         Add a file to the tarball using a :class:`~tarfile.TarInfo` object. For details, see
-        :meth:`tarfile.TarFile.addfile`.
+        :meth:`tarfile.TarFile.addfile`. In streaming mode, file objects are read when the tarball is generated.
 
         :param args: Args to :meth:`tarfile.TarFile.addfile`.
         :param kwargs: Kwargs to :meth:`tarfile.TarFile.addfile`
         """
-        self.tarfile.addfile(*args, **kwargs)
+        self._run(self.tarfile.addfile, *args, **kwargs)
 
-    def addarchive(self, name):
+    def addarchive(self, name, arcname=None):
         """
-        Add (i.e. copy) the contents of another tarball to this one.
+        Add (i.e. copy) the contents of another tarball to this one. The archive is read sequentially, once. Members of
+        an uncompressed archive are copied as they are, without repackaging, unless they are placed in a different
+        directory or the context is deterministic. The top-level components are recorded in :attr:`archive_roots`.
 
         :param name: File path to the tar archive.
         :type name: unicode
+        :param arcname: Directory in the tarball to place the archive contents into. By default they are added to the
+         root.
+        :type arcname: unicode
         """
-        with tarfile.open(name, 'r') as st:
-            for member in st.getmembers():
-                self.tarfile.addfile(member, st.extractfile(member.name))
+        self._run(self._addarchive, name, arcname)
 
     def add_dockerfile(self, dockerfile):
         """
@@ -81,15 +466,16 @@ class DockerContext(DockerTempFile):
         """
         if isinstance(dockerfile, DockerFile):
             dockerfile.finalize()
-            dockerfile_obj = dockerfile.fileobj
             for path, arcname in dockerfile._files:
                 self.add(path, arcname=arcname)
-            for archive in dockerfile._archives:
-                self.addarchive(archive)
+            for archive, arcname in dockerfile._archives:
+                self.addarchive(archive, arcname=arcname)
+            dockerfile_content = dockerfile.getvalue()
+            if isinstance(dockerfile_content, six.text_type):
+                dockerfile_content = dockerfile_content.encode('utf-8')
             tarinfo = tarfile.TarInfo('Dockerfile')
-            tarinfo.size = dockerfile_obj.tell()
-            dockerfile_obj.seek(0)
-            self.tarfile.addfile(tarinfo, dockerfile_obj)
+            tarinfo.size = len(dockerfile_content)
+            self.addfile(tarinfo, io.BytesIO(dockerfile_content))
         else:
             self.add(dockerfile, arcname='Dockerfile')
 
@@ -107,10 +493,12 @@ class DockerContext(DockerTempFile):
     def finalize(self):
         """
         Finalizes the context tarball and sets the file position to 0. The tar file is then closed, but the underlying
-        file object can still be read.
+        file object can still be read. In streaming mode, no further files can be added after this.
         """
-        self.tarfile.close()
-        self._fileobj.seek(0)
+        if self._operations is None:
+            self._close_tarfile()
+            self._fileobj.seek(0)
+        self._finalized = True
 
     @property
     def name(self):
@@ -122,6 +510,38 @@ class DockerContext(DockerTempFile):
         """
         return self._fileobj.name
 
+    @property
+    def exclude_stats(self):
+        """
+        Number of files and their total size in bytes, as well as the number of directories that have been excluded
+        from the context. Sizes of excluded directories are not included, since these are not traversed.
+
+        :return: Dictionary with ``files``, ``size``, and ``directories``.
+        :rtype: dict[unicode, int]
+        """
+        return self._exclude_stats
+
+    @property
+    def archive_roots(self):
+        """
+        Top-level files and directories of the archives added to the context, as recorded while copying them. In
+        streaming mode, this is only complete after the tarball has been generated.
+
+        :return: Dictionary of archive paths and lists of their top-level member names.
+        :rtype: dict[unicode, list[unicode]]
+        """
+        return self._archive_roots
+
+    @property
+    def streaming(self):
+        """
+        Whether the context is generated as a stream of chunks, i.e. by iterating over this object.
+
+        :return: ``True`` in streaming mode, ``False`` if the context is written into a temporary file.
+        :rtype: bool
+        """
+        return self._operations is not None
+
     @property
     def stream_encoding(self):
         """
@@ -132,6 +552,14 @@ class DockerContext(DockerTempFile):
         """
         return self._stream_encoding
 
+    def close(self):
+        """
+        Closes the underlying file object, and stops compression threads.
+        """
+        if isinstance(self._compression_writer, ParallelGzipWriter):
+            self._compression_writer.terminate()
+        super(DockerContext, self).close()
+
     def save(self, name):
         """
         Saves the entire Docker context tarball to a separate file.
@@ -140,6 +568,10 @@ class DockerContext(DockerTempFile):
         :type name: unicode
         """
         with open(name, 'wb+') as f:
+            if self._operations is not None:
+                for chunk in self:
+                    f.write(chunk)
+                return
             while True:
                 buf = self._fileobj.read()
                 if not buf:
@@ -94,6 +94,20 @@ def format_expose(expose):
     return six.text_type(expose),
 
 
+def _get_root_names(src_file):
+    names = []
+    with tarfile.open(src_file, 'r') as tf:
+        while True:
+            member = tf.next()
+            if member is None:
+                break
+            if posixpath.sep not in member.name:
+                names.append(member.name)
+            # Unlike getmembers(), do not hold the entire index in memory.
+            del tf.members[:]
+    return names
+
+
 class DockerFile(DockerStringBuffer):
     """
     Class for constructing Dockerfiles; can be saved or used in a :class:`DockerContext`. For :class:`DockerContext`, it
@@ -120,6 +134,7 @@ class DockerFile(DockerStringBuffer):
         self._cmd_user = None
         self._cmd_workdir = None
         self._expose = None
+        self._baseimage = baseimage
 
         if baseimage:
             self.prefix('FROM', baseimage)
@@ -227,32 +242,41 @@ class DockerFile(DockerStringBuffer):
             self._remove_files.add(target_path)
         return context_path
 
-    def add_archive(self, src_file, remove_final=False):
+    def add_archive(self, src_file, remove_final=False, ctx_path=None):
         """
         Adds the contents of another tarfile to the build. It will be repackaged during context generation, and added
         to the root level of the file system. Therefore, it is not required that tar (or compression utilities) is
         present in the base image.
 
+        By default, the top-level components of the archive are added individually. Since the ``ADD`` commands are
+        written immediately, the entire archive (including decompression) is read once for determining these
+        components, and a second time while generating the context. For reading large archives only once, ``ctx_path``
+        is required: The contents are then placed below this directory of the context tarball, and added with a single
+        ``ADD`` command. The archive is only read while generating the context.
+
         :param src_file: Tar archive to add.
         :type src_file: unicode
         :param remove_final: Remove the contents after the build operation has completed. Note that this will remove all
          top-level components of the tar archive recursively. Therefore, you should not use this on standard unix
-         folders.
+         folders. Cannot be combined with ``ctx_path``, since the components are not known in advance.
         :type remove_final: bool
-        :return: Name of the root files / directories added to the Dockerfile.
+        :param ctx_path: Directory in the context tarball to place the archive contents into.
+        :type ctx_path: unicode
+        :return: Name of the root files / directories added to the Dockerfile; an empty list if ``ctx_path`` is set.
         :rtype: list[unicode]
         """
-        def _root_members():
-            with tarfile.open(src_file, 'r') as tf:
-                for member in tf.getmembers():
-                    if posixpath.sep not in member.name:
-                        yield member.name
-
-        member_names = list(_root_members())
+        if ctx_path:
+            if remove_final:
+                raise ValueError("Contents of an archive cannot be removed, if they are added from a context path.")
+            context_path = posixpath.normpath(ctx_path).strip(posixpath.sep)
+            self.prefix('ADD', '{0}/'.format(context_path), '/')
+            self._archives.append((src_file, context_path))
+            return []
+        member_names = _get_root_names(src_file)
         self.prefix_all('ADD', *zip(member_names, member_names))
         if remove_final:
             self._remove_files.update(member_names)
-        self._archives.append(src_file)
+        self._archives.append((src_file, None))
         return member_names
 
     def add_volume(self, path):
@@ -310,6 +334,23 @@ class DockerFile(DockerStringBuffer):
         self.fileobj.write(input_str)
         self.fileobj.write('\n')
 
+    @property
+    def baseimage(self):
+        """
+        Base image of the new image. If it has not been passed to the constructor, it is read from the first ``FROM``
+        command written to the Dockerfile.
+
+        :return: Base image name, or ``None`` if no ``FROM`` command has been written.
+        :rtype: unicode
+        """
+        if self._baseimage:
+            return self._baseimage
+        for line in self.getvalue().splitlines():
+            parts = line.split()
+            if len(parts) > 1 and parts[0].upper() == 'FROM':
+                return parts[1]
+        return None
+
     @property
     def volumes(self):
         """
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import posixpath
+import re
+
+
+def _translate_pattern(pattern):
+    parts = []
+    index = 0
+    length = len(pattern)
+    while index < length:
+        c = pattern[index]
+        index += 1
+        if c == '*':
+            if index < length and pattern[index] == '*':
+                index += 1
+                if index < length and pattern[index] == '/':
+                    # '**/' also matches no directory at all.
+                    index += 1
+                    parts.append('(?:.*/)?')
+                else:
+                    parts.append('.*')
+            else:
+                parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', index + 1 if index < length and pattern[index] in '!^' else index)
+            if end < 0:
+                parts.append(re.escape(c))
+            else:
+                char_class = pattern[index:end].replace('\\', '\\\\')
+                if char_class[:1] in ('!', '^'):
+                    char_class = '^' + char_class[1:]
+                parts.append('[{0}]'.format(char_class))
+                index = end + 1
+        elif c == '\\' and index < length:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
+
+
+def _clean_pattern(pattern):
+    return posixpath.normpath(pattern).lstrip('/')
+
+
+def _get_literal_prefix(pattern):
+    prefix = []
+    for part in pattern.split('/')[:-1]:
+        if any(c in part for c in '*?[\\'):
+            break
+        prefix.append(part)
+    return '/'.join(prefix)
+
+
+def read_ignore_file(path):
+    """
+    Reads exclusion patterns from a file in the format of ``.dockerignore``. Empty lines and lines starting with ``#``
+    are skipped.
+
+    :param path: Path to the file.
+    :type path: unicode
+    :return: List of patterns.
+    :rtype: list[unicode]
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith('#')]
+
+
+class PathMatcher(object):
+    """
+    Matches relative paths against a list of exclusion patterns, following the semantics of ``.dockerignore``:
+
+    * ``*`` and ``?`` match any sequence of characters or a single character, except for the path separator ``/``;
+      ``[...]`` matches character ranges; ``**`` matches any number of directories.
+    * A pattern that matches a directory also matches all paths below it.
+    * Patterns starting with ``!`` define exceptions from previous exclusions. Later patterns take precedence.
+
+    Patterns are compiled once. Without exceptions, all of them are combined into a single regular expression.
+
+    :param patterns: Exclusion patterns.
+    :type patterns: collections.Iterable[unicode]
+    """
+    def __init__(self, patterns):
+        self._patterns = []
+        self._exception_prefixes = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            exception = pattern.startswith('!')
+            if exception:
+                pattern = pattern[1:].strip()
+            pattern = _clean_pattern(pattern)
+            if pattern in ('', '.'):
+                continue
+            self._patterns.append((exception, _translate_pattern(pattern)))
+            if exception:
+                self._exception_prefixes.append(_get_literal_prefix(pattern))
+        if self._exception_prefixes:
+            self._combined = None
+            self._compiled = [(exception, re.compile('{0}(?:/|$)'.format(expr)))
+                              for exception, expr in self._patterns]
+        elif self._patterns:
+            self._combined = re.compile('(?:{0})(?:/|$)'.format('|'.join(expr for __, expr in self._patterns)))
+            self._compiled = None
+        else:
+            self._combined = None
+            self._compiled = []
+
+    def __bool__(self):
+        return bool(self._patterns)
+
+    __nonzero__ = __bool__
+
+    def matches(self, path):
+        """
+        Checks whether a path is excluded.
+
+        :param path: Path relative to the context directory, using ``/`` as separator.
+        :type path: unicode
+        :return: ``True`` if the path is excluded, ``False`` otherwise.
+        :rtype: bool
+        """
+        if self._combined is not None:
+            return self._combined.match(path) is not None
+        matched = False
+        for exception, expr in self._compiled:
+            if exception == matched and expr.match(path):
+                matched = not exception
+        return matched
+
+    def can_prune(self, path):
+        """
+        Checks whether an excluded directory can be skipped entirely, i.e. no exception could include any path below
+        it.
+
+        :param path: Directory path relative to the context directory, using ``/`` as separator.
+        :type path: unicode
+        :return: ``True`` if the directory does not need to be traversed.
+        :rtype: bool
+        """
+        dir_prefix = path + '/'
+        for prefix in self._exception_prefixes:
+            if not prefix or (prefix + '/').startswith(dir_prefix) or dir_prefix.startswith(prefix + '/'):
+                return False
+        return True
+
+
+def walk_filtered(path, matcher):
+    """
+    Walks through a directory in sorted order, skipping excluded directories that do not need to be traversed (see
+    :meth:`PathMatcher.can_prune`). Excluded directories that may contain exceptions are traversed, but not returned.
+
+    :param path: Directory path.
+    :type path: unicode
+    :param matcher: Matcher for exclusion patterns, relative to ``path``.
+    :type matcher: PathMatcher
+    :return: Iterator of tuples with path, relative path (using ``/`` as separator), whether it is a directory, and
+     whether it is excluded.
+    :rtype: collections.Iterable[(unicode, unicode, bool, bool)]
+    """
+    for root, dirs, files in os.walk(path):
+        rel_root = os.path.relpath(root, path).replace(os.sep, '/')
+        if rel_root == '.':
+            rel_prefix = ''
+        else:
+            rel_prefix = rel_root + '/'
+        included_dirs = []
+        for dir_name in sorted(dirs):
+            rel_path = rel_prefix + dir_name
+            if matcher.matches(rel_path):
+                if matcher.can_prune(rel_path):
+                    yield os.path.join(root, dir_name), rel_path, True, True
+                    continue
+            else:
+                yield os.path.join(root, dir_name), rel_path, True, False
+            included_dirs.append(dir_name)
+        dirs[:] = included_dirs
+        for file_name in sorted(files):
+            rel_path = rel_prefix + file_name
+            yield os.path.join(root, file_name), rel_path, False, matcher.matches(rel_path)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import six
+from six.moves import queue
+
+from ..map.config import ClientConfiguration
+
+
+log = logging.getLogger(__name__)
+
+
+def get_image_tag(image):
+    """
+    Appends the ``latest`` tag to an image name, if it does not have a tag.
+
+    :param image: Image name, optionally with registry, repository, and tag.
+    :type image: unicode
+    :return: Image name with tag.
+    :rtype: unicode
+    """
+    name, __, tag = image.rpartition(':')
+    if not name or '/' in tag:
+        return '{0}:latest'.format(image)
+    return image
+
+
+class BuildItem(object):
+    """
+    Image to be built by :class:`BuildPlanner`.
+
+    :param dockerfile: Dockerfile object.
+    :type dockerfile: dockermap.build.dockerfile.DockerFile
+    :param tag: Tag of the new image.
+    :type tag: unicode
+    :param client: Client to build the image on, or configuration for creating clients.
+    :type client: dockermap.map.base.DockerClientWrapper | dockermap.map.config.ClientConfiguration
+    :param kwargs: Keyword arguments for :meth:`~dockermap.map.base.DockerClientWrapper.build_from_file`.
+    :type kwargs: dict
+    """
+    def __init__(self, dockerfile, tag, client, kwargs):
+        self.dockerfile = dockerfile
+        self.tag = tag
+        self.client = client
+        self.kwargs = kwargs
+        self.parent = None
+        self.children = []
+        self.image_id = None
+        self.error = None
+        self.duration = None
+
+
+class BuildReport(object):
+    """
+    Results of :meth:`BuildPlanner.build`.
+
+    :param items: Build items, in the order they have been added.
+    :type items: list[BuildItem]
+    :param wall_time: Total duration of the build in seconds.
+    :type wall_time: float
+    """
+    def __init__(self, items, wall_time):
+        self._items = items
+        self._wall_time = wall_time
+        self._critical_path = None
+
+    def _get_critical_path(self):
+        path_times = {}
+        path_items = {}
+        for item in self._items:
+            chain = []
+            current = item
+            while current is not None:
+                chain.append(current)
+                current = current.parent
+            path_time = sum(c.duration for c in chain if c.duration is not None)
+            path_times[item.tag] = path_time
+            path_items[item.tag] = [c.tag for c in reversed(chain)]
+        if not path_times:
+            return [], 0.0
+        tag = max(path_times, key=path_times.get)
+        return path_items[tag], path_times[tag]
+
+    @property
+    def image_ids(self):
+        """
+        Image ids of the successfully built images.
+
+        :return: Dictionary of tags and image ids.
+        :rtype: dict[unicode, unicode]
+        """
+        return OrderedDict((item.tag, item.image_id) for item in self._items if item.image_id)
+
+    @property
+    def failed(self):
+        """
+        Images that have not been built, either because their build failed or their parent image is missing.
+
+        :return: List of tags.
+        :rtype: list[unicode]
+        """
+        return [item.tag for item in self._items if not item.image_id]
+
+    @property
+    def durations(self):
+        """
+        Duration of each build that has been started.
+
+        :return: Dictionary of tags and durations in seconds.
+        :rtype: dict[unicode, float]
+        """
+        return OrderedDict((item.tag, item.duration) for item in self._items if item.duration is not None)
+
+    @property
+    def wall_time(self):
+        """
+        Total duration of all builds.
+
+        :return: Duration in seconds.
+        :rtype: float
+        """
+        return self._wall_time
+
+    @property
+    def critical_path(self):
+        """
+        Longest chain of dependent builds. The wall-clock time cannot be shorter than the sum of their durations.
+
+        :return: Tags along the critical path, starting with the base image.
+        :rtype: list[unicode]
+        """
+        if self._critical_path is None:
+            self._critical_path = self._get_critical_path()
+        return self._critical_path[0]
+
+    @property
+    def critical_path_time(self):
+        """
+        Sum of the build durations along the :attr:`critical_path`.
+
+        :return: Duration in seconds.
+        :rtype: float
+        """
+        if self._critical_path is None:
+            self._critical_path = self._get_critical_path()
+        return self._critical_path[1]
+
+
+class BuildPlanner(object):
+    """
+    Builds a set of images from :class:`~dockermap.build.dockerfile.DockerFile` objects. Dependencies are derived from
+    the :attr:`~dockermap.build.dockerfile.DockerFile.baseimage` of each Dockerfile: If it refers to another image of
+    the set, that one is built first. Each image is started as soon as its base image has been built.
+
+    Docker clients are not thread-safe. Therefore images on the same client instance are built one at a time; only
+    builds on different clients run concurrently. When a :class:`~dockermap.map.config.ClientConfiguration` is passed
+    instead of a client, each worker thread creates its own client from it, so that up to ``workers`` images are built
+    at the same time on the same Docker host.
+
+    :param client: Default client, or configuration for creating clients, for building images.
+    :type client: dockermap.map.base.DockerClientWrapper | dockermap.map.config.ClientConfiguration
+    :param workers: Maximum number of concurrent builds per client configuration.
+    :type workers: int
+    """
+    poll_interval = 1.0
+
+    def __init__(self, client=None, workers=2):
+        self._client = client
+        self._workers = workers
+        self._items = OrderedDict()
+
+    def add(self, dockerfile, tag, client=None, **kwargs):
+        """
+        Adds an image to the build.
+
+        :param dockerfile: Dockerfile object.
+        :type dockerfile: dockermap.build.dockerfile.DockerFile
+        :param tag: Tag of the new image.
+        :type tag: unicode
+        :param client: Client or client configuration to build the image on, if different from the default.
+        :type client: dockermap.map.base.DockerClientWrapper | dockermap.map.config.ClientConfiguration
+        :param kwargs: Keyword arguments for :meth:`~dockermap.map.base.DockerClientWrapper.build_from_file`.
+        """
+        item_client = client or self._client
+        if item_client is None:
+            raise ValueError("No client has been set for building {0}.".format(tag))
+        image_tag = get_image_tag(tag)
+        if image_tag in self._items:
+            raise ValueError("Image {0} has already been added.".format(image_tag))
+        self._items[image_tag] = BuildItem(dockerfile, tag, item_client, kwargs)
+
+    def get_dependencies(self):
+        """
+        Determines the base image of each image to be built, if it is part of the same set.
+
+        :return: Dictionary of image tags and the tags of their base images, or ``None`` for independent images.
+        :rtype: dict[unicode, unicode]
+        """
+        dependencies = OrderedDict()
+        for image_tag, item in six.iteritems(self._items):
+            baseimage = item.dockerfile.baseimage
+            parent_tag = get_image_tag(baseimage) if baseimage else None
+            dependencies[image_tag] = parent_tag if parent_tag in self._items else None
+        for image_tag in dependencies:
+            visited = set()
+            current = image_tag
+            while current is not None:
+                if current in visited:
+                    raise ValueError("Circular dependency between images, starting at {0}.".format(image_tag))
+                visited.add(current)
+                current = dependencies[current]
+        return dependencies
+
+    def _get_thread_client(self, client, thread_local):
+        if not isinstance(client, ClientConfiguration):
+            return client
+        thread_client = getattr(thread_local, 'client', None)
+        if thread_client is None:
+            thread_client = thread_local.client = client.client_constructor(**client.get_init_kwargs())
+        return thread_client
+
+    def _run_item(self, item, thread_local):
+        start_time = time.time()
+        try:
+            client = self._get_thread_client(item.client, thread_local)
+            image_id = client.build_from_file(item.dockerfile, item.tag, **item.kwargs)
+        except Exception:
+            return item, None, sys.exc_info(), time.time() - start_time
+        return item, image_id, None, time.time() - start_time
+
+    def build(self, raise_on_error=False):
+        """
+        Builds all images. Images whose base image cannot be built are skipped.
+
+        :param raise_on_error: Raise the first exception of a failed build, after all other builds have finished.
+        :type raise_on_error: bool
+        :return: Build report with image ids and timings.
+        :rtype: BuildReport
+        """
+        dependencies = self.get_dependencies()
+        items = list(self._items.values())
+        for item in items:
+            item.parent = None
+            item.children = []
+            item.image_id = item.error = item.duration = None
+        for image_tag, parent_tag in six.iteritems(dependencies):
+            if parent_tag:
+                item = self._items[image_tag]
+                item.parent = self._items[parent_tag]
+                item.parent.children.append(item)
+
+        finished = queue.Queue()
+        pools = {}
+
+        def _start(build_item):
+            client = build_item.client
+            pool_info = pools.get(id(client))
+            if pool_info is None:
+                workers = self._workers if isinstance(client, ClientConfiguration) else 1
+                pool_info = pools[id(client)] = ThreadPool(workers), threading.local()
+            pool, thread_local = pool_info
+            log.debug("Starting build of %s.", build_item.tag)
+            pool.apply_async(self._run_item, (build_item, thread_local), callback=finished.put)
+
+        start_time = time.time()
+        running = 0
+        try:
+            for item in items:
+                if item.parent is None:
+                    _start(item)
+                    running += 1
+            while running:
+                try:
+                    # Waiting with a timeout keeps the main thread responsive to KeyboardInterrupt on Python 2.
+                    item, image_id, exc_info, duration = finished.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+                running -= 1
+                item.duration = duration
+                if image_id:
+                    item.image_id = image_id
+                    log.info("Built %s in %.2f s.", item.tag, duration)
+                    for child in item.children:
+                        _start(child)
+                        running += 1
+                else:
+                    item.error = exc_info
+                    log.error("Build of %s failed after %.2f s.", item.tag, duration)
+        finally:
+            for pool, __ in six.itervalues(pools):
+                pool.terminate()
+        report = BuildReport(items, time.time() - start_time)
+        log.info("Built %d of %d images in %.2f s; the critical path (%s) took %.2f s.", len(report.image_ids),
+                 len(items), report.wall_time, ' -> '.join(report.critical_path), report.critical_path_time)
+        if raise_on_error:
+            for item in items:
+                if item.error:
+                    six.reraise(*item.error)
+        return report
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import threading
 from abc import ABCMeta, abstractmethod
+from multiprocessing.pool import ThreadPool
 
 from six import iteritems, text_type, with_metaclass
 
@@ -49,7 +51,7 @@ class AbstractLazyObject(with_metaclass(ABCMeta, object)):
         return self.get().__iter__()
 
     def __reduce__(self):
-        return self.__class__, self._func, dict(_args=self._args, _kwargs=self._kwargs)
+        return self.__class__, (self._func, ) + tuple(self._args), dict(_kwargs=self._kwargs)
 
     @abstractmethod
     def get(self):
@@ -154,6 +156,72 @@ lazy = SimpleLazyObject
 lazy_once = LazyOnceObject
 
 type_registry = {}
+_type_resolvers = {}
+_local = threading.local()
+
+
+class ResolutionContext(object):
+    """
+    Context manager, during which every lazy value and registered type is only resolved once by
+    :func:`resolve_value` and :func:`resolve_deep` in the current thread. Subsequent resolutions of the same object
+    return the memoized value. Contexts can be nested; an inner context re-uses the memoized values of the outer one.
+    """
+    def __init__(self):
+        self._values = None
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = outer = getattr(_local, 'context', None)
+        self._values = outer.values if outer else {}
+        _local.context = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.context = self._outer
+        self._outer = None
+
+    def get(self, value):
+        """
+        Returns the memoized value of a lazy object or registered type.
+
+        :param value: Lazy object or registered type.
+        :return: Tuple of a boolean indicating whether the value has been memoized, and the memoized value.
+        :rtype: tuple
+        """
+        entry = self._values.get(id(value))
+        if entry is not None and entry[0] is value:
+            return True, entry[1]
+        return False, None
+
+    def set(self, value, resolved_value):
+        """
+        Memoizes the resolved value of a lazy object or registered type.
+
+        :param value: Lazy object or registered type.
+        :param resolved_value: Resolved value.
+        """
+        # The original object is kept, so that its id cannot be re-used during the context.
+        self._values[id(value)] = value, resolved_value
+
+    @property
+    def values(self):
+        """
+        Memoized values.
+
+        :return: Dictionary of object ids with tuples of the original object and its resolved value.
+        :rtype: dict
+        """
+        return self._values
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the active context of the current thread.
+
+        :return: Active context, or ``None`` if there is none.
+        :rtype: ResolutionContext
+        """
+        return getattr(_local, 'context', None)
 
 
 def expand_type_name(type_):
@@ -168,6 +236,29 @@ def expand_type_name(type_):
     return '{0.__module__}.{0.__name__}'.format(type_)
 
 
+def _get_type_resolver(type_):
+    try:
+        return _type_resolvers[type_]
+    except KeyError:
+        resolve_func = _type_resolvers[type_] = type_registry.get(expand_type_name(type_))
+        return resolve_func
+
+
+def _resolve_memoized(value, resolve_func):
+    context = getattr(_local, 'context', None)
+    if context is None:
+        return resolve_func(value)
+    memoized, resolved_value = context.get(value)
+    if not memoized:
+        resolved_value = resolve_func(value)
+        context.set(value, resolved_value)
+    return resolved_value
+
+
+def _get_lazy_value(value):
+    return value.get()
+
+
 def resolve_value(value):
     """
     Returns the actual value for the given object, if it is a late-resolving object type.
@@ -179,11 +270,11 @@ def resolve_value(value):
     :return: Resolved value.
     """
     if isinstance(value, lazy_type):
-        return value.get()
+        return _resolve_memoized(value, _get_lazy_value)
     elif type_registry:
-        resolve_func = type_registry.get(expand_type_name(type(value)))
+        resolve_func = _get_type_resolver(type(value))
         if resolve_func:
-            return resolve_func(value)
+            return _resolve_memoized(value, resolve_func)
     return value
 
 
@@ -201,36 +292,135 @@ def resolve_deep(values, max_depth=5, types=None):
     """
     def _resolve_single(value):
         if isinstance(value, lazy_type):
-            return value.get()
+            return _resolve_memoized(value, _get_lazy_value)
         elif all_types:
             resolve_func = all_types.get(expand_type_name(type(value)))
             if resolve_func:
-                return resolve_func(value)
+                return _resolve_memoized(value, resolve_func)
         return value
 
-    def _resolve_sub(v, level):
-        l1 = level + 1
-        res_val = _resolve_single(v)
-        if l1 < max_depth:
-            if isinstance(res_val, (list, tuple)):
-                return [_resolve_sub(item, l1) for item in res_val]
-            elif isinstance(res_val, dict):
-                return {_resolve_single(rk): _resolve_sub(rv, l1) for rk, rv in iteritems(res_val)}
-        return res_val
-
     if types:
         all_types = type_registry.copy()
         all_types.update(types)
+        resolve_single = _resolve_single
     else:
         all_types = type_registry
-    return _resolve_sub(values, -1)
+        resolve_single = resolve_value
+
+    result = [None]
+    pending = [(values, 0, result, 0)]
+    while pending:
+        value, level, target, key = pending.pop()
+        res_val = resolve_single(value)
+        if level < max_depth:
+            if isinstance(res_val, (list, tuple)):
+                res_list = [None] * len(res_val)
+                pending.extend((item, level + 1, res_list, index) for index, item in enumerate(res_val))
+                res_val = res_list
+            elif isinstance(res_val, dict):
+                res_dict = {}
+                pending.extend((item, level + 1, res_dict, resolve_single(item_key))
+                               for item_key, item in iteritems(res_val))
+                res_val = res_dict
+        target[key] = res_val
+    return result[0]
+
+
+def _get_resolve_func(value):
+    if isinstance(value, lazy_type):
+        return _get_lazy_value
+    elif type_registry:
+        return _get_type_resolver(type(value))
+    return None
+
+
+def collect_lazy_values(values, max_depth=5):
+    """
+    Collects all lazy objects and instances of registered types up to a certain depth in a structure of lists, tuples,
+    sets, and dictionaries. The values themselves are not resolved. Each object is included only once.
+
+    :param values: Values to inspect.
+    :param max_depth: Maximum depth to recurse into nested lists, tuples, sets and dictionaries.
+    :type max_depth: int
+    :return: List of tuples of lazy objects and their resolve functions.
+    :rtype: list[(AbstractLazyObject, function)]
+    """
+    found = []
+    visited = set()
+    pending = [(values, 0)]
+    while pending:
+        value, level = pending.pop()
+        value_id = id(value)
+        if value_id in visited:
+            continue
+        visited.add(value_id)
+        resolve_func = _get_resolve_func(value)
+        if resolve_func:
+            found.append((value, resolve_func))
+        elif level < max_depth:
+            if isinstance(value, (list, tuple, set, frozenset)):
+                pending.extend((item, level + 1) for item in value)
+            elif isinstance(value, dict):
+                for item_key, item in iteritems(value):
+                    pending.append((item_key, level + 1))
+                    pending.append((item, level + 1))
+    return found
+
+
+def _resolve_item(item):
+    value, resolve_func = item
+    try:
+        return True, resolve_func(value)
+    except Exception:
+        # Failures are not memoized, so that the error is raised where the value is actually used.
+        return False, None
+
+
+def preresolve(values, workers=4, max_depth=5):
+    """
+    Resolves all lazy objects and registered types found in ``values`` (see :func:`collect_lazy_values`) concurrently
+    on a pool of threads, and memoizes the results in the active :class:`ResolutionContext`. Subsequent calls of
+    :func:`resolve_value` and :func:`resolve_deep` in the current thread then return the memoized values. This is useful
+    if lazy values are slow to resolve, e.g. when looked up from a remote service. Resolve functions therefore need to
+    be thread-safe. Values that raise an exception are left to be resolved again where they are used.
+
+    :param values: Values to inspect.
+    :param workers: Maximum number of threads.
+    :type workers: int
+    :param max_depth: Maximum depth to recurse into nested lists, tuples, sets and dictionaries.
+    :type max_depth: int
+    :return: Number of values that have been resolved.
+    :rtype: int
+    """
+    context = getattr(_local, 'context', None)
+    if context is None:
+        raise ValueError("Pre-resolution requires an active resolution context.")
+    items = [item for item in collect_lazy_values(values, max_depth) if not context.get(item[0])[0]]
+    if not items:
+        return 0
+    if workers > 1 and len(items) > 1:
+        pool = ThreadPool(min(workers, len(items)))
+        try:
+            results = pool.map(_resolve_item, items, 1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(_resolve_item, items)
+    resolved = 0
+    for (value, __), (success, resolved_value) in zip(items, results):
+        if success:
+            context.set(value, resolved_value)
+            resolved += 1
+    return resolved
 
 
 def register_type(resolve_type, resolve_func):
     """
     Registers a type for lazy value resolution. Instances of AbstractLazyObject do not have to
     be registered. The exact type must be provided in ``resolve_type``, not a superclass of it.
-    Types registered will be passed through the given function by :func:`resolve_value`.
+    Types registered will be passed through the given function by :func:`resolve_value`. Lookups of
+    resolve functions are cached per type; therefore types should only be registered through this function.
 
     :param resolve_type: Type to consider during late value resolution.
     :type resolve_type: type
@@ -243,6 +433,7 @@ def register_type(resolve_type, resolve_func):
     if not callable(resolve_func):
         raise ValueError("Function is not callable.")
     type_registry[expand_type_name(resolve_type)] = resolve_func
+    _type_resolvers.clear()
 
 
 def uses_type_registry(value):
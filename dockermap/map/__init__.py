@@ -13,10 +13,23 @@ def _update_instance(instance, obj_dict):
 
 
 class PropertyDictMeta(type):
+    """
+    Metaclass for :class:`DictMap` subclasses. Properties defined on the class are stored in attributes (as opposed to
+    dictionary items), which are prefixed with an underscore. Unless the class defines ``__slots__`` itself, these are
+    declared as slots, so that instances do not carry a ``__dict__``.
+    """
+    def __new__(mcs, name, bases, dct):
+        if '__slots__' not in dct:
+            dct['__slots__'] = tuple('_{0}'.format(d_name)
+                                     for d_name, d_type in six.iteritems(dct) if isinstance(d_type, property))
+        return super(PropertyDictMeta, mcs).__new__(mcs, name, bases, dct)
+
     def __init__(cls, name, bases, dct):
-        cls.core_properties = [d_name for d_name, d_type in six.iteritems(dct) if isinstance(d_type, property)]
-        cls.core_properties.extend('_{0}'.format(d_name)
-                                   for d_name, d_type in six.iteritems(dct) if isinstance(d_type, property))
+        properties = set(d_name for d_name, d_type in six.iteritems(dct) if isinstance(d_type, property))
+        properties.update('_{0}'.format(d_name) for d_name in list(properties))
+        for base in bases:
+            properties.update(getattr(base, 'core_properties', ()))
+        cls.core_properties = frozenset(properties)
         super(PropertyDictMeta, cls).__init__(name, bases, dct)
 
 
@@ -47,6 +60,15 @@ class DictMap(six.with_metaclass(PropertyDictMeta, dict)):
     def __iter__(self):
         return six.iteritems(self)
 
+    def __getstate__(self):
+        return {p_name: getattr(self, p_name)
+                for p_name in self.__class__.core_properties
+                if p_name[0] == '_' and hasattr(self, p_name)}
+
+    def __setstate__(self, state):
+        for p_name, value in six.iteritems(state):
+            object.__setattr__(self, p_name, value)
+
     def update(self, other=None, **kwargs):
         if other is not None:
             if isinstance(other, self.__class__):
@@ -2,13 +2,18 @@
 from __future__ import unicode_literals
 
 import logging
+import mmap
+import os
+import tarfile
+from contextlib import closing
 
 import docker
 from docker.errors import APIError
 
 from .dep import SingleDependencyResolver
-from ..build.context import DockerContext
-from ..utils import is_latest_image, is_repo_image, parse_response
+from ..build.context import DockerContext, get_stream_encoding
+from ..utils import (is_latest_image, is_repo_image, iter_json_stream, TransferReader, TransferStats,
+                     write_stream)
 
 
 log = logging.getLogger(__name__)
@@ -17,6 +22,7 @@ STREAM_LOG = logging.INFO + 1
 STREAM_PROGRESS = logging.INFO - 1
 LOG_PROGRESS_FORMAT = "{0} {1} {2}"
 LOG_CONTAINER_FORMAT = "[%s] %s"
+LOG_TRANSFER_FORMAT = "{0:.1f} MB in {1:.2f} s ({2:.1f} MB/s)"
 
 
 class DockerStatusError(Exception):
@@ -68,14 +74,52 @@ class ContainerImageResolver(SingleDependencyResolver):
         return item in self._container_images or super(ContainerImageResolver, self).merge_dependency(item, resolve_parent, parent)
 
 
+def _is_within(path, root):
+    return path == root or path.startswith(root + os.sep)
+
+
+def _get_unsafe_reason(member, extract_root):
+    if os.path.isabs(member.name):
+        return "it has an absolute path"
+    target = os.path.realpath(os.path.join(extract_root, member.name))
+    if not _is_within(target, extract_root):
+        return "it is outside of the extraction path"
+    if member.issym() or member.islnk():
+        if os.path.isabs(member.linkname):
+            return "it links to an absolute path"
+        if member.issym():
+            link_base = os.path.dirname(os.path.join(extract_root, member.name))
+        else:
+            link_base = extract_root
+        if not _is_within(os.path.realpath(os.path.join(link_base, member.linkname)), extract_root):
+            return "it links outside of the extraction path"
+    return None
+
+
+def _extract_stream(fileobj, extract_path, buffer_size):
+    extract_root = os.path.realpath(extract_path)
+    size = 0
+    with tarfile.open(fileobj=fileobj, mode='r|', bufsize=buffer_size) as tf:
+        for member in tf:
+            reason = _get_unsafe_reason(member, extract_root)
+            if reason:
+                log.warning("Skipping %s, since %s.", member.name, reason)
+                continue
+            tf.extract(member, extract_root)
+            size += member.size
+    return size
+
+
 class DockerClientWrapper(docker.Client):
     """
     Adds a few utility functions to the Docker API client.
     """
+    transfer_buffer_size = 1024 * 1024
+    transfer_progress_interval = 1.0
+
     def _docker_log_stream(self, response, raise_on_error):
         log_str = None
-        for e in response:
-            output = parse_response(e)
+        for output in iter_json_stream(response):
             if 'stream' in output:
                 log_str = output['stream'][:-1]
                 self.push_log(log_str, STREAM_LOG)
@@ -88,10 +132,11 @@ class DockerClientWrapper(docker.Client):
 
     def _docker_status_stream(self, response, raise_on_error):
         result = {}
-        for e in response:
-            output = parse_response(e)
+        for output in iter_json_stream(response):
             if output:
-                result.update(output)
+                # Keep only the last message, unless an error has occurred before.
+                if 'error' in output or 'error' not in result:
+                    result = output
                 if 'status' in output:
                     oid = output.get('id')
                     progress = output.get('progress', '')
@@ -206,7 +251,7 @@ class DockerClientWrapper(docker.Client):
         if stream:
             result = self._docker_status_stream(response, raise_on_error)
         else:
-            result = self._docker_status_stream(response.split('\r\n') if response else (), raise_on_error)
+            result = self._docker_status_stream((response, ) if response else (), raise_on_error)
         return result and not result.get('error')
 
     def push(self, repository, stream=False, raise_on_error=False, **kwargs):
@@ -228,14 +273,15 @@ class DockerClientWrapper(docker.Client):
         if stream:
             result = self._docker_status_stream(response, raise_on_error)
         else:
-            result = self._docker_status_stream(response.split('\r\n') if response else (), raise_on_error)
+            result = self._docker_status_stream((response, ) if response else (), raise_on_error)
         return result and not result.get('error')
 
     def build_from_context(self, ctx, tag, **kwargs):
         """
         Builds a docker image from the given docker context with a `Dockerfile` file object.
 
-        :param ctx: An instance of :class:`~.context.DockerContext`.
+        :param ctx: An instance of :class:`~.context.DockerContext`. If it is in streaming mode, the context is
+         generated during the upload and sent with chunked transfer encoding.
         :type ctx: dockermap.build.context.DockerContext
         :param tag: New image tag.
         :type tag: unicode
@@ -243,9 +289,24 @@ class DockerClientWrapper(docker.Client):
         :return: New, generated image id or `None`.
         :rtype: unicode
         """
-        return self.build(fileobj=ctx.fileobj, tag=tag, custom_context=True, encoding=ctx.stream_encoding, **kwargs)
+        if ctx.streaming:
+            context_body = iter(ctx)
+        else:
+            context_body = ctx.fileobj
+        return self.build(fileobj=context_body, tag=tag, custom_context=True, encoding=ctx.stream_encoding, **kwargs)
+
+    @property
+    def uses_local_socket(self):
+        """
+        Whether the client is connected to a local Docker daemon through a unix socket or a named pipe.
+
+        :return: ``True`` for local connections, ``False`` otherwise.
+        :rtype: bool
+        """
+        return self.base_url in ('http+docker://localunixsocket', 'http+docker://localnpipe')
 
-    def build_from_file(self, dockerfile, tag, **kwargs):
+    def build_from_file(self, dockerfile, tag, stream_context=False, context_compression='auto', context_cache=None,
+                        deterministic_context=False, context_exclude_patterns=None, **kwargs):
         """
         Builds a docker image from the given :class:`~dockermap.build.dockerfile.DockerFile`. Use this as a shortcut to
         :meth:`build_from_context`, if no extra data is added to the context.
@@ -254,11 +315,42 @@ class DockerClientWrapper(docker.Client):
         :type dockerfile: dockermap.build.dockerfile.DockerFile
         :param tag: New image tag.
         :type tag: unicode
+        :param stream_context: Generate the context during the upload, instead of writing it into a temporary file
+         first.
+        :type stream_context: bool
+        :param context_compression: Compression of the context tarball, as accepted by
+         :class:`~dockermap.build.context.DockerContext`. By default (``auto``), the context is not compressed for local
+         connections (see :attr:`uses_local_socket`), and compressed with gzip otherwise.
+        :type context_compression: unicode
+        :param context_cache: Optional cache for re-using context tarballs of unchanged Dockerfiles and files. Not used
+         in combination with ``stream_context``.
+        :type context_cache: dockermap.build.cache.ContextCache
+        :param deterministic_context: Generate a reproducible context tarball, so that unchanged files lead to hits in
+         the Docker build cache (see :class:`~dockermap.build.context.DockerContext`).
+        :type deterministic_context: bool
+        :param context_exclude_patterns: Patterns in the format of ``.dockerignore``, for excluding files from
+         directories added to the context (see :class:`~dockermap.build.context.DockerContext`).
+        :type context_exclude_patterns: list[unicode]
         :param kwargs: See :meth:`docker.client.Client.build`.
         :return: New, generated image id or ``None``.
         :rtype: unicode
         """
-        with DockerContext(dockerfile, finalize=True) as ctx:
+        if context_compression == 'auto':
+            context_compression = None if self.uses_local_socket else 'gz'
+        if context_cache is not None and not stream_context:
+            cache_key = context_cache.get_key(dockerfile, context_compression, deterministic_context,
+                                              context_exclude_patterns)
+            cached_path = context_cache.get(cache_key)
+            if cached_path:
+                with open(cached_path, 'rb') as f:
+                    return self.build(fileobj=f, tag=tag, custom_context=True,
+                                      encoding=get_stream_encoding(context_compression), **kwargs)
+        else:
+            cache_key = None
+        with DockerContext(dockerfile, finalize=True, stream=stream_context, compression=context_compression,
+                           exclude_patterns=context_exclude_patterns, deterministic=deterministic_context) as ctx:
+            if cache_key:
+                context_cache.store(cache_key, ctx)
             return self.build_from_context(ctx, tag, **kwargs)
 
     def cleanup_containers(self, include_initial=False, exclude=None, raise_on_error=False):
@@ -426,10 +518,29 @@ class DockerClientWrapper(docker.Client):
                 if e.response.status_code != 404:
                     raise exc_info[0], exc_info[1], exc_info[2]
 
-    def copy_resource(self, container, resource, local_filename):
+    def _get_transfer_reader(self, raw, object_id, checksum, status='Downloading'):
+        def _progress(size, duration):
+            self.push_progress(status, object_id, LOG_TRANSFER_FORMAT.format(
+                size / 1048576.0, duration, size / 1048576.0 / duration if duration else 0.0))
+
+        return TransferReader(raw, checksum, _progress, self.transfer_progress_interval)
+
+    def _log_transfer(self, message, object_id, reader, written, direction='written'):
+        size, duration = reader.size, reader.duration
+        transfer_info = LOG_TRANSFER_FORMAT.format(size / 1048576.0, duration,
+                                                   size / 1048576.0 / duration if duration else 0.0)
+        if reader.checksum:
+            transfer_info = '{0}, checksum {1}'.format(transfer_info, reader.checksum)
+        self.push_log("%s %s: %s, %d bytes %s.", logging.INFO, message, object_id, transfer_info, written, direction)
+        return TransferStats(size, written, duration, reader.checksum)
+
+    def copy_resource(self, container, resource, local_filename=None, extract_path=None, resume=False,
+                      buffer_size=None, checksum=None):
         """
-        *Experimental:* Copies a resource from a Docker container to a local tar file. For details, see
-        :meth:`docker.client.Client.copy`.
+        *Experimental:* Copies a resource from a Docker container to a local tar file, or extracts it into a local
+        directory. For details, see :meth:`docker.client.Client.copy`.
+
+        The response is read in blocks of ``buffer_size``; progress is reported through :meth:`push_progress`.
 
         :param container: Container name or id.
         :type container: unicode
@@ -437,23 +548,83 @@ class DockerClientWrapper(docker.Client):
         :type resource: unicode
         :param local_filename: Local file to store resource into. Will be overwritten if present.
         :type local_filename: unicode
-        """
+        :param extract_path: Local directory to extract the resource into, instead of storing a tar file. Members with
+         absolute paths or paths outside of the directory are skipped, as well as symbolic and hard links to absolute
+         paths or to paths outside of the directory.
+        :type extract_path: unicode
+        :param resume: Verify and repair an existing file, keeping its matching contents (see
+         :func:`~dockermap.utils.write_stream`). The resource is still transferred entirely.
+        :type resume: bool
+        :param buffer_size: Size of blocks to read; default is :attr:`transfer_buffer_size`.
+        :type buffer_size: int
+        :param checksum: Hash algorithm for computing a checksum of the tar stream, e.g. ``sha256``. By default no
+         checksum is computed.
+        :type checksum: unicode
+        :return: Transfer size, number of bytes written, duration, and checksum.
+        :rtype: dockermap.utils.TransferStats
+        """
+        if not (local_filename or extract_path):
+            raise ValueError("Either a local file name or an extraction path must be provided.")
+        buffer_size = buffer_size or self.transfer_buffer_size
         raw = self.copy(container, resource)
-        with open(local_filename, 'wb+') as f:
-            for buf in raw:
-                f.write(buf)
+        object_id = '{0}:{1}'.format(container, resource)
+        reader = self._get_transfer_reader(raw, object_id, checksum)
+        if extract_path:
+            written = _extract_stream(reader, extract_path, buffer_size)
+            return self._log_transfer("Extracted", object_id, reader, written)
+        written = write_stream(reader, local_filename, buffer_size, resume)
+        return self._log_transfer("Copied", object_id, reader, written)
 
-    def save_image(self, image, local_filename):
+    def save_image(self, image, local_filename, resume=False, buffer_size=None, checksum=None):
         """
         *Experimental:* Copies an image from Docker to a local tar file. For details, see
         :meth:`docker.client.Client.get_image`.
 
+        The response is read in blocks of ``buffer_size``; progress is reported through :meth:`push_progress`.
+
         :param image: Image name or id.
         :type image: unicode
-        :param local_filename: Local file to store image into. Will be overwritten if present.
+        :param local_filename: Local file to store image into. Will be overwritten if present, unless ``resume`` is set.
         :type local_filename: unicode
+        :param resume: Verify and repair an existing file, keeping its matching contents (see
+         :func:`~dockermap.utils.write_stream`). The image is still transferred entirely; only writing unchanged data
+         to the local file is avoided.
+        :type resume: bool
+        :param buffer_size: Size of blocks to read and write; default is :attr:`transfer_buffer_size`.
+        :type buffer_size: int
+        :param checksum: Hash algorithm for computing a checksum of the image tarball, e.g. ``sha256``. By default no
+         checksum is computed.
+        :type checksum: unicode
+        :return: Transfer size, number of bytes written, duration, and checksum.
+        :rtype: dockermap.utils.TransferStats
         """
         raw = self.get_image(image)
-        with open(local_filename, 'wb+') as f:
-            for buf in raw:
-                f.write(buf)
+        reader = self._get_transfer_reader(raw, image, checksum)
+        written = write_stream(reader, local_filename, buffer_size or self.transfer_buffer_size, resume)
+        return self._log_transfer("Saved image", image, reader, written)
+
+    def load_image_file(self, local_filename, buffer_size=None, checksum=None):
+        """
+        Loads images from a local tar file, as created by :meth:`save_image` or ``docker save``. The file is
+        memory-mapped and sent in blocks of ``buffer_size`` with chunked transfer encoding, so that it is not read into
+        memory entirely. Progress is reported through :meth:`push_progress`. For details, see
+        :meth:`docker.client.Client.load_image`.
+
+        :param local_filename: Local tar file with one or multiple images.
+        :type local_filename: unicode
+        :param buffer_size: Size of blocks to send; default is :attr:`transfer_buffer_size`.
+        :type buffer_size: int
+        :param checksum: Hash algorithm for computing a checksum of the uploaded file, e.g. ``sha256``. By default no
+         checksum is computed.
+        :type checksum: unicode
+        :return: Transfer size, number of bytes read from the file, duration, and checksum.
+        :rtype: dockermap.utils.TransferStats
+        """
+        buffer_size = buffer_size or self.transfer_buffer_size
+        with open(local_filename, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                raise ValueError("Image file {0} is empty.".format(local_filename))
+            with closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as src_map:
+                reader = self._get_transfer_reader(src_map, local_filename, checksum, 'Uploading')
+                self.load_image(iter(lambda: reader.read(buffer_size), b''))
+        return self._log_transfer("Loaded images from", local_filename, reader, reader.size, 'uploaded')
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import collections
+
 import docker
 
 from .config import ClientConfiguration
@@ -20,16 +22,20 @@ class MappingDockerClient(object):
     ignored.
 
     Image names, container status, and dependencies are cached. In order to force a refresh, use :meth:`refresh_names`.
-    It is also cleared on every change of ``policy_class``.
+    It is also cleared on every change of ``policy_class``. Changes to a container map can be applied to the current
+    policy with :meth:`refresh_map`, which only re-evaluates dependencies of the modified containers.
 
-    :param container_maps: :class:`~dockermap.map.container.ContainerMap` instance or a tuple or list of such instances
-      along with an associated instance.
+    :param container_maps: :class:`~dockermap.map.container.ContainerMap` instance or an iterable (e.g. a list, or the
+      result of :func:`~dockermap.map.yaml.iter_maps`) or dictionary of such instances.
     :type container_maps: dockermap.map.container.ContainerMap or
-      list[dockermap.map.container.ContainerMap] or dict[unicode, dockermap.map.container.ContainerMap]
+      collections.Iterable[dockermap.map.container.ContainerMap] or
+      dict[unicode, dockermap.map.container.ContainerMap]
     :param docker_client: Default :class:`~docker.client.Client` instance or configuration.
     :type docker_client: dockermap.map.config.ClientConfiguration or docker.client.Client
-    :param clients: Dictionary of client configurations
-    :type clients: dict[unicode, dockermap.map.config.ClientConfiguration]
+    :param clients: Dictionary of client configurations, or an iterable of tuples with client name and configuration
+      (e.g. the result of :func:`~dockermap.map.yaml.iter_clients`).
+    :type clients: dict[unicode, dockermap.map.config.ClientConfiguration] or
+      collections.Iterable[(unicode, dockermap.map.config.ClientConfiguration)]
     :param policy_class: Policy class based on :class:`~dockermap.map.policy.base.BasePolicy` for generating container
       actions.
     :type policy_class: class
@@ -41,18 +47,18 @@ class MappingDockerClient(object):
             if isinstance(container_maps, ContainerMap):
                 self._default_map = container_maps.name
                 self._maps = {container_maps.name: container_maps}
-            elif isinstance(container_maps, (list, tuple)):
-                self._default_map = None
-                self._maps = {c_map.name: c_map for c_map in container_maps}
             elif isinstance(container_maps, dict):
                 self._default_map = None
                 self._maps = container_maps
+            elif isinstance(container_maps, collections.Iterable):
+                self._default_map = None
+                self._maps = {c_map.name: c_map for c_map in container_maps}
             else:
                 raise ValueError("Unexpected type of 'container_maps' argument: {0}".format(type(container_maps)))
         else:
             self._default_map = None
             self._maps = {}
-        if clients and isinstance(clients, (list, tuple)):
+        if clients and not isinstance(clients, dict):
             self._clients = dict(clients)
         else:
             self._clients = clients or {}
@@ -267,12 +273,47 @@ class MappingDockerClient(object):
         """
         return self.get_policy().run_script(map_name or self._default_map, container, instance=instance, **kwargs)
 
+    def load_image(self, local_filename, client_name=None, **kwargs):
+        """
+        Loads images from a local tar file on a client (see
+        :meth:`~dockermap.map.base.DockerClientWrapper.load_image_file`), and refreshes the cached image names of that
+        client afterwards, so that subsequent actions use the loaded images.
+
+        :param local_filename: Local tar file with one or multiple images.
+        :type local_filename: unicode
+        :param client_name: Client name. Optional - if not provided the default client is used.
+        :type client_name: unicode
+        :param kwargs: Additional kwargs for :meth:`~dockermap.map.base.DockerClientWrapper.load_image_file`.
+        :return: Transfer size, number of bytes read from the file, duration, and checksum.
+        :rtype: dockermap.utils.TransferStats
+        """
+        client_name = client_name or self._policy_class.get_default_client_name()
+        result = self._clients[client_name].get_client().load_image_file(local_filename, **kwargs)
+        if self._policy:
+            self._policy.images.refresh(client_name)
+        return result
+
     def refresh_names(self):
         """
         Invalidates the policy name and status cache.
         """
         self._policy = None
 
+    def refresh_map(self, map_name=None):
+        """
+        Applies changes of a container map to the current policy, without re-creating it. Dependencies are only
+        re-evaluated for containers that have been modified, and for their dependents. If no policy has been
+        instantiated yet, this has no effect.
+
+        :param map_name: Container map name. Optional - if not provided the default map is used.
+        :type map_name: unicode
+        :return: Items (map name, container name, instance) whose dependencies have been reset.
+        :rtype: set[tuple]
+        """
+        if not self._policy:
+            return set()
+        return self._policy.update_map(self._maps[map_name or self._default_map])
+
     def list_persistent_containers(self, map_name=None):
         """
         Lists the names of all persistent containers on the specified map or all maps. Attached containers are always
@@ -8,7 +8,7 @@ from ..functional import resolve_value
 from . import DictMap
 from .base import DockerClientWrapper
 from .input import (get_list, get_shared_volumes, get_shared_host_volumes, get_container_links, get_network_mode,
-                    get_port_bindings, NotSet)
+                    get_port_bindings, merge_list, NotSet)
 
 SINGLE_ATTRIBUTES = 'image', 'user', 'permissions', 'persistent', 'stop_timeout', 'network'
 DICT_ATTRIBUTES = 'create_options', 'start_options', 'host_config'
@@ -46,6 +46,10 @@ class ContainerConfiguration(object):
 
     :param kwargs: Optional initial values.
     """
+    __slots__ = ('_abstract', '_extends', '_image', '_instances', '_shares', '_environment', '_binds',
+                 '_uses', '_links_to', '_attaches', '_exposes', '_user', '_permissions', '_persistent', '_clients',
+                 '_create_kwargs', '_host_config_kwargs', '_stop_timeout', '_network')
+
     def __init__(self, **kwargs):
         self._abstract = None
         self._extends = []
@@ -76,6 +80,14 @@ class ContainerConfiguration(object):
         return ("{1}{0.__class__.__name__} {2} shares: {0._shares}; binds: {0._binds}; uses: {0._uses}; "
                 "attaches: {0._attaches}").format(self, 'Abstract ' if self._abstract else '', ext_str)
 
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in ContainerConfiguration.__slots__)
+
+    def __setstate__(self, state):
+        set_attr = super(ContainerConfiguration, self).__setattr__
+        for attr, value in zip(ContainerConfiguration.__slots__, state):
+            set_attr(attr, value)
+
     @property
     def abstract(self):
         return self._abstract
@@ -432,13 +444,10 @@ class ContainerConfiguration(object):
                 update_func(attr, update)
 
         def _merge_converted_list(attr, updates):
-            current = getattr(self, attr)
-            update_list = get_list(updates)
-            current.extend(u for u in update_list if u not in current)
+            merge_list(getattr(self, attr), get_list(updates))
 
         def _merge_list(attr, update_list):
-            current = getattr(self, attr)
-            current.extend(u for u in update_list if u not in current)
+            merge_list(getattr(self, attr), update_list)
 
         def _update_dict(attr, new_val):
             current_dict = getattr(self, attr)
@@ -1,18 +1,60 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from collections import Counter, defaultdict
-import itertools
+from collections import defaultdict
+from itertools import count
 import six
 
 from . import DictMap
 from .config import ContainerConfiguration, HostVolumeConfiguration
-from .input import get_list
+from .input import get_list, merge_list
 
 
 SINGLE_ATTRIBUTES = 'repository', 'default_domain', 'set_hostname', 'use_attached_parent_name'
 DICT_ATTRIBUTES = 'volumes', 'host'
 LIST_ATTRIBUTES = 'clients',
+CONFIG_STATE_ATTRIBUTES = ContainerConfiguration.__slots__
+SIMPLE_TYPES = six.string_types + six.integer_types + (float, bool, type(None))
+
+
+_state_counter = count(1)
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(map(_freeze, value))
+    elif isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in six.iteritems(value))
+    return value
+
+
+def _is_same(value1, value2):
+    # Compares frozen states. Other than simple types, objects are compared by identity, so that e.g. lazy values are
+    # not resolved.
+    if type(value1) is not type(value2):
+        return False
+    if isinstance(value1, tuple):
+        return len(value1) == len(value2) and all(_is_same(v1, v2) for v1, v2 in zip(value1, value2))
+    if isinstance(value1, SIMPLE_TYPES):
+        return value1 == value2
+    return value1 is value2
+
+
+def _get_config_state(config):
+    return tuple(_freeze(getattr(config, attr)) for attr in CONFIG_STATE_ATTRIBUTES)
+
+
+def _copy_config(config):
+    config_copy = ContainerConfiguration.__new__(ContainerConfiguration)
+    state = []
+    for value in config.__getstate__():
+        if isinstance(value, list):
+            value = value[:]
+        elif isinstance(value, dict):
+            value = value.copy()
+        state.append(value)
+    config_copy.__setstate__(state)
+    return config_copy
 
 
 class MapIntegrityError(Exception):
@@ -25,6 +67,158 @@ class MapIntegrityError(Exception):
             return self.args[0]
         return None
 
+    @property
+    def violations(self):
+        """
+        All violations found during the integrity check.
+
+        :return: List of error messages.
+        :rtype: list[unicode]
+        """
+        if len(self.args) > 1:
+            return self.args[1]
+        return []
+
+
+def _update_counter(counter, items, increment):
+    get_count = counter.get
+    for item in items:
+        count = get_count(item, 0) + increment
+        if count:
+            counter[item] = count
+        else:
+            del counter[item]
+
+
+def _get_missing_str(names):
+    return ', '.join(sorted(names))
+
+
+class MapIntegrityIndex(object):
+    """
+    Index of all items that are relevant for the integrity check of a container map, e.g. volume alias names that
+    are provided or used by containers, links, and instances. Item references are counted, so that on each
+    :meth:`refresh` only configurations which have been added, removed, or modified since the previous check
+    need to be evaluated. Modifications are detected by comparing the contents of each configuration and of the
+    configurations it extends.
+
+    :param container_map: Container map to check.
+    :type container_map: ContainerMap
+    """
+    def __init__(self, container_map):
+        self._map = container_map
+        self._use_attached_parent_name = None
+        self._keys = {}
+        self._items = {}
+        # Reference counts of instance names, used, provided, bound, and named volumes, links, and networks.
+        self._counters = [{} for __ in range(7)]
+
+    def _get_container_items(self, c_name, c_config):
+        if c_config.instances:
+            instance_names = ['{0}.{1}'.format(c_name, instance) for instance in c_config.instances]
+        else:
+            instance_names = [c_name]
+        shared = instance_names[:] if c_config.shares or c_config.binds or c_config.uses else []
+        binds = [b.volume for b in c_config.binds if not isinstance(b.volume, tuple)]
+        network = c_config.network
+        if isinstance(network, tuple):
+            if network[1]:
+                networks = ['{0}.{1}'.format(*network)]
+            else:
+                networks = [network[0]]
+        else:
+            networks = []
+        if self._use_attached_parent_name:
+            attached_names = ['{0}.{1}'.format(c_name, a) for a in c_config.attaches]
+        else:
+            attached_names = c_config.attaches[:]
+        return (instance_names, [u.volume for u in c_config.uses], shared + attached_names, binds,
+                binds + c_config.attaches, [l.container for l in c_config.links], networks)
+
+    def _update_items(self, items, increment):
+        for counter, category_items in zip(self._counters, items):
+            _update_counter(counter, category_items, increment)
+
+    def refresh(self):
+        """
+        Updates the index with all configurations that have been added, removed, or modified since the last call.
+
+        :return: Names of the configurations that have been re-evaluated or removed.
+        :rtype: set[unicode]
+        """
+        c_map = self._map
+        use_attached_parent_name = c_map.use_attached_parent_name
+        if use_attached_parent_name != self._use_attached_parent_name:
+            self._use_attached_parent_name = use_attached_parent_name
+            self._keys = {}
+            self._items = {}
+            for counter in self._counters:
+                counter.clear()
+        previous_keys = self._keys
+        current_keys = {}
+        changed = set()
+        memo = c_map._state_memo = {}
+        try:
+            for c_name, c_config in c_map:
+                key = id(c_config), c_map._get_extended_key(c_config, memo)
+                current_keys[c_name] = key
+                if previous_keys.get(c_name) != key:
+                    changed.add(c_name)
+                    old_items = self._items.get(c_name)
+                    if old_items:
+                        self._update_items(old_items, -1)
+                    new_items = self._get_container_items(c_name, c_map.get_extended(c_config))
+                    self._update_items(new_items, 1)
+                    self._items[c_name] = new_items
+        finally:
+            c_map._state_memo = None
+        for c_name in set(previous_keys) - set(current_keys):
+            changed.add(c_name)
+            self._update_items(self._items.pop(c_name), -1)
+        self._keys = current_keys
+        return changed
+
+    def get_violations(self, check_duplicates=True):
+        """
+        Refreshes the index and checks the integrity of the container map, as described in
+        :meth:`ContainerMap.check_integrity`.
+
+        :param check_duplicates: Check for duplicate attached volumes.
+        :type check_duplicates: bool
+        :return: Error messages of all violations found. Empty if the map is consistent.
+        :rtype: list[unicode]
+        """
+        self.refresh()
+        provided_count = self._counters[2]
+        instances, used, provided, binds, volumes, links, networks = map(six.viewkeys, self._counters)
+        violations = []
+        if check_duplicates:
+            duplicated = [name for name, count in six.iteritems(provided_count) if count > 1]
+            if duplicated:
+                violations.append("Duplicated attached volumes found with name(s): {0}.".format(
+                    _get_missing_str(duplicated)))
+        missing_shares = used - provided
+        if missing_shares:
+            violations.append("No shared or attached volumes found for used volume(s): {0}.".format(
+                _get_missing_str(missing_shares)))
+        missing_binds = binds - set(self._map.host.keys())
+        if missing_binds:
+            violations.append("No host share found for mapped volume(s): {0}.".format(
+                _get_missing_str(missing_binds)))
+        missing_names = volumes - set(self._map.volumes.keys())
+        if missing_names:
+            violations.append("No volume name-path-assignments found for volume(s): {0}.".format(
+                _get_missing_str(missing_names)))
+        missing_links = links - instances
+        if missing_links:
+            violations.append("No container instance found for link(s): {0}.".format(
+                _get_missing_str(missing_links)))
+        missing_networks = networks - instances
+        if missing_networks:
+            violations.append("No container instance found for the following network reference(s): {0}.".format(
+                _get_missing_str(missing_networks)))
+        return violations
+
 
 class ContainerMap(object):
     """
@@ -52,6 +246,10 @@ class ContainerMap(object):
         self._set_hostname = True
         self._use_attached_parent_name = False
         self._extended = False
+        self._extended_cache = {}
+        self._state_tokens = {}
+        self._state_memo = None
+        self._integrity_index = None
         self.update(initial, **kwargs)
         if (initial or kwargs) and check_integrity:
             self.check_integrity(check_duplicates=check_duplicates)
@@ -59,6 +257,14 @@ class ContainerMap(object):
     def __iter__(self):
         return ((c_name, c_config) for c_name, c_config in six.iteritems(self._containers) if not c_config.abstract)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_extended_cache'] = {}
+        state['_state_tokens'] = {}
+        state['_state_memo'] = None
+        state['_integrity_index'] = None
+        return state
+
     @classmethod
     def _copy_base(cls, from_obj, to_obj):
         """
@@ -107,9 +313,7 @@ class ContainerMap(object):
                 if not lists_only:
                     setattr(self, key, value)
             elif key in LIST_ATTRIBUTES:
-                current_list = getattr(self, key)
-                updated_list = get_list(value)
-                current_list.extend(u for u in updated_list if u not in current_list)
+                merge_list(getattr(self, key), get_list(value))
             elif key in DICT_ATTRIBUTES:
                 current_dict = getattr(self, key)
                 current_dict.update(value)
@@ -139,9 +343,7 @@ class ContainerMap(object):
         :type lists_only: bool
         """
         for attr in LIST_ATTRIBUTES:
-            update_list = getattr(items, attr)
-            current_list = getattr(self, attr)
-            current_list.extend(c for c in update_list if c not in current_list)
+            merge_list(getattr(self, attr), getattr(items, attr))
         for attr in DICT_ATTRIBUTES:
             current_dict = getattr(self, attr)
             current_dict.update(getattr(items, attr))
@@ -154,6 +356,31 @@ class ContainerMap(object):
             else:
                 self._containers[container].update(config)
 
+    def _get_state_token(self, config, memo):
+        config_id = id(config)
+        token = memo.get(config_id)
+        if token is not None:
+            return token
+        state = _get_config_state(config)
+        # Entries keep a reference to the configuration, so that its id is not re-used.
+        entry = self._state_tokens.get(config_id)
+        if entry and entry[0] is config and _is_same(entry[1], state):
+            token = entry[2]
+        else:
+            token = next(_state_counter)
+            self._state_tokens[config_id] = config, state, token
+        memo[config_id] = token
+        return token
+
+    def _get_extended_key(self, config, memo):
+        ext_keys = []
+        for ext_name in config.extends:
+            ext_cfg_base = self._containers.get(ext_name)
+            if not ext_cfg_base:
+                raise KeyError(ext_name)
+            ext_keys.append(self._get_extended_key(ext_cfg_base, memo))
+        return self._get_state_token(config, memo), tuple(ext_keys)
+
     @property
     def name(self):
         """
@@ -345,7 +572,9 @@ class ContainerMap(object):
 
     def get_extended(self, config):
         """
-        Generates a configuration that includes all inherited values.
+        Generates a configuration that includes all inherited values. The merged configuration is cached until the
+        contents of the configuration or of any of the configurations it extends change. A copy is returned, so that
+        modifications of the result do not affect later lookups.
 
         :param config: Container configuration.
         :type config: ContainerConfiguration
@@ -354,6 +583,11 @@ class ContainerMap(object):
         """
         if not config.extends or self._extended:
             return config
+        memo = self._state_memo if self._state_memo is not None else {}
+        key = self._get_extended_key(config, memo)
+        cached = self._extended_cache.get(id(config))
+        if cached and cached[0] is config and cached[1] == key:
+            return _copy_config(cached[2])
         extended_config = ContainerConfiguration()
         for ext_name in config.extends:
             ext_cfg_base = self._containers.get(ext_name)
@@ -362,20 +596,31 @@ class ContainerMap(object):
             ext_cfg = self.get_extended(ext_cfg_base)
             extended_config.merge(ext_cfg)
         extended_config.merge(config)
-        return extended_config
+        self._extended_cache[id(config)] = config, key, extended_config
+        return _copy_config(extended_config)
 
     def get_extended_map(self):
         """
         Creates a copy of this map which includes all non-abstract configurations in their extended form.
+        Extended configurations are generated from a cache, as long as they have not been modified.
 
         :return: Copy of this map.
         :rtype: ContainerMap
         """
         map_copy = self.__class__(self.name)
         self.__class__._copy_base(self, map_copy)
-        for c_name, c_config in self:
-            map_copy.containers[c_name] = self.get_extended(c_config)
+        # Contents of each configuration are only compared once.
+        self._state_memo = {}
+        try:
+            for c_name, c_config in self:
+                map_copy.containers[c_name] = self.get_extended(c_config)
+        finally:
+            self._state_memo = None
         map_copy._extended = True
+        current_ids = set(map(id, self._containers.values()))
+        for cache in (self._extended_cache, self._state_tokens):
+            for config_id in set(cache) - current_ids:
+                del cache[config_id]
         return map_copy
 
     def update(self, other=None, **kwargs):
@@ -414,6 +659,21 @@ class ContainerMap(object):
         else:
             raise ValueError("Expected ContainerMap or dictionary; found '{0}'".format(type(c_map)))
 
+    def get_integrity_violations(self, check_duplicates=True):
+        """
+        Checks the integrity of the container map as described in :meth:`check_integrity`, but returns all violations
+        instead of raising an exception. Items relevant for the check are indexed, so that subsequent calls only
+        re-evaluate configurations that have been modified in the meantime.
+
+        :param check_duplicates: Check for duplicate attached volumes.
+        :type check_duplicates: bool
+        :return: Error messages of all violations found. Empty if the map is consistent.
+        :rtype: list[unicode]
+        """
+        if self._integrity_index is None:
+            self._integrity_index = MapIntegrityIndex(self)
+        return self._integrity_index.get_violations(check_duplicates=check_duplicates)
+
     def check_integrity(self, check_duplicates=True):
         """
         Checks the integrity of the container map. This means, that
@@ -426,74 +686,8 @@ class ContainerMap(object):
 
         :param check_duplicates: Check for duplicate attached volumes.
         :type check_duplicates: bool
+        :raise MapIntegrityError: If any violations are found. All of them are reported at once.
         """
-        def _get_instance_names(c_name, instances):
-            if instances:
-                return ['{0}.{1}'.format(c_name, instance) for instance in instances]
-            return [c_name]
-
-        def _get_container_items(c_name, c_config):
-            instance_names = _get_instance_names(c_name, c_config.instances)
-            shared = instance_names[:] if c_config.shares or c_config.binds or c_config.uses else []
-            bind = [b.volume for b in c_config.binds if not isinstance(b.volume, tuple)]
-            link = [l.container for l in c_config.links]
-            uses = [u.volume for u in c_config.uses]
-            if isinstance(c_config.network, tuple):
-                if c_config.network[1]:
-                    network = '{0}.{1}'.format(*c_config.network)
-                else:
-                    network = c_config.network[0]
-            else:
-                network = None
-            if self._use_attached_parent_name:
-                attaches = [(c_name, a) for a in c_config.attaches]
-            else:
-                attaches = c_config.attaches
-            return instance_names, uses, attaches, shared, bind, link, network
-
-        all_instances, all_used, all_attached, all_shared, all_binds, all_links, all_networks = zip(*[
-            _get_container_items(k, v) for k, v in self.get_extended_map()
-        ])
-        if self._use_attached_parent_name:
-            all_attached_names = tuple('{0}.{1}'.format(c_name, a)
-                                       for c_name, a in itertools.chain.from_iterable(all_attached))
-        else:
-            all_attached_names = tuple(itertools.chain.from_iterable(all_attached))
-        volume_shared = tuple(itertools.chain.from_iterable(all_shared)) + all_attached_names
-        if check_duplicates:
-            duplicated = [name for name, count in six.iteritems(Counter(volume_shared)) if count > 1]
-            if duplicated:
-                dup_str = ', '.join(duplicated)
-                raise MapIntegrityError("Duplicated attached volumes found with name(s): {0}.".format(dup_str))
-        used_set = set(itertools.chain.from_iterable(all_used))
-        shared_set = set(volume_shared)
-        missing_shares = used_set - shared_set
-        if missing_shares:
-            missing_share_str = ', '.join(missing_shares)
-            raise MapIntegrityError("No shared or attached volumes found for used volume(s): {0}.".format(missing_share_str))
-        binds_set = set(itertools.chain.from_iterable(all_binds))
-        host_set = set(self._host.keys())
-        missing_binds = binds_set - host_set
-        if missing_binds:
-            missing_mapped_str = ', '.join(missing_binds)
-            raise MapIntegrityError("No host share found for mapped volume(s): {0}.".format(missing_mapped_str))
-        if self._use_attached_parent_name:
-            volume_set = binds_set.union(a[1] for a in itertools.chain.from_iterable(all_attached))
-        else:
-            volume_set = binds_set.union(all_attached_names)
-        named_set = set(self._volumes.keys())
-        missing_names = volume_set - named_set
-        if missing_names:
-            missing_names_str = ', '.join(missing_names)
-            raise MapIntegrityError("No volume name-path-assignments found for volume(s): {0}.".format(missing_names_str))
-        instance_set = set(itertools.chain.from_iterable(all_instances))
-        linked_set = set(itertools.chain.from_iterable(all_links))
-        missing_links = linked_set - instance_set
-        if missing_links:
-            missing_links_str = ', '.join(missing_links)
-            raise MapIntegrityError("No container instance found for link(s): {0}.".format(missing_links_str))
-        network_set = set(filter(None, all_networks))
-        missing_networks = network_set - instance_set
-        if missing_networks:
-            missing_networks_str = ', '.join(missing_networks)
-            raise MapIntegrityError("No container instance found for the following network reference(s): {0}".format(missing_networks_str))
+        violations = self.get_integrity_violations(check_duplicates=check_duplicates)
+        if violations:
+            raise MapIntegrityError(' '.join(violations), violations)
@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 from abc import ABCMeta
+from array import array
 from collections import defaultdict
 from six import iteritems, with_metaclass
 
@@ -63,11 +64,81 @@ def _dependency_dict(items):
     return {item: CachedDependency(parent) for item, parent in _iterate_dependencies(items)}
 
 
+def strongly_connected_components(nodes, get_children):
+    """
+    Finds strongly connected components of a directed graph with an iterative implementation of Tarjan's algorithm,
+    i.e. in linear time and without recursion. Components are generated in reverse topological order, so that each
+    component is returned after all components reachable from it.
+
+    :param nodes: Nodes to start the traversal from. Further nodes are discovered through ``get_children``.
+    :type nodes: iterable
+    :param get_children: Callable that returns an iterable of child nodes for a node.
+    :type get_children: callable
+    :return: Generator of components, each as a list of nodes.
+    :rtype: generator[list]
+    """
+    index = {}
+    low_link = {}
+    stack = []
+    on_stack = set()
+    for start in nodes:
+        if start in index:
+            continue
+        index[start] = low_link[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(get_children(start)))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low_link[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(get_children(child))))
+                    break
+                elif child in on_stack and index[child] < low_link[node]:
+                    low_link[node] = index[child]
+            else:
+                work.pop()
+                if work:
+                    upper = work[-1][0]
+                    if low_link[node] < low_link[upper]:
+                        low_link[upper] = low_link[node]
+                if low_link[node] == index[node]:
+                    component = []
+                    while True:
+                        c_node = stack.pop()
+                        on_stack.discard(c_node)
+                        component.append(c_node)
+                        if c_node == node:
+                            break
+                    yield component
+
+
 class CircularDependency(Exception):
     """
-    Indicates that dependencies cannot be resolved, since items are interdependent.
+    Indicates that dependencies cannot be resolved, since items are interdependent. If available, all cycles detected
+    during the resolution are provided in :attr:`cycles`.
     """
-    pass
+    @property
+    def message(self):
+        return self.args[0] if self.args else None
+
+    @property
+    def cycles(self):
+        """
+        Groups of interdependent items, i.e. strongly connected components of the dependency graph.
+
+        :return: List of item lists.
+        :rtype: list[list]
+        """
+        return self.args[1] if len(self.args) > 1 else []
+
+
+def _cycle_error(cycles):
+    cycle_str = '; '.join(', '.join(map(repr, cycle)) for cycle in cycles)
+    return CircularDependency("Circular dependencies found between items: {0}.".format(cycle_str), cycles)
 
 
 class BaseDependencyResolver(with_metaclass(ABCMeta, object)):
@@ -80,6 +151,7 @@ class BaseDependencyResolver(with_metaclass(ABCMeta, object)):
     """
     def __init__(self, initial=None):
         self._deps = _dependency_dict(initial)
+        self._dependents = None
 
     def merge_dependency(self, item, resolve_parent, parent):
         """
@@ -103,23 +175,91 @@ class BaseDependencyResolver(with_metaclass(ABCMeta, object)):
         """
         return parent is not None and resolve_parent(parent)
 
+    def get_parents(self, parent):
+        """
+        Returns the parent node(s) as stored for a node as an iterable. Used for traversing the hierarchy before
+        :meth:`merge_dependency` is called.
+
+        :param parent: Parent node(s).
+        :return: Iterable of parent nodes.
+        :rtype: tuple
+        """
+        if parent is None:
+            return ()
+        return parent,
+
+    def _get_cached(self, item):
+        e = self._deps.get(item)
+        if e is None:
+            return ()
+        if e.dependencies is NotInitialized:
+            return self.get_dependencies(item)
+        return e.dependencies
+
+    def _resolve(self, item):
+        """
+        Evaluates all dependencies of ``item`` that have not been cached yet. Nodes are visited iteratively in
+        reverse topological order, so that on each call of :meth:`merge_dependency` the parent nodes are already
+        available in the cache.
+
+        :param item: Node to start the dependency check with.
+        :raise CircularDependency: If any cycle is found in the hierarchy of ``item``.
+        """
+        deps = self._deps
+
+        def _get_pending_parents(node):
+            for p in self.get_parents(deps[node].parent):
+                p_dep = deps.get(p)
+                if p_dep is not None and p_dep.dependencies is NotInitialized:
+                    yield p
+
+        cycles = []
+        blocked = set()
+        for component in strongly_connected_components([item], _get_pending_parents):
+            node = component[0]
+            e = deps[node]
+            parents = self.get_parents(e.parent)
+            if len(component) > 1 or node in parents:
+                cycles.append(component)
+                blocked.update(component)
+            elif blocked.intersection(parents):
+                blocked.add(node)
+            else:
+                e.dependencies = self.merge_dependency(node, self._get_cached, e.parent)
+        if cycles:
+            raise _cycle_error(cycles)
+
     def get_dependencies(self, item):
         """
-        Performs a dependency check on the given item.
+        Performs a dependency check on the given item. Results are cached for all nodes evaluated on the way. The
+        hierarchy is traversed iteratively, so that there is no limitation on its depth.
 
         :param item: Node to start the dependency check with.
         :return: The result on merged dependencies down the hierarchy.
+        :raise CircularDependency: If any cycle is found in the hierarchy of ``item``. All cycles are reported at once.
+        """
+        e = self._deps.get(item)
+        if e is None:
+            return ()
+        if e.dependencies is NotInitialized:
+            self._resolve(item)
+        return e.dependencies
+
+    def find_cycles(self):
         """
-        def _get_sub_dependency(sub_item):
-            e = self._deps.get(sub_item)
-            if e is None:
-                return ()
+        Checks all nodes for circular dependencies, independently of cached results.
 
-            if e.dependencies is NotInitialized:
-                e.dependencies = self.merge_dependency(sub_item, _get_sub_dependency, e.parent)
-            return e.dependencies
+        :return: Groups of interdependent nodes. Empty if there are no circular dependencies.
+        :rtype: list[list]
+        """
+        deps = self._deps
+
+        def _get_parents(node):
+            return [p for p in self.get_parents(deps[node].parent) if p in deps]
 
-        return _get_sub_dependency(item)
+        return [component
+                for component in strongly_connected_components(list(deps.keys()), _get_parents)
+                if len(component) > 1 or component[0] in _get_parents(component[0])]
 
     def reset(self):
         """
@@ -128,15 +268,90 @@ class BaseDependencyResolver(with_metaclass(ABCMeta, object)):
         for value in self._deps.values():
             value.dependencies = NotInitialized
 
+    def _get_dependents(self):
+        dependents = self._dependents
+        if dependents is None:
+            dependents = defaultdict(set)
+            for item, e in iteritems(self._deps):
+                for p in self.get_parents(e.parent):
+                    dependents[p].add(item)
+            self._dependents = dependents
+        return dependents
+
+    def _remove_parent(self, item, parent):
+        self._deps[item].parent = None
+
+    def invalidate(self, item):
+        """
+        Resets the cached result of a single node, and of all nodes that depend on it.
+
+        :param item: Node to reset.
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        dependents = self._get_dependents()
+        invalidated = set()
+        pending = [item]
+        while pending:
+            node = pending.pop()
+            if node in invalidated:
+                continue
+            invalidated.add(node)
+            e = self._deps.get(node)
+            if e is not None:
+                e.dependencies = NotInitialized
+            pending.extend(dependents.get(node, ()))
+        return invalidated
+
+    def replace(self, item, parent):
+        """
+        Replaces the dependencies of a single node. Only cached results of nodes that depend on ``item`` are reset.
+
+        :param item: Node to replace the dependencies for.
+        :param parent: New parent node(s).
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        invalidated = self.invalidate(item)
+        dependents = self._get_dependents()
+        e = self._deps.get(item)
+        if e is not None:
+            for p in self.get_parents(e.parent):
+                dependents[p].discard(item)
+        self._deps[item] = CachedDependency(parent)
+        for p in self.get_parents(parent):
+            dependents[p].add(item)
+        return invalidated
+
+    def remove(self, item):
+        """
+        Removes a single node, including any references to it from other nodes. Only cached results of nodes that
+        depend on ``item`` are reset.
+
+        :param item: Node to remove.
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        invalidated = self.invalidate(item)
+        dependents = self._get_dependents()
+        e = self._deps.pop(item, None)
+        if e is not None:
+            for p in self.get_parents(e.parent):
+                dependents[p].discard(item)
+        for d in dependents.pop(item, ()):
+            self._remove_parent(d, item)
+        return invalidated
+
     def update(self, items):
         """
         Updates the dependencies with the given items. Note that this may not reset all previously-evaluated and cached
-        nodes.
+        nodes. For modifying single nodes, use :meth:`replace` or :meth:`remove`.
 
         :param items: Iterable or dictionary in the format `(dependent_item, dependence)`.
         :type items: iterable
         """
         self._deps.update(_dependency_dict(items))
+        self._dependents = None
 
 
 class SingleDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
@@ -156,6 +371,7 @@ class SingleDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
         for parent, sub_items in items:
             for si in sub_items:
                 self._deps[si] = CachedDependency(parent)
+        self._dependents = None
 
 
 class MultiDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
@@ -165,6 +381,7 @@ class MultiDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
     """
     def __init__(self, initial=None):
         self._deps = defaultdict(lambda: CachedDependency(set()), _dependency_dict(initial))
+        self._dependents = None
 
     def merge_dependency(self, item, resolve_parent, parents):
         """
@@ -182,10 +399,62 @@ class MultiDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
         """
         return parents is not None and any(resolve_parent(parent) for parent in parents)
 
+    def get_parents(self, parent):
+        """
+        Returns the set of parent nodes as an iterable.
+
+        :param parent: Parent nodes.
+        :type parent: set
+        :return: Iterable of parent nodes.
+        :rtype: set | tuple
+        """
+        return parent or ()
+
+    def _remove_parent(self, item, parent):
+        self._deps[item].parent.discard(parent)
+
+    def replace(self, item, parents):
+        """
+        Replaces the dependencies of a single node. Only cached results of nodes that depend on ``item`` are reset.
+
+        :param item: Node to replace the dependencies for.
+        :param parents: New parent nodes.
+        :type parents: iterable
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        return super(MultiDependencyResolver, self).replace(item, set(parents))
+
+    def replace_backward(self, parent, sub_items):
+        """
+        Replaces the dependencies in the inverse relationship format for a single node, i.e. afterwards ``parent``
+        is a parent node of exactly the nodes in ``sub_items``. Only cached results of affected nodes and their
+        dependents are reset.
+
+        :param parent: Parent node.
+        :param sub_items: Dependent nodes.
+        :type sub_items: iterable
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        dependents = self._get_dependents()
+        new_items = set(sub_items)
+        current_items = set(dependents.get(parent, ()))
+        invalidated = set()
+        for si in current_items - new_items:
+            invalidated.update(self.invalidate(si))
+            self._deps[si].parent.discard(parent)
+            dependents[parent].discard(si)
+        for si in new_items - current_items:
+            invalidated.update(self.invalidate(si))
+            self._deps[si].parent.add(parent)
+            dependents[parent].add(si)
+        return invalidated
+
     def update(self, items):
         """
         Updates the dependencies with the given items. Note that this does not reset all previously-evaluated and cached
-        nodes.
+        nodes. For modifying single nodes, use :meth:`replace` or :meth:`remove`.
 
         :param items: Iterable or dictionary in the format `(dependent_item, dependencies)`.
         :type items: iterable
@@ -193,6 +462,7 @@ class MultiDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
         for item, parents in _iterate_dependencies(items):
             dep = self._deps[item]
             dep.parent.update(parents)
+        self._dependents = None
 
     def update_backward(self, items):
         """
@@ -206,3 +476,332 @@ class MultiDependencyResolver(with_metaclass(ABCMeta, BaseDependencyResolver)):
             for si in sub_items:
                 dep = self._deps[si]
                 dep.parent.add(parent)
+        self._dependents = None
+
+
+class IndexedMultiDependencyResolver(object):
+    """
+    Compact dependency resolver for nodes in a m:n relationship. Provides the same interface as
+    :class:`MultiDependencyResolver`, but nodes are interned to integers, and edges are stored in compressed sparse row
+    (CSR) format, i.e. in two integer arrays. The graph is compiled lazily on the first lookup after an update. Rows
+    modified through :meth:`replace`, :meth:`replace_backward`, or :meth:`remove` are kept separately until the next
+    compilation.
+
+    Dependencies are merged in the order of the hierarchy, i.e. each node is preceded by its own dependencies. The
+    resolved dependencies are cached per node as integer arrays. Indexes of nodes removed through :meth:`remove` are
+    re-used for new nodes.
+
+    :param initial: Optional: Iterable or dictionary in the format `(dependent_item, dependencies)`.
+    :type initial: iterable
+    """
+    def __init__(self, initial=None):
+        self._index = {}
+        self._items = []
+        self._free_indexes = []
+        self._edge_sources = array(str('i'))
+        self._edge_targets = array(str('i'))
+        self._offsets = None
+        self._targets = None
+        self._replaced = {}
+        self._dependents = None
+        self._dependencies = {}
+        if initial:
+            self._add_items(initial)
+
+    def _intern(self, item):
+        idx = self._index.get(item)
+        if idx is None:
+            if self._free_indexes:
+                # The row of a removed node is empty, and no other node refers to it.
+                idx = self._free_indexes.pop()
+                self._items[idx] = item
+            else:
+                idx = len(self._items)
+                self._items.append(item)
+            self._index[item] = idx
+        return idx
+
+    def _add_edge(self, item_idx, parent_idx):
+        row = self._replaced.get(item_idx)
+        if row is not None:
+            if parent_idx not in row:
+                row.append(parent_idx)
+        else:
+            self._edge_sources.append(item_idx)
+            self._edge_targets.append(parent_idx)
+
+    def _add_items(self, items):
+        for item, parents in _iterate_dependencies(items):
+            item_idx = self._intern(item)
+            for parent in parents:
+                self._add_edge(item_idx, self._intern(parent))
+        self._offsets = None
+        self._dependents = None
+        self.reset()
+
+    def _compile(self):
+        node_count = len(self._items)
+        replaced = self._replaced
+        if replaced:
+            sources = array(str('i'))
+            targets = array(str('i'))
+            for src, target in zip(self._edge_sources, self._edge_targets):
+                if src not in replaced:
+                    sources.append(src)
+                    targets.append(target)
+            for src, row in iteritems(replaced):
+                sources.extend(array(str('i'), [src]) * len(row))
+                targets.extend(row)
+            self._edge_sources = sources
+            self._edge_targets = targets
+            self._replaced = {}
+        offsets = array(str('i'), [0]) * (node_count + 1)
+        for src in self._edge_sources:
+            offsets[src + 1] += 1
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+        targets = array(str('i'), [0]) * len(self._edge_targets)
+        fill = offsets[:-1]
+        for src, target in zip(self._edge_sources, self._edge_targets):
+            targets[fill[src]] = target
+            fill[src] += 1
+        # Remove duplicate edges per row, keeping the first occurrence.
+        compact_offsets = array(str('i'), [0]) * (node_count + 1)
+        compact_targets = array(str('i'))
+        for i in range(node_count):
+            row = targets[offsets[i]:offsets[i + 1]]
+            if len(row) > 1:
+                seen = set()
+                for t in row:
+                    if t not in seen:
+                        seen.add(t)
+                        compact_targets.append(t)
+            else:
+                compact_targets.extend(row)
+            compact_offsets[i + 1] = len(compact_targets)
+        self._offsets = compact_offsets
+        self._targets = compact_targets
+        self._edge_sources = array(str('i'), (i for i in range(node_count)
+                                              for __ in range(compact_offsets[i + 1] - compact_offsets[i])))
+        self._edge_targets = compact_targets[:]
+
+    def _get_parent_indexes(self, idx):
+        row = self._replaced.get(idx)
+        if row is not None:
+            return row
+        offsets = self._offsets
+        if idx + 1 >= len(offsets):
+            return ()
+        return self._targets[offsets[idx]:offsets[idx + 1]]
+
+    def _get_dependents(self):
+        if self._offsets is None:
+            self._compile()
+        dependents = self._dependents
+        if dependents is None:
+            dependents = defaultdict(set)
+            for idx in range(len(self._items)):
+                for p in self._get_parent_indexes(idx):
+                    dependents[p].add(idx)
+            self._dependents = dependents
+        return dependents
+
+    def _invalidate_index(self, idx):
+        dependents = self._get_dependents()
+        cached = self._dependencies
+        invalidated = set()
+        pending = [idx]
+        while pending:
+            node = pending.pop()
+            if node in invalidated:
+                continue
+            invalidated.add(node)
+            cached.pop(node, None)
+            pending.extend(dependents.get(node, ()))
+        return invalidated
+
+    def _set_parent_indexes(self, idx, parent_indexes):
+        dependents = self._get_dependents()
+        for p in self._get_parent_indexes(idx):
+            dependents[p].discard(idx)
+        row = array(str('i'))
+        for p in parent_indexes:
+            if p not in row:
+                row.append(p)
+                dependents[p].add(idx)
+        self._replaced[idx] = row
+
+    def _merge_indexes(self, idx):
+        dep = array(str('i'))
+        dep_set = set()
+        parents = self._get_parent_indexes(idx)
+        for parent_dep in [self._dependencies[p] for p in parents] + [parents]:
+            for p in parent_dep:
+                if p not in dep_set:
+                    dep.append(p)
+                    dep_set.add(p)
+        return dep
+
+    def _resolve(self, idx):
+        cached = self._dependencies
+
+        def _get_pending_parents(node):
+            return [p for p in self._get_parent_indexes(node) if p not in cached]
+
+        cycles = []
+        blocked = set()
+        for component in strongly_connected_components([idx], _get_pending_parents):
+            node = component[0]
+            parents = self._get_parent_indexes(node)
+            if len(component) > 1 or node in parents:
+                cycles.append([self._items[c] for c in component])
+                blocked.update(component)
+            elif blocked.intersection(parents):
+                blocked.add(node)
+            else:
+                cached[node] = self._merge_indexes(node)
+        if cycles:
+            raise _cycle_error(cycles)
+
+    def get_dependencies(self, item):
+        """
+        Performs a dependency check on the given item.
+
+        :param item: Node to start the dependency check with.
+        :return: All dependencies of the node, each one preceded by its own dependencies.
+        :rtype: list
+        :raise CircularDependency: If any cycle is found in the hierarchy of ``item``. All cycles are reported at once.
+        """
+        idx = self._index.get(item)
+        if idx is None:
+            return ()
+        if self._offsets is None:
+            self._compile()
+        dep = self._dependencies.get(idx)
+        if dep is None:
+            self._resolve(idx)
+            dep = self._dependencies[idx]
+        items = self._items
+        return [items[d] for d in dep]
+
+    def find_cycles(self):
+        """
+        Checks all nodes for circular dependencies, independently of cached results.
+
+        :return: Groups of interdependent nodes. Empty if there are no circular dependencies.
+        :rtype: list[list]
+        """
+        if self._offsets is None:
+            self._compile()
+        return [[self._items[c] for c in component]
+                for component in strongly_connected_components(range(len(self._items)), self._get_parent_indexes)
+                if len(component) > 1 or component[0] in self._get_parent_indexes(component[0])]
+
+    def reset(self):
+        """
+        Resets all cached nodes.
+        """
+        self._dependencies = {}
+
+    def invalidate(self, item):
+        """
+        Resets the cached result of a single node, and of all nodes that depend on it.
+
+        :param item: Node to reset.
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        idx = self._index.get(item)
+        if idx is None:
+            return {item}
+        items = self._items
+        return set(items[i] for i in self._invalidate_index(idx))
+
+    def replace(self, item, parents):
+        """
+        Replaces the dependencies of a single node. Only cached results of nodes that depend on ``item`` are reset.
+
+        :param item: Node to replace the dependencies for.
+        :param parents: New parent nodes.
+        :type parents: iterable
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        item_idx = self._intern(item)
+        parent_indexes = [self._intern(p) for p in parents]
+        invalidated = self.invalidate(item)
+        self._set_parent_indexes(item_idx, parent_indexes)
+        return invalidated
+
+    def replace_backward(self, parent, sub_items):
+        """
+        Replaces the dependencies in the inverse relationship format for a single node, i.e. afterwards ``parent``
+        is a parent node of exactly the nodes in ``sub_items``. Only cached results of affected nodes and their
+        dependents are reset.
+
+        :param parent: Parent node.
+        :param sub_items: Dependent nodes.
+        :type sub_items: iterable
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        parent_idx = self._intern(parent)
+        new_indexes = set(self._intern(si) for si in sub_items)
+        current_indexes = set(self._get_dependents().get(parent_idx, ()))
+        invalidated = set()
+        for idx in current_indexes - new_indexes:
+            invalidated.update(self._invalidate_index(idx))
+            self._set_parent_indexes(idx, [p for p in self._get_parent_indexes(idx) if p != parent_idx])
+        for idx in new_indexes - current_indexes:
+            invalidated.update(self._invalidate_index(idx))
+            self._set_parent_indexes(idx, list(self._get_parent_indexes(idx)) + [parent_idx])
+        items = self._items
+        return set(items[i] for i in invalidated)
+
+    def remove(self, item):
+        """
+        Removes a single node, including any references to it from other nodes. Only cached results of nodes that
+        depend on ``item`` are reset.
+
+        :param item: Node to remove.
+        :return: All nodes that have been reset.
+        :rtype: set
+        """
+        idx = self._index.get(item)
+        if idx is None:
+            return set()
+        invalidated = self.invalidate(item)
+        dependents = self._get_dependents()
+        for d in list(dependents.get(idx, ())):
+            self._set_parent_indexes(d, [p for p in self._get_parent_indexes(d) if p != idx])
+        self._set_parent_indexes(idx, ())
+        dependents.pop(idx, None)
+        del self._index[item]
+        self._items[idx] = None
+        self._free_indexes.append(idx)
+        return invalidated
+
+    def update(self, items):
+        """
+        Updates the dependencies with the given items. Cached results are reset.
+
+        :param items: Iterable or dictionary in the format `(dependent_item, dependencies)`.
+        :type items: iterable
+        """
+        self._add_items(items)
+
+    def update_backward(self, items):
+        """
+        Updates the dependencies in the inverse relationship format, i.e. from an iterable or dict that is structured
+        as `(item, dependent_items)`. The parent element `item` may occur multiple times. Cached results are reset.
+
+        :param items: Iterable or dictionary in the format `(item, dependent_items)`.
+        :type items: iterable
+        """
+        for parent, sub_items in _iterate_dependencies(items):
+            parent_idx = self._intern(parent)
+            for si in sub_items:
+                self._add_edge(self._intern(si), parent_idx)
+        self._offsets = None
+        self._dependents = None
+        self.reset()
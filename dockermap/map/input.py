@@ -91,6 +91,58 @@ def get_list(value):
         type(value).__name__))
 
 
+def _get_hashable_check():
+    type_checks = {}
+
+    def _is_hashable(value):
+        value_type = type(value)
+        hashable = type_checks.get(value_type)
+        if hashable is None:
+            hashable = not (issubclass(value_type, lazy_type) or uses_type_registry(value))
+            type_checks[value_type] = hashable
+        if hashable:
+            try:
+                hash(value)
+            except TypeError:
+                return False
+        return hashable
+
+    return _is_hashable
+
+
+def merge_list(merged_list, items):
+    """
+    Merges items into a list, appending all elements that are not yet present, in their original order. The list is
+    modified in-place. Membership of hashable values is checked through a set; lazy values, registered types, and
+    unhashable values are compared one by one, since their equality only applies after resolving them.
+
+    :param merged_list: List to append new elements to.
+    :type merged_list: list
+    :param items: Items to merge into the list.
+    :type items: iterable
+    """
+    if not items:
+        return
+    is_hashable = _get_hashable_check()
+    merged_set = set()
+    merged_other = []
+    for item in merged_list:
+        if is_hashable(item):
+            merged_set.add(item)
+        else:
+            merged_other.append(item)
+    for item in items:
+        if is_hashable(item):
+            if item in merged_set or any(other == item for other in merged_other):
+                continue
+            merged_set.add(item)
+        else:
+            if item in merged_list:
+                continue
+            merged_other.append(item)
+        merged_list.append(item)
+
+
 def get_shared_volume(value):
     """
     Converts the given value to a ``SharedVolume`` tuple. It accepts strings, lists, tuples, and dicts as input.
@@ -1,21 +1,44 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import sys
 from abc import ABCMeta, abstractmethod
 from six import with_metaclass, iteritems, text_type
 from docker.utils.utils import create_host_config
 
 from ... import DEFAULT_COREIMAGE, DEFAULT_BASEIMAGE
-from ...functional import resolve_value
+from ...functional import resolve_value, preresolve, ResolutionContext
 from ...shortcuts import get_user_group, str_arg
+from ..config import ContainerConfiguration
 from ..input import NotSet
 from . import ACTION_DEPENDENCY_FLAG
 from .dep import ContainerDependencyResolver
-from .cache import ContainerCache, ImageCache
+from .cache import ContainerCache, ImageCache, KwargsCache
 from .utils import (extract_user, get_host_binds, get_port_bindings, get_volumes, init_options, update_kwargs,
                     use_host_config, get_environment)
 
 
+CONFIG_PROPERTIES = tuple(sorted(name for name, attr in iteritems(vars(ContainerConfiguration))
+                                 if isinstance(attr, property)))
+
+
+def _get_map_values(c_map):
+    return [c_map.repository, c_map.default_domain, c_map.host.root, dict(c_map.host), dict(c_map.volumes)]
+
+
+def _get_config_values(c_config):
+    return [getattr(c_config, name) for name in CONFIG_PROPERTIES]
+
+
+def _cached_kwargs_method(kwargs_cache, func):
+    def _get_kwargs(*args, **kwargs):
+        return kwargs_cache.get(func, args, **kwargs)
+
+    _get_kwargs.__name__ = func.__name__
+    _get_kwargs.__doc__ = func.__doc__
+    return _get_kwargs
+
+
 class BasePolicy(with_metaclass(ABCMeta, object)):
     """
     Abstract base class providing the basic infrastructure for generating actions based on container state.
@@ -24,9 +47,24 @@ class BasePolicy(with_metaclass(ABCMeta, object)):
     :type container_maps: dict[unicode, dockermap.map.container.ContainerMap]
     :param clients: Dictionary of clients.
     :type clients: dict[unicode, dockermap.map.config.ClientConfiguration]
+
+    Dependency paths of containers are cached on the first lookup. Set ``precompute_dependency_paths`` to ``True`` in
+    order to build them for all containers on instantiation.
+
+    If ``lazy_resolution_workers`` is set to a number greater than zero, lazy values of all containers on a dependency
+    path are resolved concurrently on this number of threads, before any actions are performed. See
+    :func:`~dockermap.functional.preresolve` for details.
+
+    Results of the methods named in ``cached_kwargs_methods`` are cached, and re-used by later commands as long as the
+    container map, container configuration, and client configuration they have been generated from are unchanged (see
+    :class:`~dockermap.map.policy.cache.KwargsCache`). Set it to an empty tuple for disabling the cache.
     """
     core_image = DEFAULT_COREIMAGE
     base_image = DEFAULT_BASEIMAGE
+    dependency_resolver_class = ContainerDependencyResolver
+    precompute_dependency_paths = False
+    lazy_resolution_workers = 0
+    cached_kwargs_methods = 'get_create_kwargs', 'get_host_config_kwargs'
 
     def __init__(self, container_maps, clients):
         self._maps = {
@@ -36,12 +74,26 @@ class BasePolicy(with_metaclass(ABCMeta, object)):
         self._clients = clients
         self._container_names = ContainerCache(clients)
         self._images = ImageCache(clients)
-        self._f_resolver = ContainerDependencyResolver()
+        self._f_resolver = self.dependency_resolver_class()
         for m in self._maps.values():
             self._f_resolver.update(m)
-        self._r_resolver = ContainerDependencyResolver()
+        self._r_resolver = self.dependency_resolver_class()
         for m in self._maps.values():
             self._r_resolver.update_backward(m)
+        self._dependency_items = {
+            map_name: dict(m.dependency_items)
+            for map_name, m in iteritems(self._maps)
+        }
+        self._f_paths = {}
+        self._r_paths = {}
+        self._kwargs_cache = KwargsCache()
+        for method_name in self.cached_kwargs_methods:
+            setattr(self, method_name, _cached_kwargs_method(self._kwargs_cache, getattr(self, method_name)))
+        if self.precompute_dependency_paths:
+            for map_name, m in iteritems(self._maps):
+                for c_name, __ in m:
+                    self.get_dependencies(map_name, c_name)
+                    self.get_dependents(map_name, c_name)
 
     @classmethod
     def get_default_client_name(cls):
@@ -596,28 +648,103 @@ class BasePolicy(with_metaclass(ABCMeta, object)):
     def get_dependencies(self, map_name, container):
         """
         Generates the list of dependency containers, in reverse order (i.e. the last dependency coming first).
+        Results are cached until the map is changed through :meth:`update_map`.
 
         :param map_name: Container map name.
         :type map_name: unicode
         :param container: Container configuration name.
         :type container: unicode
         :return: Dependency container map names, container configuration names, and instances.
-        :rtype: iterator[tuple(unicode, unicode, unicode)]
+        :rtype: tuple[tuple(unicode, unicode, unicode)]
         """
-        return reversed(self._f_resolver.get_container_dependencies(map_name, container))
+        key = map_name, container, None
+        path = self._f_paths.get(key)
+        if path is None:
+            path = self._f_paths[key] = tuple(reversed(self._f_resolver.get_container_dependencies(map_name,
+                                                                                                   container)))
+        return path
 
     def get_dependents(self, map_name, container):
         """
         Generates the list of dependent containers, in reverse order (i.e. the last dependent coming first).
+        Results are cached until the map is changed through :meth:`update_map`.
 
         :param map_name: Container map name.
         :type map_name: unicode
         :param container: Container configuration name.
         :type container: unicode
         :return: Dependent container map names, container configuration names, and instances.
-        :rtype: iterator[tuple(unicode, unicode, unicode)]
+        :rtype: tuple[tuple(unicode, unicode, unicode)]
+        """
+        key = map_name, container, None
+        path = self._r_paths.get(key)
+        if path is None:
+            path = self._r_paths[key] = tuple(reversed(self._r_resolver.get_container_dependencies(map_name,
+                                                                                                   container)))
+        return path
+
+    def get_lazy_values(self, items):
+        """
+        Returns all values that may have to be resolved when performing actions on the given containers: Their container
+        configuration properties, as well as the volumes, host shares, and settings of their container maps.
+
+        :param items: Tuples of container map name, container configuration name, and instance.
+        :type items: collections.Iterable[tuple]
+        :return: List of values. Lazy values may be contained within nested structures.
+        :rtype: list
+        """
+        values = []
+        map_names = set()
+        for map_name, container, __ in items:
+            c_map = self._maps[map_name]
+            if map_name not in map_names:
+                map_names.add(map_name)
+                values.extend(_get_map_values(c_map))
+            c_config = c_map.get_existing(container)
+            if c_config:
+                values.extend(_get_config_values(c_config))
+        return values
+
+    def kwargs_cache_scope(self):
+        """
+        Returns a context manager, during which results of the methods in ``cached_kwargs_methods`` that depend on lazy
+        values are re-used as well. Container maps and configurations should not be modified during this time.
+
+        :return: Context manager.
+        """
+        return self._kwargs_cache.scope()
+
+    def update_map(self, container_map):
+        """
+        Applies changes of a container map to the policy, without rebuilding the dependency resolvers. Only dependency
+        information of containers that have been added, removed, or modified is updated; cached results are reset for
+        these and for containers depending on them. Cached keyword arguments are discarded.
+
+        :param container_map: Container map, which is replacing the map of the same name.
+        :type container_map: dockermap.map.container.ContainerMap
+        :return: Items (map name, container name, instance) whose dependencies or dependents have been reset.
+        :rtype: set[tuple]
         """
-        return reversed(self._r_resolver.get_container_dependencies(map_name, container))
+        map_name = container_map.name
+        ext_map = container_map.get_extended_map()
+        old_items = self._dependency_items.get(map_name, {})
+        new_items = dict(ext_map.dependency_items)
+        affected = set()
+        for item in set(old_items) - set(new_items):
+            affected.update(self._f_resolver.remove(item))
+            affected.update(self._r_resolver.remove(item))
+        for item, parents in iteritems(new_items):
+            if item in old_items and old_items[item] == parents:
+                continue
+            affected.update(self._f_resolver.replace(item, parents))
+            affected.update(self._r_resolver.replace_backward(item, parents))
+        self._maps[map_name] = ext_map
+        self._dependency_items[map_name] = new_items
+        self._kwargs_cache.clear()
+        for item in affected:
+            self._f_paths.pop(item, None)
+            self._r_paths.pop(item, None)
+        return affected
 
     @abstractmethod
     def create_actions(self, map_name, container, instances=None, **kwargs):
@@ -784,6 +911,20 @@ class BasePolicy(with_metaclass(ABCMeta, object)):
         """
         return self._maps
 
+    @property
+    def dependency_path_stats(self):
+        """
+        Size of the index of dependency paths, as returned by :meth:`get_dependencies` and :meth:`get_dependents`.
+        The memory usage is an approximation, which includes the cached tuples but not the items they refer to.
+
+        :return: Dictionary with the number of cached ``dependencies`` and ``dependents`` paths, and their
+          approximate ``size`` in bytes.
+        :rtype: dict[unicode, int]
+        """
+        size = sum(sys.getsizeof(paths) + sum(sys.getsizeof(path) for path in paths.values())
+                   for paths in (self._f_paths, self._r_paths))
+        return dict(dependencies=len(self._f_paths), dependents=len(self._r_paths), size=size)
+
     @property
     def clients(self):
         """
@@ -864,7 +1005,9 @@ class AbstractActionGenerator(with_metaclass(ABCMeta, object)):
 
     def get_actions(self, map_name, container, instances=None, **kwargs):
         """
-        Generates and performs actions for the selected container and its dependencies / dependents.
+        Generates and performs actions for the selected container and its dependencies / dependents. Lazy values are
+        resolved only once during this command (see :class:`~dockermap.functional.ResolutionContext`), and optionally
+        concurrently in advance (see :attr:`BasePolicy.lazy_resolution_workers`).
 
         :param map_name: Container map name.
         :type map_name: unicode
@@ -885,10 +1028,15 @@ class AbstractActionGenerator(with_metaclass(ABCMeta, object)):
             c_instances = [c_instance] if c_instance else c_config.instances or [None]
             return self.generate_item_actions(map_name, c_map, c_container, c_config, c_instances, c_flags, **c_kwargs)
 
-        dependency_path = self.get_dependency_path(map_name, container)
-        for d in dependency_path:
-            list(_gen_actions(*d, c_flags=ACTION_DEPENDENCY_FLAG) or ())
-        return list(_gen_actions(map_name, container, instances, c_flags=0, **kwargs) or ())
+        with ResolutionContext(), self._policy.kwargs_cache_scope():
+            dependency_path = self.get_dependency_path(map_name, container)
+            workers = self._policy.lazy_resolution_workers
+            if workers:
+                lazy_values = self._policy.get_lazy_values(list(dependency_path) + [(map_name, container, None)])
+                preresolve(lazy_values, workers)
+            for d in dependency_path:
+                list(_gen_actions(*d, c_flags=ACTION_DEPENDENCY_FLAG) or ())
+            return list(_gen_actions(map_name, container, instances, c_flags=0, **kwargs) or ())
 
     @property
     def policy(self):
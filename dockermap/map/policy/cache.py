@@ -1,6 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
+import marshal
+from contextlib import contextmanager
+
+import six
+
+from ..input import NotSet
+from ..container import SINGLE_ATTRIBUTES, _freeze, _is_same
+from .utils import update_kwargs
+
+
+PLAIN_TYPES = frozenset((six.binary_type, six.text_type, float, bool, type(None)) + six.integer_types)
+
 
 class CachedItems(object):
     """
@@ -147,3 +160,179 @@ class ContainerCache(DockerHostItemCache):
     Fetches and caches container names from a Docker host.
     """
     item_class = CachedContainerNames
+
+
+def _copy_kwargs(value):
+    if isinstance(value, dict):
+        if type(value) is dict:
+            return {k: _copy_kwargs(v) for k, v in six.iteritems(value)}
+        # Keep subclasses such as HostConfig.
+        c_value = copy.copy(value)
+        for k, v in six.iteritems(value):
+            c_value[k] = _copy_kwargs(v)
+        return c_value
+    elif isinstance(value, list):
+        return list(map(_copy_kwargs, value))
+    return value
+
+
+def _get_plain(value):
+    # Converts the value into types that marshal accepts. NotSet is represented by Ellipsis, which does not occur in
+    # configurations otherwise. Other objects, e.g. lazy values, are kept and make marshal fail.
+    if type(value) in PLAIN_TYPES:
+        return value
+    elif isinstance(value, list):
+        return [v if type(v) in PLAIN_TYPES else _get_plain(v) for v in value]
+    elif isinstance(value, tuple):
+        return tuple([v if type(v) in PLAIN_TYPES else _get_plain(v) for v in value])
+    elif isinstance(value, dict):
+        return {k: v if type(v) in PLAIN_TYPES else _get_plain(v) for k, v in six.iteritems(value)}
+    elif value is NotSet:
+        return Ellipsis
+    return value
+
+
+def _get_map_state(c_map):
+    host = c_map.host
+    return (c_map.name, ) + tuple(getattr(c_map, attr) for attr in SINGLE_ATTRIBUTES) + (
+        dict(c_map.volumes), host.root, dict(host))
+
+
+def _get_config_state(c_config):
+    return c_config.__getstate__()
+
+
+def _get_client_state(client_config):
+    # The client instance is not used for generating keyword arguments.
+    return {k: v for k, v in six.iteritems(client_config) if k != '_client'}, dict(client_config.interfaces)
+
+
+def _get_state(values):
+    """
+    Generates a representation of the values, which can be compared for detecting changes. If all values are simple
+    types, the result is a string; otherwise a frozen structure, which needs to be compared using
+    :func:`~dockermap.map.container._is_same`.
+    """
+    try:
+        return marshal.dumps(_get_plain(values))
+    except ValueError:
+        return tuple(map(_freeze, values))
+
+
+def _get_stored(result):
+    # Plain results are stored in marshalled form, which is faster to copy. Others, e.g. including a HostConfig
+    # object, are copied with _copy_kwargs.
+    if type(result) is dict:
+        try:
+            return marshal.dumps(result)
+        except ValueError:
+            pass
+    return result
+
+
+class KwargsCache(object):
+    """
+    Caches the keyword arguments generated by policy methods such as
+    :meth:`~dockermap.map.policy.base.BasePolicy.get_create_kwargs`. Entries are identified by the method, the
+    container configuration and client names, and the remaining positional arguments (e.g. container and instance
+    name). Each entry stores the state of the container map, container configuration, and client configuration it has
+    been generated from. A cached result is only used while all three are unchanged, so that attribute assignments as
+    well as in-place modifications of lists and dictionaries apply on the next call.
+
+    Results that depend on lazy values (or any other objects whose result may change without modifying the
+    configuration) are only re-used within the scope they were generated in, e.g. a single command (see
+    :meth:`~dockermap.map.policy.base.BasePolicy.kwargs_cache_scope`); lazy values are resolved only once during a
+    scope.
+
+    Results are generated without caller-provided keyword arguments, which are applied to a copy afterwards.
+    """
+    max_entries = 4096
+
+    def __init__(self):
+        self._entries = {}
+        self._depth = 0
+        self._scope = 0
+        self._state_memo = {}
+
+    @contextmanager
+    def scope(self):
+        """
+        Re-uses results depending on lazy values until the context manager exits. Scopes can be nested.
+        """
+        if not self._depth:
+            self._scope += 1
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self._state_memo.clear()
+
+    def _get_state(self, get_values, obj):
+        if not self._depth:
+            return _get_state(get_values(obj))
+        # During a scope, maps and configurations are not expected to change.
+        memo_key = get_values, id(obj)
+        entry = self._state_memo.get(memo_key)
+        if entry is None or entry[0] is not obj:
+            entry = self._state_memo[memo_key] = obj, _get_state(get_values(obj))
+        return entry[1]
+
+    def get(self, func, args, kwargs=None, **func_kwargs):
+        """
+        Returns the cached result of the given function, or calls it and stores its result.
+
+        :param func: Method of the policy, accepting the container map, configuration name, container configuration,
+         client name, and client configuration as the first positional arguments.
+        :type func: function
+        :param args: Positional arguments to the function.
+        :type args: tuple
+        :param kwargs: Keyword arguments to complement or override the generated values.
+        :type kwargs: dict | NoneType
+        :param func_kwargs: Further keyword arguments to the function, e.g. ``include_host_config``.
+        :return: Resulting keyword arguments.
+        :rtype: dict
+        """
+        if kwargs is not None:
+            call_kwargs = dict(func_kwargs, kwargs=kwargs)
+        else:
+            call_kwargs = func_kwargs
+        if (kwargs and 'host_config' in kwargs) or len(args) < 5 or not args[2]:
+            return func(*args, **call_kwargs)
+        key = (func.__name__, args[1], args[3]) + tuple(args[5:]) + tuple(sorted(func_kwargs.items()))
+        try:
+            entry = self._entries.get(key)
+        except TypeError:
+            # Unhashable arguments, e.g. keyword arguments passed as positional argument.
+            return func(*args, **call_kwargs)
+        state = (self._get_state(_get_map_state, args[0]), self._get_state(_get_config_state, args[2]),
+                 self._get_state(_get_client_state, args[4]))
+        stable = all(isinstance(s, bytes) for s in state)
+        if entry is None:
+            valid = False
+        elif entry[1] is None:
+            valid = stable and entry[0] == state
+        else:
+            valid = self._depth and entry[1] == self._scope and _is_same(entry[0], state)
+        if valid:
+            stored = entry[2]
+        else:
+            stored = _get_stored(func(*args, **func_kwargs))
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = state, None if stable else self._scope, stored
+        if isinstance(stored, bytes):
+            c_kwargs = marshal.loads(stored)
+        else:
+            c_kwargs = _copy_kwargs(stored)
+        if kwargs:
+            update_kwargs(c_kwargs, kwargs)
+        return c_kwargs
+
+    def clear(self):
+        """
+        Removes all cached entries.
+        """
+        self._entries.clear()
+        self._state_memo.clear()
@@ -3,21 +3,54 @@ from __future__ import unicode_literals
 
 from itertools import chain
 
-from ..dep import MultiDependencyResolver, CircularDependency
+from ..dep import MultiDependencyResolver, IndexedMultiDependencyResolver, CircularDependency
 
 
-class ContainerDependencyResolver(MultiDependencyResolver):
+class ContainerDependencyMixin(object):
     """
-    Resolves dependencies between :class:`~dockermap.map.config.ContainerConfiguration` instances, based on shared and
-    used volumes.
+    Adapts the ``update`` and ``update_backward`` functions of a dependency resolver to use
+    :class:`~dockermap.map.container.ContainerMap` instances.
 
     :param container_map: Optional :class:`~dockermap.map.container.ContainerMap` instance for initialization.
     :type container_map: dockermap.map.container.ContainerMap
     """
     def __init__(self, container_map=None):
         items = container_map.dependency_items if container_map else None
-        super(ContainerDependencyResolver, self).__init__(items)
+        super(ContainerDependencyMixin, self).__init__(items)
+
+    def get_container_dependencies(self, map_name, container):
+        item = map_name, container, None
+        return super(ContainerDependencyMixin, self).get_dependencies(item)
+
+    def update(self, container_map):
+        """
+        Overrides the `update` function of the superclass to use a :class:`~dockermap.map.container.ContainerMap`
+        instance.
+
+        :param container_map: :class:`ContainerMap` instance
+        :type container_map: dockermap.map.container.ContainerMap
+        """
+        super(ContainerDependencyMixin, self).update(container_map.dependency_items)
+
+    def update_backward(self, container_map):
+        """
+        Overrides the `update_backward` function of the superclass to use a
+        :class:`~dockermap.map.container.ContainerMap` instance.
+
+        :param container_map: :class:`~dockermap.map.container.ContainerMap` instance
+        :type container_map: dockermap.map.container.ContainerMap
+        """
+        super(ContainerDependencyMixin, self).update_backward(container_map.dependency_items)
+
+
+class ContainerDependencyResolver(ContainerDependencyMixin, MultiDependencyResolver):
+    """
+    Resolves dependencies between :class:`~dockermap.map.config.ContainerConfiguration` instances, based on shared and
+    used volumes.
 
+    :param container_map: Optional :class:`~dockermap.map.container.ContainerMap` instance for initialization.
+    :type container_map: dockermap.map.container.ContainerMap
+    """
     def merge_dependency(self, item, resolve_parent, parents):
         """
         Merge dependencies of current container with further dependencies; in this instance, it means that first parent
@@ -34,38 +67,32 @@ class ContainerDependencyResolver(MultiDependencyResolver):
         :raise CircularDependency: If the current element depends on one found deeper in the hierarchy.
         """
         dep = []
+        dep_set = set()
+
+        def _add_new(new_items):
+            for p in new_items:
+                if p not in dep_set:
+                    dep.append(p)
+                    dep_set.add(p)
+
         for parent in parents:
             parent_dep = resolve_parent(parent)
             if parent_dep:
-                new_dep = [p for p in parent_dep if p not in dep]
-                dep.extend(new_dep)
+                _add_new(parent_dep)
 
-        new_dep = [p for p in parents if p not in dep]
-        dep.extend(new_dep)
-        if item in dep:
+        _add_new(parents)
+        if item in dep_set:
             raise CircularDependency("Circular dependency found for item '{0}'.".format(item))
         return dep
 
-    def get_container_dependencies(self, map_name, container):
-        item = map_name, container, None
-        return super(ContainerDependencyResolver, self).get_dependencies(item)
-
-    def update(self, container_map):
-        """
-        Overrides the `update` function of the superclass to use a :class:`~dockermap.map.container.ContainerMap`
-        instance.
 
-        :param container_map: :class:`ContainerMap` instance
-        :type container_map: dockermap.map.container.ContainerMap
-        """
-        super(ContainerDependencyResolver, self).update(container_map.dependency_items)
-
-    def update_backward(self, container_map):
-        """
-        Overrides the `update_backward` function of the superclass to use a
-        :class:`~dockermap.map.container.ContainerMap` instance.
+class CompactContainerDependencyResolver(ContainerDependencyMixin, IndexedMultiDependencyResolver):
+    """
+    Resolves dependencies between :class:`~dockermap.map.config.ContainerConfiguration` instances like
+    :class:`ContainerDependencyResolver`, but uses a compact, integer-indexed graph representation. This reduces memory
+    usage and hashing cost on maps with many containers and instances.
 
-        :param container_map: :class:`~dockermap.map.container.ContainerMap` instance
-        :type container_map: dockermap.map.container.ContainerMap
-        """
-        super(ContainerDependencyResolver, self).update_backward(container_map.dependency_items)
+    :param container_map: Optional :class:`~dockermap.map.container.ContainerMap` instance for initialization.
+    :type container_map: dockermap.map.container.ContainerMap
+    """
+    pass
@@ -1,15 +1,33 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, absolute_import
 
+import glob
+import hashlib
+import logging
+import multiprocessing
 import os
+import sys
+import time
 import six
 import yaml
+from six.moves import cPickle as pickle
 
+from .. import __version__
 from ..utils import expand_path, expand_path_lazy
 from .config import ClientConfiguration
 from .container import ContainerMap
 
 
+log = logging.getLogger(__name__)
+
+try:
+    SafeLoader = yaml.CSafeLoader
+except AttributeError:
+    SafeLoader = yaml.SafeLoader
+
+YAML_EXTENSIONS = '.yaml', '.yml'
+
+
 def expand_node(loader, node, expand_method):
     """
     Expands paths on a YAML document node. If it is a sequence node (list) items on the first level are expanded. For
@@ -36,8 +54,168 @@ def expand_node(loader, node, expand_method):
         return [expand_method(l_val) for l_val in val]
 
 
-yaml.add_constructor('!path', lambda loader, node: expand_node(loader, node, expand_path), yaml.SafeLoader)
-yaml.add_constructor('!path_lazy', lambda loader, node: expand_node(loader, node, expand_path_lazy), yaml.SafeLoader)
+def _construct_path(loader, node):
+    expanded_paths = getattr(loader, 'expanded_paths', None)
+    if expanded_paths is None:
+        return expand_node(loader, node, expand_path)
+
+    def _expand_and_record(value):
+        expanded = expand_path(value)
+        expanded_paths.append((value, expanded))
+        return expanded
+
+    return expand_node(loader, node, _expand_and_record)
+
+
+def _construct_path_lazy(loader, node):
+    return expand_node(loader, node, expand_path_lazy)
+
+
+def _merge_included(merged, data, filename):
+    if merged is None:
+        return data
+    if isinstance(merged, dict) and isinstance(data, dict):
+        merged = merged.copy()
+        merged.update(data)
+        return merged
+    if isinstance(merged, list) and isinstance(data, list):
+        return merged + data
+    raise ValueError("Included document '{0}' cannot be merged with the previous ones.".format(filename))
+
+
+def _get_file_stats(filenames):
+    stats = []
+    for filename in filenames:
+        st = os.stat(filename)
+        stats.append((filename, st.st_size, st.st_mtime))
+    return stats
+
+
+def _construct_include(loader, node):
+    if isinstance(node, yaml.nodes.SequenceNode):
+        patterns = loader.construct_sequence(node)
+    else:
+        patterns = [loader.construct_scalar(node)]
+    base_dir = getattr(loader, 'base_dir', None) or os.curdir
+    expanded_paths = getattr(loader, 'expanded_paths', None)
+    included_files = getattr(loader, 'included_files', None)
+    include_stack = getattr(loader, 'include_stack', None) or ()
+    merged = None
+    for pattern in patterns:
+        path = os.path.join(base_dir, expand_path(pattern))
+        filenames = sorted(glob.glob(path))
+        if not filenames:
+            raise IOError("No file found for include '{0}'.".format(pattern))
+        if included_files is not None:
+            included_files.append((path, _get_file_stats(filenames)))
+        for filename in filenames:
+            real_path = os.path.realpath(filename)
+            if real_path in include_stack:
+                raise ValueError("Circular include of '{0}': {1}.".format(
+                    filename, ' -> '.join(include_stack + (real_path, ))))
+            with open(filename, 'rb') as f:
+                content = f.read()
+            data = _load(content, os.path.dirname(filename), expanded_paths, included_files,
+                         include_stack + (real_path, ))
+            merged = _merge_included(merged, data, filename)
+    return merged
+
+
+for _loader_class in {yaml.SafeLoader, SafeLoader}:
+    yaml.add_constructor('!path', _construct_path, _loader_class)
+    yaml.add_constructor('!path_lazy', _construct_path_lazy, _loader_class)
+    yaml.add_constructor('!include', _construct_include, _loader_class)
+
+
+def _get_stream_path(stream):
+    stream_name = getattr(stream, 'name', None)
+    if isinstance(stream_name, six.string_types):
+        return stream_name
+    return None
+
+
+def _load(stream, base_dir=None, expanded_paths=None, included_files=None, include_stack=None):
+    loader = SafeLoader(stream)
+    stream_path = _get_stream_path(stream)
+    if base_dir is None and stream_path:
+        base_dir = os.path.dirname(stream_path)
+    if include_stack is None and stream_path:
+        include_stack = (os.path.realpath(stream_path), )
+    loader.base_dir = base_dir
+    loader.expanded_paths = expanded_paths
+    loader.included_files = included_files
+    loader.include_stack = include_stack
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
+
+def _load_all(stream):
+    loader = SafeLoader(stream)
+    stream_path = _get_stream_path(stream)
+    if stream_path:
+        loader.base_dir = os.path.dirname(stream_path)
+        loader.include_stack = (os.path.realpath(stream_path), )
+    try:
+        while loader.check_data():
+            yield loader.get_data()
+    finally:
+        loader.dispose()
+
+
+def _parse_file(filename):
+    start = time.time()
+    with open(filename, 'r') as f:
+        data = _load(f)
+    return data, time.time() - start
+
+
+def _get_file_names(filenames):
+    if isinstance(filenames, six.string_types):
+        filenames = [filenames]
+    names = set()
+    for pattern in filenames:
+        if os.path.isdir(pattern):
+            names.update(os.path.join(pattern, f) for f in os.listdir(pattern)
+                         if os.path.splitext(f)[1] in YAML_EXTENSIONS)
+        else:
+            matches = glob.glob(pattern)
+            if not matches:
+                raise IOError("No file found for '{0}'.".format(pattern))
+            names.update(matches)
+    return sorted(names)
+
+
+def parse_files(filenames, processes=None):
+    """
+    Parses multiple YAML files, which can be processed concurrently in multiple processes. The parsing time of each
+    file is logged on debug level.
+
+    :param filenames: File names, glob patterns, or directories. Of directories, all files ending with ``.yaml`` or
+      ``.yml`` are included.
+    :type filenames: unicode | list[unicode]
+    :param processes: Number of processes to use. By default uses the number of CPUs; ``1`` parses all files in the
+      current process.
+    :type processes: int
+    :return: File names and their document contents, sorted by file name.
+    :rtype: list[(unicode, object)]
+    """
+    names = _get_file_names(filenames)
+    start = time.time()
+    if processes == 1 or len(names) < 2:
+        results = list(map(_parse_file, names))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_parse_file, names)
+        finally:
+            pool.close()
+            pool.join()
+    for filename, (__, elapsed) in zip(names, results):
+        log.debug("Parsed '%s' in %.3f s.", filename, elapsed)
+    log.info("Parsed %d file(s) in %.3f s.", len(names), time.time() - start)
+    return [(filename, data) for filename, (data, __) in zip(names, results)]
 
 
 def load_file(filename):
@@ -49,7 +227,17 @@ def load_file(filename):
     :return: Contents of the YAML file.
     """
     with open(filename, 'r') as f:
-        return yaml.safe_load(f)
+        return _load(f)
+
+
+def _get_map(map_dict, name, check_integrity, check_duplicates):
+    if isinstance(map_dict, dict):
+        doc_name = map_dict.pop('name', None)
+        map_name = name or doc_name
+        if not map_name:
+            raise ValueError("No map name provided, and none found in YAML stream.")
+        return ContainerMap(map_name, map_dict, check_integrity=check_integrity, check_duplicates=check_duplicates)
+    raise ValueError("Valid map could not be decoded.")
 
 
 def load_map(stream, name=None, check_integrity=True, check_duplicates=True):
@@ -68,13 +256,26 @@ def load_map(stream, name=None, check_integrity=True, check_duplicates=True):
     :return: A ContainerMap object.
     :rtype: ContainerMap
     """
-    map_dict = yaml.safe_load(stream)
-    if isinstance(map_dict, dict):
-        map_name = name or map_dict.pop('name', None)
-        if not map_name:
-            raise ValueError("No map name provided, and none found in YAML stream.")
-        return ContainerMap(map_name, map_dict, check_integrity=check_integrity, check_duplicates=check_duplicates)
-    raise ValueError("Valid map could not be decoded.")
+    return _get_map(_load(stream), name, check_integrity, check_duplicates)
+
+
+def iter_maps(stream, check_integrity=True, check_duplicates=True):
+    """
+    Loads ContainerMap configurations from a YAML stream with multiple documents. Each document is parsed only when
+    the next map is requested, so that only one document is held in memory at a time. Every document needs to have a
+    ``name`` element on its root level.
+
+    :param stream: YAML stream.
+    :type stream: file
+    :param check_integrity: Performs a brief integrity check on each map; default is ``True``.
+    :type check_integrity: bool
+    :param check_duplicates: Check for duplicate attached volumes during integrity check.
+    :type check_duplicates: bool
+    :return: Iterator of ContainerMap objects.
+    :rtype: collections.Iterable[ContainerMap]
+    """
+    for map_dict in _load_all(stream):
+        yield _get_map(map_dict, None, check_integrity, check_duplicates)
 
 
 def load_clients(stream, configuration_class=ClientConfiguration):
@@ -88,14 +289,69 @@ def load_clients(stream, configuration_class=ClientConfiguration):
     :return: A dictionary of client configuration objects.
     :rtype: dict[unicode, dockermap.map.config.ClientConfiguration]
     """
-    client_dict = yaml.safe_load(stream)
+    client_dict = _load(stream)
     if isinstance(client_dict, dict):
         return {client_name: configuration_class(**client_config)
                 for client_name, client_config in six.iteritems(client_dict)}
     raise ValueError("Valid configuration could not be decoded.")
 
 
-def load_map_file(filename, name=None, check_integrity=True):
+def iter_clients(stream, configuration_class=ClientConfiguration):
+    """
+    Loads client configurations from a YAML stream with multiple documents. Each document is parsed only when the
+    next client configuration is requested. The result can be passed to
+    :class:`~dockermap.map.client.MappingDockerClient` directly, or converted using ``dict``.
+
+    :param stream: YAML stream.
+    :type stream: file
+    :param configuration_class: Class of the configuration object to create.
+    :type configuration_class: class
+    :return: Iterator of tuples with client name and configuration object.
+    :rtype: collections.Iterable[(unicode, dockermap.map.config.ClientConfiguration)]
+    """
+    for client_dict in _load_all(stream):
+        if not isinstance(client_dict, dict):
+            raise ValueError("Valid configuration could not be decoded.")
+        for client_name, client_config in six.iteritems(client_dict):
+            yield client_name, configuration_class(**client_config)
+
+
+def _get_cache_key(content, *args):
+    key = hashlib.sha1(content)
+    for arg in (__version__, SafeLoader.__name__, sys.version_info[:2]) + args:
+        key.update(repr(arg).encode('utf-8'))
+    return key.hexdigest()
+
+
+def _includes_unchanged(path, file_stats):
+    try:
+        return _get_file_stats(sorted(glob.glob(path))) == file_stats
+    except OSError:
+        return False
+
+
+def _read_cached_map(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            expanded_paths, included_files, c_map = pickle.load(f)
+    except Exception:
+        # Missing, incompatible, or corrupted cache files are replaced.
+        return None
+    if any(expand_path(value) != expanded for value, expanded in expanded_paths):
+        return None
+    if not all(_includes_unchanged(path, file_stats) for path, file_stats in included_files):
+        return None
+    return c_map
+
+
+def _write_cached_map(cache_file, expanded_paths, included_files, c_map):
+    temp_file = '{0}.{1}.tmp'.format(cache_file, os.getpid())
+    with open(temp_file, 'wb') as f:
+        pickle.dump((expanded_paths, included_files, c_map), f, pickle.HIGHEST_PROTOCOL)
+    os.rename(temp_file, cache_file)
+
+
+def load_map_file(filename, name=None, check_integrity=True, cache_dir=None):
     """
     Loads a ContainerMap configuration from a YAML file.
 
@@ -106,6 +362,10 @@ def load_map_file(filename, name=None, check_integrity=True):
     :type name: unicode
     :param check_integrity: Performs a brief integrity check; default is ``True``.
     :type check_integrity: bool
+    :param cache_dir: Optional directory for caching the loaded map. Cache entries are identified by the file contents
+      and the arguments, and re-used as long as paths tagged with ``!path`` expand to the same values, and the
+      patterns of ``!include`` match the same files with an unchanged size and modification time.
+    :type cache_dir: unicode
     :return: A ContainerMap object.
     :rtype: ContainerMap
     """
@@ -114,8 +374,63 @@ def load_map_file(filename, name=None, check_integrity=True):
         map_name, __, __ = os.path.basename(base_name).rpartition(os.path.extsep)
     else:
         map_name = name
-    with open(filename, 'r') as f:
-        return load_map(f, name=map_name, check_integrity=check_integrity)
+    if not cache_dir:
+        with open(filename, 'r') as f:
+            return load_map(f, name=map_name, check_integrity=check_integrity)
+    with open(filename, 'rb') as f:
+        content = f.read()
+    cache_file = os.path.join(cache_dir, '{0}.pickle'.format(_get_cache_key(content, map_name, check_integrity)))
+    c_map = _read_cached_map(cache_file)
+    if c_map is not None:
+        return c_map
+    expanded_paths = []
+    included_files = []
+    map_dict = _load(content, os.path.dirname(filename), expanded_paths, included_files,
+                     (os.path.realpath(filename), ))
+    c_map = _get_map(map_dict, map_name, check_integrity, True)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    _write_cached_map(cache_file, expanded_paths, included_files, c_map)
+    return c_map
+
+
+def load_map_files(filenames, name=None, check_integrity=True, check_duplicates=True, processes=None):
+    """
+    Loads a ContainerMap configuration from multiple YAML files. Files are parsed concurrently (see
+    :func:`parse_files`), and merged into one map in the order of their file names, using
+    :meth:`~dockermap.map.container.ContainerMap.merge`.
+
+    :param filenames: File names, glob patterns, or directories. Of directories, all files ending with ``.yaml`` or
+      ``.yml`` are included.
+    :type filenames: unicode | list[unicode]
+    :param name: Name of the ContainerMap. If not provided, the first ``name`` element found on the root level of the
+      documents is used.
+    :type name: unicode
+    :param check_integrity: Performs a brief integrity check after merging all files; default is ``True``.
+    :type check_integrity: bool
+    :param check_duplicates: Check for duplicate attached volumes during integrity check.
+    :type check_duplicates: bool
+    :param processes: Number of processes to use for parsing. By default uses the number of CPUs.
+    :type processes: int
+    :return: A ContainerMap object.
+    :rtype: ContainerMap
+    """
+    documents = []
+    map_name = name
+    for filename, map_dict in parse_files(filenames, processes=processes):
+        if not isinstance(map_dict, dict):
+            raise ValueError("Valid map could not be decoded from '{0}'.".format(filename))
+        doc_name = map_dict.pop('name', None)
+        map_name = map_name or doc_name
+        documents.append(map_dict)
+    if not map_name:
+        raise ValueError("No map name provided, and none found in YAML files.")
+    c_map = ContainerMap(map_name)
+    for map_dict in documents:
+        c_map.merge(map_dict)
+    if check_integrity:
+        c_map.check_integrity(check_duplicates=check_duplicates)
+    return c_map
 
 
 def load_clients_file(filename, configuration_class=ClientConfiguration):
@@ -131,3 +446,27 @@ def load_clients_file(filename, configuration_class=ClientConfiguration):
     """
     with open(filename, 'r') as f:
         return load_clients(f, configuration_class=configuration_class)
+
+
+def load_clients_files(filenames, configuration_class=ClientConfiguration, processes=None):
+    """
+    Loads client configurations from multiple YAML files. Files are parsed concurrently (see :func:`parse_files`).
+    Where client names are found in more than one file, the file name sorting last takes precedence.
+
+    :param filenames: File names, glob patterns, or directories. Of directories, all files ending with ``.yaml`` or
+      ``.yml`` are included.
+    :type filenames: unicode | list[unicode]
+    :param configuration_class: Class of the configuration object to create.
+    :type configuration_class: class
+    :param processes: Number of processes to use for parsing. By default uses the number of CPUs.
+    :type processes: int
+    :return: A dictionary of client configuration objects.
+    :rtype: dict[unicode, dockermap.map.config.ClientConfiguration]
+    """
+    client_dict = {}
+    for filename, file_dict in parse_files(filenames, processes=processes):
+        if not isinstance(file_dict, dict):
+            raise ValueError("Valid configuration could not be decoded from '{0}'.".format(filename))
+        client_dict.update(file_dict)
+    return {client_name: configuration_class(**client_config)
+            for client_name, client_config in six.iteritems(client_dict)}
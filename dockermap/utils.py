@@ -1,14 +1,49 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import codecs
+import hashlib
 import json
+import logging
 import os
+import re
+import time
+from collections import namedtuple
+
+import six
 
 from .functional import lazy_once
 
 
-expand_path = lambda value: os.path.expanduser(os.path.expandvars(value))
-expand_path_lazy = lambda value: lazy_once(expand_path, value)
+log = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+TransferStats = namedtuple('TransferStats', ('size', 'written', 'duration', 'checksum'))
+
+
+def expand_path(value):
+    """
+    Expands environment variables and the user home directory in a path.
+
+    :param value: Path.
+    :type value: unicode
+    :return: Expanded path.
+    :rtype: unicode
+    """
+    return os.path.expanduser(os.path.expandvars(value))
+
+
+def expand_path_lazy(value):
+    """
+    Same as :func:`expand_path`, but delays the expansion until the value is needed.
+
+    :param value: Path.
+    :type value: unicode
+    :return: Lazy object that returns the expanded path.
+    :rtype: dockermap.functional.LazyOnceObject
+    """
+    return lazy_once(expand_path, value)
 
 
 def parse_response(response):
@@ -28,6 +63,49 @@ def parse_response(response):
     return obj
 
 
+def iter_json_stream(chunks):
+    """
+    Decodes a stream of concatenated JSON objects, as returned by the Docker Remote API for builds, pulls, and pushes.
+    Unlike :func:`parse_response`, objects do not need to align with chunks: Incomplete objects are buffered until the
+    next chunk arrives, and a single chunk may contain multiple objects. Only the undecoded remainder is kept in memory.
+    Invalid lines are skipped.
+
+    :param chunks: Iterable of response chunks, as bytes or unicode strings.
+    :type chunks: collections.Iterable[bytes | unicode]
+    :return: Iterator over the decoded objects.
+    :rtype: collections.Iterator[dict]
+    """
+    raw_decode = json.JSONDecoder().raw_decode
+    text_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    buf = ''
+    for chunk in chunks:
+        if isinstance(chunk, six.binary_type):
+            chunk = text_decoder.decode(chunk)
+        buf += chunk
+        pos = WHITESPACE.match(buf).end()
+        length = len(buf)
+        while pos < length:
+            try:
+                obj, pos = raw_decode(buf, pos)
+            except ValueError:
+                # Objects do not span multiple lines. If there is a line break, the object is not just incomplete.
+                line_end = buf.find('\n', pos)
+                if line_end < 0:
+                    break
+                log.debug("Skipping invalid stream content: %s", buf[pos:line_end])
+                pos = line_end + 1
+            else:
+                if isinstance(obj, dict):
+                    yield obj
+            pos = WHITESPACE.match(buf, pos).end()
+        buf = buf[pos:]
+    buf += text_decoder.decode(b'', True)
+    if buf.strip():
+        obj = parse_response(buf)
+        if obj and isinstance(obj, dict):
+            yield obj
+
+
 def is_repo_image(image):
     """
     Checks whether the given image has a name, i.e. is a repository image. This does not imply that it is
@@ -51,3 +129,126 @@ def is_latest_image(image):
     :rtype: bool
     """
     return any(':latest' in tag for tag in image['RepoTags'])
+
+
+class TransferReader(object):
+    """
+    Read-only file-like wrapper around a response stream, which counts the transferred bytes and computes a checksum
+    while the data is read. Progress is reported to a callback at most once per ``progress_interval``.
+
+    :param fileobj: Response stream.
+    :param checksum: Name of the hash algorithm (see :func:`hashlib.new`), or ``None`` for not computing a checksum.
+    :type checksum: unicode
+    :param progress: Callback, which is called with the number of bytes read so far and the elapsed time in seconds.
+    :type progress: callable
+    :param progress_interval: Minimum interval between progress reports in seconds.
+    :type progress_interval: float
+    """
+    def __init__(self, fileobj, checksum='sha256', progress=None, progress_interval=1.0):
+        self._fileobj = fileobj
+        self._digest = hashlib.new(checksum) if checksum else None
+        self._progress = progress
+        self._progress_interval = progress_interval
+        self._size = 0
+        self._start_time = self._last_report = time.time()
+        self._end_time = None
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        if data:
+            self._size += len(data)
+            if self._digest is not None:
+                self._digest.update(data)
+            if self._progress is not None:
+                current_time = time.time()
+                if current_time - self._last_report >= self._progress_interval:
+                    self._last_report = current_time
+                    self._progress(self._size, current_time - self._start_time)
+        elif self._end_time is None:
+            self._end_time = time.time()
+        return data
+
+    @property
+    def size(self):
+        """
+        Number of bytes read.
+
+        :return: Size in bytes.
+        :rtype: int
+        """
+        return self._size
+
+    @property
+    def duration(self):
+        """
+        Time between creating this object and reaching the end of the stream, or until now if the end has not been
+        reached.
+
+        :return: Duration in seconds.
+        :rtype: float
+        """
+        return (self._end_time or time.time()) - self._start_time
+
+    @property
+    def checksum(self):
+        """
+        Hexadecimal digest of the data read so far.
+
+        :return: Checksum, or ``None`` if no hash algorithm has been set.
+        :rtype: unicode
+        """
+        if self._digest is None:
+            return None
+        return self._digest.hexdigest()
+
+
+def _get_common_length(data1, data2):
+    low, high = 0, min(len(data1), len(data2))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if data1[:middle] == data2[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def write_stream(fileobj, local_filename, buffer_size=1024 * 1024, resume=False):
+    """
+    Writes a stream to a local file, reading blocks of ``buffer_size``.
+
+    If ``resume`` is set and the file exists, the existing file is verified and repaired instead of being rewritten:
+    The stream is compared to the file contents, and only from the first difference or from the end of the existing
+    file, the remaining stream is written. This does not resume the transfer itself. Since the Docker Remote API does
+    not support ranges, the entire stream is still read from the beginning; only local writes are saved.
+
+    :param fileobj: File-like object to read from.
+    :param local_filename: Local file to write to.
+    :type local_filename: unicode
+    :param buffer_size: Size of blocks to read and write.
+    :type buffer_size: int
+    :param resume: Verify and repair an existing file, keeping its matching contents.
+    :type resume: bool
+    :return: Number of bytes written to the file.
+    :rtype: int
+    """
+    verify = resume and os.path.isfile(local_filename)
+    written = 0
+    with open(local_filename, 'r+b' if verify else 'wb') as f:
+        while True:
+            data = fileobj.read(buffer_size)
+            if not data:
+                break
+            if verify:
+                existing = f.read(len(data))
+                if existing == data:
+                    continue
+                common_length = _get_common_length(existing, data)
+                f.seek(common_length - len(existing), os.SEEK_CUR)
+                data = data[common_length:]
+                verify = False
+                log.debug("Repairing %s from %d bytes.", local_filename, f.tell())
+            f.write(data)
+            written += len(data)
+        f.truncate()
+    return written
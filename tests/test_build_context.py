@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import warnings
+
+from dockermap.build.buffer import FinalizedError
+from dockermap.build.cache import ContextCache
+from dockermap.build.context import DockerContext
+from dockermap.build.dockerfile import DockerFile
+from dockermap.map.base import DockerClientWrapper
+
+
+class ContextRecordingClient(DockerClientWrapper):
+    def __init__(self):
+        super(ContextRecordingClient, self).__init__('tcp://127.0.0.1:2375')
+        self.contexts = []
+
+    def build(self, tag, fileobj=None, encoding=None, **kwargs):
+        data = b''.join(fileobj) if not hasattr(fileobj, 'read') else fileobj.read()
+        self.contexts.append((data, encoding))
+        return 'image_id'
+
+
+class DockerContextTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.src_dir = os.path.join(self.temp_dir, 'src')
+        os.makedirs(os.path.join(self.src_dir, 'lib'))
+        with open(os.path.join(self.src_dir, 'app.py'), 'wb') as f:
+            f.write(b'print("app")\n')
+        with open(os.path.join(self.src_dir, 'lib', 'data.bin'), 'wb') as f:
+            f.write(os.urandom(3 * 1024 * 1024))
+        self.archive = os.path.join(self.temp_dir, 'vendor.tar')
+        with tarfile.open(self.archive, 'w') as tf:
+            tf.add(os.path.join(self.src_dir, 'app.py'), arcname='vendor.py')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_dockerfile(self):
+        dockerfile = DockerFile('ubuntu')
+        dockerfile.add_file(self.src_dir, '/app')
+        dockerfile.add_archive(self.archive)
+        return dockerfile
+
+    def _get_members(self, data):
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r') as tf:
+            return {member.name: tf.extractfile(member).read() if member.isfile() else None for member in tf}
+
+    def test_stream_context(self):
+        with DockerContext(self._get_dockerfile(), finalize=True) as ctx:
+            expected = self._get_members(b''.join(ctx))
+        with DockerContext(self._get_dockerfile(), stream=True) as ctx:
+            self.assertTrue(ctx.streaming)
+            ctx.finalize()
+            self.assertRaises(FinalizedError, ctx.add, self.archive)
+            chunks = list(ctx)
+            self.assertRaises(ValueError, iter, ctx)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) >= DockerContext.stream_chunk_size for chunk in chunks[:-1]))
+        members = self._get_members(b''.join(chunks))
+        self.assertEqual(members, expected)
+        self.assertIn('Dockerfile', members)
+        self.assertIn('vendor.py', members)
+        self.assertEqual(members['app/app.py'], b'print("app")\n')
+
+    def test_stream_context_error(self):
+        with DockerContext(stream=True, compression=None) as ctx:
+            ctx.add(os.path.join(self.src_dir, 'app.py'), arcname='app.py')
+            ctx.add(os.path.join(self.temp_dir, 'missing'))
+            self.assertRaises(OSError, b''.join, ctx)
+
+    def test_parallel_compression(self):
+        with DockerContext(self._get_dockerfile(), finalize=True) as ctx:
+            expected = self._get_members(b''.join(ctx))
+        for stream in (False, True):
+            with DockerContext(self._get_dockerfile(), stream=stream, compression_level=1,
+                               compression_workers=3) as ctx:
+                ctx.finalize()
+                self.assertEqual(ctx.stream_encoding, 'gzip')
+                data = b''.join(ctx)
+                self.assertGreater(ctx._compression_writer.members, 3)
+            self.assertEqual(self._get_members(data), expected)
+            self.assertEqual(len(gzip.GzipFile(fileobj=io.BytesIO(data)).read()) % tarfile.RECORDSIZE, 0)
+
+    def test_uncompressed_fast_copy(self):
+        with DockerContext(self._get_dockerfile(), finalize=True) as ctx:
+            expected = self._get_members(b''.join(ctx))
+        with DockerContext(self._get_dockerfile(), compression=None) as ctx:
+            self.assertTrue(ctx.tarfile.fast_copy)
+            ctx.finalize()
+            self.assertIsNone(ctx.stream_encoding)
+            data = b''.join(ctx)
+        self.assertEqual(len(data) % tarfile.RECORDSIZE, 0)
+        self.assertEqual(self._get_members(data), expected)
+
+    def test_context_cache(self):
+        cache = ContextCache(os.path.join(self.temp_dir, 'cache'), max_size=1)
+        client = ContextRecordingClient()
+        self.assertEqual(client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache), 'image_id')
+        key = cache.get_key(self._get_dockerfile(), 'gz')
+        self.assertIsNotNone(cache.get(key))
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache)
+        self.assertEqual(client.contexts[0], client.contexts[1])
+        self.assertEqual(client.contexts[0][1], 'gzip')
+        self.assertEqual(self._get_members(client.contexts[0][0])['app/app.py'], b'print("app")\n')
+        self.assertNotEqual(cache.get_key(self._get_dockerfile(), None), key)
+        with open(os.path.join(self.src_dir, 'app.py'), 'ab') as f:
+            f.write(b'print("changed")\n')
+        changed_key = cache.get_key(self._get_dockerfile(), 'gz')
+        self.assertNotEqual(changed_key, key)
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache)
+        self.assertIn(b'changed', self._get_members(client.contexts[2][0])['app/app.py'])
+        # The cache exceeds its maximum size, so that only the last context is kept.
+        self.assertIsNone(cache.get(key))
+        self.assertIsNotNone(cache.get(changed_key))
+        self.assertEqual(len(os.listdir(cache.cache_dir)), 1)
+
+    def test_context_cache_options(self):
+        cache = ContextCache(os.path.join(self.temp_dir, 'cache'))
+        client = ContextRecordingClient()
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache)
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache, deterministic_context=True)
+        self.assertEqual(len(os.listdir(cache.cache_dir)), 2)
+        with gzip.GzipFile(fileobj=io.BytesIO(client.contexts[1][0])) as gz:
+            gz.read()
+            self.assertEqual(gz.mtime, 0)
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache, deterministic_context=True,
+                               context_exclude_patterns=['lib'])
+        self.assertEqual(len(os.listdir(cache.cache_dir)), 3)
+        self.assertNotIn('app/lib/data.bin', self._get_members(client.contexts[2][0]))
+        client.build_from_file(self._get_dockerfile(), 'test', context_cache=cache, deterministic_context=True)
+        self.assertEqual(client.contexts[3], client.contexts[1])
+        self.assertEqual(len(os.listdir(cache.cache_dir)), 3)
+
+    def test_context_cache_key(self):
+        cache = ContextCache(os.path.join(self.temp_dir, 'cache'))
+        app_file = os.path.join(self.src_dir, 'app.py')
+        key = cache.get_key(self._get_dockerfile())
+        st = os.stat(app_file)
+        with open(app_file, 'wb') as f:
+            f.write(b'print("abc")\n')
+        os.utime(app_file, (st.st_atime, st.st_mtime + 0.001))
+        self.assertNotEqual(cache.get_key(self._get_dockerfile()), key)
+        os.makedirs(os.path.join(self.src_dir, 'node_modules', 'pkg'))
+        module_file = os.path.join(self.src_dir, 'node_modules', 'pkg', 'index.js')
+        with open(module_file, 'wb') as f:
+            f.write(b'0')
+        key = cache.get_key(self._get_dockerfile(), exclude_patterns=['node_modules'])
+        with open(module_file, 'wb') as f:
+            f.write(b'changed')
+        self.assertEqual(cache.get_key(self._get_dockerfile(), exclude_patterns=['node_modules']), key)
+        self.assertNotEqual(cache.get_key(self._get_dockerfile(), exclude_patterns=['node_modules/**/*.css']), key)
+
+    def test_exclude_patterns(self):
+        for path in ('.git/objects', 'lib/node_modules/pkg', 'docs'):
+            os.makedirs(os.path.join(self.src_dir, path))
+        for path in ('.git/objects/abc', 'lib/node_modules/pkg/index.js', 'app.pyc', 'docs/a.md', 'docs/README.md'):
+            with open(os.path.join(self.src_dir, path), 'wb') as f:
+                f.write(b'0123456789')
+        patterns = ['.git', '**/node_modules', '*.pyc', 'docs/*.md', '!docs/README.md']
+        with DockerContext(compression=None, exclude_patterns=patterns) as ctx:
+            ctx.add(self.src_dir, arcname='src')
+            ctx.add(self.src_dir, arcname='unfiltered', exclude_patterns=[])
+            ctx.finalize()
+            members = self._get_members(b''.join(ctx))
+            self.assertEqual(ctx.exclude_stats, dict(files=2, size=20, directories=2))
+        self.assertEqual(sorted(name for name in members if name.startswith('src')),
+                         ['src', 'src/app.py', 'src/docs', 'src/docs/README.md', 'src/lib', 'src/lib/data.bin'])
+        self.assertIn('unfiltered/.git/objects/abc', members)
+
+    def test_add_positional_args(self):
+        def _exclude(name):
+            return name.endswith('.bin')
+
+        for patterns in (None, ['*.pyc']):
+            with DockerContext(compression=None, exclude_patterns=patterns) as ctx, warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                ctx.add(self.src_dir, 'src', True, _exclude)
+                ctx.finalize()
+                members = self._get_members(b''.join(ctx))
+            self.assertEqual(sorted(members), ['src', 'src/app.py', 'src/lib'])
+
+    def test_deterministic_context(self):
+        def _get_context_data(src_dir, **kwargs):
+            dockerfile = DockerFile('ubuntu')
+            dockerfile.add_file(src_dir, '/app')
+            dockerfile.add_archive(self.archive)
+            with DockerContext(dockerfile, deterministic=True, **kwargs) as ctx:
+                ctx.finalize()
+                return b''.join(ctx)
+
+        copy_dir = os.path.join(self.temp_dir, 'copy')
+        shutil.copytree(self.src_dir, copy_dir)
+        os.utime(os.path.join(copy_dir, 'app.py'), (1000000000, 1000000000))
+        for kwargs in (dict(), dict(stream=True), dict(compression=None), dict(compression_workers=2)):
+            data = _get_context_data(self.src_dir, **kwargs)
+            self.assertEqual(data, _get_context_data(copy_dir, **kwargs))
+        with tarfile.open(fileobj=io.BytesIO(data)) as tf:
+            self.assertEqual(set(member.mtime for member in tf), {0})
+            self.assertEqual(set(member.uname for member in tf), {''})
+            self.assertEqual(tf.getnames()[:3], ['app', 'app/lib', 'app/app.py'])
+
+    def test_add_archive(self):
+        gz_archive = os.path.join(self.temp_dir, 'lib.tar.gz')
+        with tarfile.open(gz_archive, 'w:gz') as tf:
+            tf.add(os.path.join(self.src_dir, 'lib'), arcname='lib')
+        dockerfile = DockerFile('ubuntu')
+        self.assertEqual(dockerfile.add_archive(self.archive), ['vendor.py'])
+        self.assertEqual(dockerfile.add_archive(gz_archive, ctx_path='archives/lib'), [])
+        self.assertRaises(ValueError, dockerfile.add_archive, gz_archive, remove_final=True, ctx_path='lib')
+        self.assertIn('ADD archives/lib/ /', dockerfile.getvalue())
+        for compression in (None, 'gz'):
+            with DockerContext(dockerfile, compression=compression, finalize=True) as ctx:
+                self.assertEqual(ctx.archive_roots, {self.archive: ['vendor.py'], gz_archive: ['lib']})
+                members = self._get_members(ctx.fileobj.read())
+            self.assertEqual(members['vendor.py'], b'print("app")\n')
+            self.assertIn('archives/lib/lib', members)
+            self.assertEqual(len(members['archives/lib/lib/data.bin']), 3 * 1024 * 1024)
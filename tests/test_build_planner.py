@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from dockermap.build.dockerfile import DockerFile
+from dockermap.build.planner import BuildPlanner, get_image_tag
+from dockermap.map.config import ClientConfiguration
+
+
+class BuildRecorder(object):
+    wait_timeout = 2
+
+    def __init__(self, delay=0.01, fail=(), overlapping=()):
+        self.delay = delay
+        self.fail = fail
+        self.overlapping = overlapping
+        self.events = []
+        self.running = 0
+        self.max_running = 0
+        self.clients = []
+        self.lock = threading.Condition()
+
+    def wait_for_overlap(self, tag):
+        # Builds of a group of overlapping images wait until all of them have started.
+        deadline = time.time() + self.wait_timeout
+        for group in self.overlapping:
+            if tag in group:
+                while (not all(('start', g_tag) in self.events for g_tag in group) and
+                       time.time() < deadline):
+                    self.lock.wait(deadline - time.time())
+
+
+class SleepingBuildClient(object):
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.thread = None
+        with recorder.lock:
+            recorder.clients.append(self)
+
+    def build_from_file(self, dockerfile, tag, **kwargs):
+        recorder = self.recorder
+        with recorder.lock:
+            if self.thread is None:
+                self.thread = threading.current_thread()
+            elif self.thread is not threading.current_thread():
+                raise AssertionError("Client is used by multiple threads.")
+            recorder.running += 1
+            recorder.max_running = max(recorder.max_running, recorder.running)
+            recorder.events.append(('start', tag))
+            recorder.lock.notify_all()
+            recorder.wait_for_overlap(tag)
+        time.sleep(recorder.delay)
+        with recorder.lock:
+            recorder.running -= 1
+            recorder.events.append(('end', tag))
+        if tag in recorder.fail:
+            raise ValueError(tag)
+        return 'id_{0}'.format(tag)
+
+
+class SleepingClientConfiguration(ClientConfiguration):
+    def __init__(self, recorder):
+        super(SleepingClientConfiguration, self).__init__()
+        self.recorder = recorder
+
+    def client_constructor(self, **kwargs):
+        return SleepingBuildClient(self.recorder)
+
+
+class BuildPlannerTest(unittest.TestCase):
+    def test_image_tag(self):
+        self.assertEqual(get_image_tag('ubuntu'), 'ubuntu:latest')
+        self.assertEqual(get_image_tag('ubuntu:16.04'), 'ubuntu:16.04')
+        self.assertEqual(get_image_tag('registry:5000/app'), 'registry:5000/app:latest')
+
+    def test_baseimage(self):
+        self.assertEqual(DockerFile('ubuntu:16.04').baseimage, 'ubuntu:16.04')
+        self.assertEqual(DockerFile(None, initial='# Comment\nFROM base AS build').baseimage, 'base')
+        self.assertIsNone(DockerFile(None).baseimage)
+
+    def _get_planner(self, recorder, workers):
+        planner = BuildPlanner(SleepingClientConfiguration(recorder), workers=workers)
+        planner.add(DockerFile('ubuntu'), 'base')
+        planner.add(DockerFile('base:latest'), 'runtime:1.0')
+        planner.add(DockerFile('runtime:1.0'), 'app1')
+        planner.add(DockerFile('runtime:1.0'), 'app2')
+        planner.add(DockerFile('base'), 'tools')
+        return planner
+
+    def test_dependencies(self):
+        planner = self._get_planner(BuildRecorder(), 2)
+        self.assertEqual(dict(planner.get_dependencies()), {
+            'base:latest': None,
+            'runtime:1.0': 'base:latest',
+            'app1:latest': 'runtime:1.0',
+            'app2:latest': 'runtime:1.0',
+            'tools:latest': 'base:latest',
+        })
+        planner.add(DockerFile('cycle2'), 'cycle1')
+        planner.add(DockerFile('cycle1'), 'cycle2')
+        self.assertRaises(ValueError, planner.get_dependencies)
+
+    def test_build(self):
+        recorder = BuildRecorder(overlapping=[('runtime:1.0', 'tools'), ('app1', 'app2')])
+        report = self._get_planner(recorder, 2).build()
+        self.assertEqual(len(report.image_ids), 5)
+        self.assertEqual(report.image_ids['app1'], 'id_app1')
+        self.assertEqual(recorder.max_running, 2)
+        self.assertEqual(len(recorder.clients), 2)
+        events = recorder.events
+        for parent, child in (('base', 'runtime:1.0'), ('base', 'tools'), ('runtime:1.0', 'app1'),
+                              ('runtime:1.0', 'app2')):
+            self.assertLess(events.index(('end', parent)), events.index(('start', child)))
+        for tag1, tag2 in (('runtime:1.0', 'tools'), ('app1', 'app2')):
+            self.assertLess(events.index(('start', tag1)), events.index(('end', tag2)))
+            self.assertLess(events.index(('start', tag2)), events.index(('end', tag1)))
+        durations = report.durations
+        chains = [['base', 'tools'], ['base', 'runtime:1.0', 'app1'], ['base', 'runtime:1.0', 'app2']]
+        chain_times = [sum(durations[tag] for tag in chain) for chain in chains]
+        self.assertIn(report.critical_path, chains)
+        self.assertAlmostEqual(report.critical_path_time, max(chain_times))
+        self.assertGreaterEqual(report.wall_time, report.critical_path_time)
+
+    def test_worker_limit(self):
+        recorder = BuildRecorder()
+        self._get_planner(recorder, 1).build()
+        self.assertEqual(recorder.max_running, 1)
+
+    def test_client_instance(self):
+        recorder = BuildRecorder(overlapping=[('app1', 'app3')])
+        client = SleepingBuildClient(recorder)
+        planner = BuildPlanner(client, workers=3)
+        planner.add(DockerFile('ubuntu'), 'app1')
+        planner.add(DockerFile('ubuntu'), 'app2')
+        planner.add(DockerFile('ubuntu'), 'app3', client=SleepingBuildClient(recorder))
+        report = planner.build()
+        self.assertEqual(len(report.image_ids), 3)
+        self.assertEqual(recorder.max_running, 2)
+        self.assertEqual(len(recorder.clients), 2)
+
+    def test_failed_build(self):
+        recorder = BuildRecorder(fail=('runtime:1.0', ))
+        report = self._get_planner(recorder, 2).build()
+        self.assertEqual(list(report.image_ids), ['base', 'tools'])
+        self.assertEqual(report.failed, ['runtime:1.0', 'app1', 'app2'])
+        self.assertNotIn(('start', 'app1'), recorder.events)
+        self.assertRaises(ValueError, self._get_planner(recorder, 2).build, raise_on_error=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
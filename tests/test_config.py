@@ -3,7 +3,8 @@ from __future__ import unicode_literals
 
 import unittest
 
-from dockermap.map.container import ContainerMap
+from dockermap.map.config import ClientConfiguration, ContainerConfiguration, HostVolumeConfiguration
+from dockermap.map.container import ContainerMap, MapIntegrityError, MapIntegrityIndex
 from dockermap.map.input import SharedVolume, PortBinding, NotSet
 from tests import MAP_DATA_2, MAP_DATA_3
 
@@ -144,6 +145,58 @@ class TestConfig(unittest.TestCase):
             },
         })
 
+    def test_extended_config_cache(self):
+        cfg_base = self.sample_map.get_existing('abstract_config')
+        cfg1_1 = self.sample_map.get_existing('worker')
+        cfg1 = self.sample_map.get_extended(cfg1_1)
+        cfg1.attaches.append('modified')
+        self.assertIsNot(self.sample_map.get_extended(cfg1_1), cfg1)
+        self.assertEqual(self.sample_map.get_extended(cfg1_1).attaches, ['app_log'])
+        cfg_base.user = 'new_user'
+        cfg2 = self.sample_map.get_extended(cfg1_1)
+        self.assertEqual(cfg2.user, 'new_user')
+        cfg1_1.merge(dict(attaches=['worker_log']))
+        self.assertEqual(self.sample_map.get_extended(cfg1_1).attaches, ['app_log', 'worker_log'])
+        cfg_base.uses.append('new_dependency')
+        self.assertIn('new_dependency', self.sample_map.get_extended(cfg1_1).uses)
+        self.sample_map.containers['abstract_config'] = ContainerConfiguration(abstract=True, user='replaced_user')
+        self.assertEqual(self.sample_map.get_extended(cfg1_1).user, 'replaced_user')
+
+    def test_compact_representation(self):
+        cfg = ContainerConfiguration(image='image', instances=['a', 'b'])
+        self.assertFalse(hasattr(cfg, '__dict__'))
+        self.assertRaises(AttributeError, setattr, cfg, 'unknown_attribute', 1)
+        host = HostVolumeConfiguration('/var/lib/app', app_data='data')
+        self.assertFalse(hasattr(host, '__dict__'))
+        self.assertEqual(host.root, '/var/lib/app')
+        self.assertEqual(host.get('app_data'), '/var/lib/app/data')
+        client = ClientConfiguration(base_url='unix://var/run/docker.sock', interfaces={'private': '10.0.0.11'})
+        self.assertFalse(hasattr(client, '__dict__'))
+        self.assertEqual(client.interfaces.private, '10.0.0.11')
+        self.assertNotIn('interfaces', client)
+        self.assertEqual(client['base_url'], 'unix://var/run/docker.sock')
+
+    def test_integrity_check(self):
+        index = MapIntegrityIndex(self.sample_map)
+        self.assertIn('server', index.refresh())
+        self.assertFalse(index.refresh())
+        self.assertEqual(index.get_violations(), [])
+        cfg = self.sample_map.get_existing('server')
+        cfg.links = 'missing_container'
+        cfg.uses = 'missing_volume'
+        self.assertEqual(index.refresh(), {'server'})
+        self.assertEqual(len(index.get_violations()), 2)
+        with self.assertRaises(MapIntegrityError) as cm:
+            self.sample_map.check_integrity()
+        self.assertEqual(cm.exception.violations, [
+            "No shared or attached volumes found for used volume(s): missing_volume.",
+            "No container instance found for link(s): missing_container.",
+        ])
+        del self.sample_map.containers['server']
+        self.assertEqual(index.refresh(), {'server'})
+        self.assertEqual(index.get_violations(), [])
+        self.sample_map.check_integrity()
+
     def test_partial_extended_map(self):
         self.assertEqual(self.ext_simple.host.root, MAP_DATA_3.get('host_root'))
 
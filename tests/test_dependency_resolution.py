@@ -5,7 +5,9 @@ import unittest
 
 from dockermap.map.base import ContainerImageResolver
 from dockermap.map.container import ContainerMap
-from dockermap.map.policy.dep import ContainerDependencyResolver
+from dockermap.map.dep import CircularDependency
+from dockermap.map.policy.dep import ContainerDependencyResolver, CompactContainerDependencyResolver
+from dockermap.map.policy.simple import SimplePolicy
 
 
 TEST_MAP_DATA = {
@@ -27,12 +29,23 @@ TEST_IMG_DATA = [
 ]
 TEST_CONTAINER_IMAGES = {'a', 'c', 'f'}
 
+TEST_CIRCULAR_MAP_DATA = {
+    'a': dict(uses='b'),
+    'b': dict(uses='c'),
+    'c': dict(links='a'),
+    'd': dict(uses='a', links='e'),
+    'e': dict(links='f'),
+    'f': dict(links='e'),
+}
+
 
 class ContainerDependencyTest(unittest.TestCase):
+    resolver_class = ContainerDependencyResolver
+
     def setUp(self):
         test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
-        self.f_res = ContainerDependencyResolver(test_map)
-        self.r_res = ContainerDependencyResolver()
+        self.f_res = self.resolver_class(test_map)
+        self.r_res = self.resolver_class()
         self.r_res.update_backward(test_map)
 
     def assertOrder(self, dependency_list, *items):
@@ -65,8 +78,11 @@ class ContainerDependencyTest(unittest.TestCase):
 
     def test_backward_resolution_order(self):
         f_dep = self.r_res.get_container_dependencies('test_map', 'f')
+        # x and a both depend on b, but not on one another.
         self.assertOrder(f_dep,
                          ('test_map', 'x', None),
+                         ('test_map', 'b', None))
+        self.assertOrder(f_dep,
                          ('test_map', 'a', None),
                          ('test_map', 'b', None))
         e_dep = self.r_res.get_container_dependencies('test_map', 'e')
@@ -75,6 +91,114 @@ class ContainerDependencyTest(unittest.TestCase):
                          ('test_map', 'b', None),
                          ('test_map', 'd', None))
 
+    def test_deep_hierarchy(self):
+        chain_length = 1500
+        chain_data = {'c{0}'.format(i): dict(links='c{0}'.format(i + 1)) for i in range(chain_length)}
+        chain_data['c{0}'.format(chain_length)] = dict()
+        chain_map = ContainerMap('chain_map', initial=chain_data, check_integrity=False)
+        res = self.resolver_class(chain_map)
+        c0_dep = res.get_container_dependencies('chain_map', 'c0')
+        self.assertEqual(len(c0_dep), chain_length)
+        self.assertEqual(c0_dep[0], ('chain_map', 'c{0}'.format(chain_length), None))
+        self.assertEqual(c0_dep[-1], ('chain_map', 'c1', None))
+
+    def test_circular_dependencies(self):
+        circular_map = ContainerMap('test_map', initial=TEST_CIRCULAR_MAP_DATA, check_integrity=False)
+        res = self.resolver_class(circular_map)
+        with self.assertRaises(CircularDependency) as cm:
+            res.get_container_dependencies('test_map', 'd')
+        cycles = sorted(sorted(c[1] for c in cycle) for cycle in cm.exception.cycles)
+        self.assertEqual(cycles, [['a', 'b', 'c'], ['e', 'f']])
+        self.assertEqual(len(res.find_cycles()), 2)
+        a_res = self.resolver_class(circular_map)
+        self.assertRaises(CircularDependency, a_res.get_container_dependencies, 'test_map', 'a')
+
+    def test_incremental_update(self):
+        test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
+        self.f_res.get_container_dependencies('test_map', 'a')
+        self.r_res.get_container_dependencies('test_map', 'f')
+        c_item = ('test_map', 'c', None)
+        f_item = ('test_map', 'f', None)
+        x_item = ('test_map', 'x', None)
+        invalidated = self.f_res.replace(c_item, [f_item])
+        self.assertIn(('test_map', 'a', None), invalidated)
+        self.assertNotIn(('test_map', 'b', None), invalidated)
+        self.r_res.replace_backward(c_item, [f_item])
+        self.f_res.remove(x_item)
+        self.r_res.remove(x_item)
+
+        test_map.containers['c'].uses = ['f']
+        del test_map.containers['x']
+        new_items = dict(test_map.dependency_items)
+        f_res = self.resolver_class(test_map)
+        r_res = self.resolver_class()
+        r_res.update_backward(test_map)
+        for item in new_items:
+            self.assertItemsEqual(self.f_res.get_dependencies(item), f_res.get_dependencies(item))
+            self.assertItemsEqual(self.r_res.get_dependencies(item), r_res.get_dependencies(item))
+        a_dep = self.f_res.get_container_dependencies('test_map', 'a')
+        self.assertOrder(a_dep, f_item, c_item)
+        self.assertNotIn(x_item, self.r_res.get_dependencies(f_item))
+        self.assertFalse(self.f_res.get_dependencies(x_item))
+
+
+class CompactContainerDependencyTest(ContainerDependencyTest):
+    resolver_class = CompactContainerDependencyResolver
+
+    def test_same_dependencies(self):
+        test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
+        f_res = ContainerDependencyResolver(test_map)
+        for c_name in TEST_MAP_DATA:
+            self.assertItemsEqual(self.f_res.get_container_dependencies('test_map', c_name),
+                                  f_res.get_container_dependencies('test_map', c_name))
+
+    def test_removed_indexes(self):
+        test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
+        a_item = ('test_map', 'a', None)
+        f_item = ('test_map', 'f', None)
+        item_count = len(self.f_res._items)
+        for i in range(10):
+            item = ('test_map', 'temp{0}'.format(i), None)
+            self.f_res.replace(item, [a_item])
+            self.assertOrder(self.f_res.get_dependencies(item), f_item, a_item)
+            self.f_res.remove(item)
+            self.assertFalse(self.f_res.get_dependencies(item))
+        self.assertEqual(len(self.f_res._items), item_count + 1)
+        self.assertItemsEqual(self.f_res.get_container_dependencies('test_map', 'a'),
+                              ContainerDependencyResolver(test_map).get_container_dependencies('test_map', 'a'))
+
+
+class PolicyMapUpdateTest(unittest.TestCase):
+    def test_update_map(self):
+        test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
+        policy = SimplePolicy({'test_map': test_map}, {})
+        self.assertIn(('test_map', 'e', None), list(policy.get_dependencies('test_map', 'a')))
+        test_map.containers['b'].uses = ['f']
+        test_map.containers['b'].links = []
+        affected = policy.update_map(test_map)
+        self.assertIn(('test_map', 'a', None), affected)
+        self.assertNotIn(('test_map', 'c', None), affected)
+        a_dep = list(policy.get_dependencies('test_map', 'a'))
+        self.assertNotIn(('test_map', 'e', None), a_dep)
+        self.assertNotIn(('test_map', 'b', None), list(policy.get_dependents('test_map', 'e')))
+        self.assertFalse(policy.update_map(test_map))
+
+    def test_dependency_path_index(self):
+        test_map = ContainerMap('test_map', initial=TEST_MAP_DATA, check_integrity=False)
+        policy = SimplePolicy({'test_map': test_map}, {})
+        a_dep = policy.get_dependencies('test_map', 'a')
+        self.assertIsInstance(a_dep, tuple)
+        self.assertIs(policy.get_dependencies('test_map', 'a'), a_dep)
+        self.assertIn(('test_map', 'b', None), a_dep)
+        stats = policy.dependency_path_stats
+        self.assertEqual(stats['dependencies'], 1)
+        self.assertEqual(stats['dependents'], 0)
+        self.assertGreater(stats['size'], 0)
+        test_map.containers['c'].uses = ['f']
+        policy.update_map(test_map)
+        self.assertEqual(policy.dependency_path_stats['dependencies'], 0)
+        self.assertIn(('test_map', 'f', None), policy.get_dependencies('test_map', 'a'))
+
 
 class ImageDependencyTest(unittest.TestCase):
     def setUp(self):
@@ -7,7 +7,7 @@ from dockermap.functional import lazy_once
 from dockermap.map.input import (is_path, read_only, get_list, get_shared_volume, get_shared_volumes,
                                  get_shared_host_volume, get_shared_host_volumes, SharedVolume,
                                  get_container_link, get_container_links, ContainerLink,
-                                 get_port_binding, get_port_bindings, PortBinding)
+                                 get_port_binding, get_port_bindings, PortBinding, merge_list)
 
 
 class InputConversionTest(unittest.TestCase):
@@ -36,6 +36,16 @@ class InputConversionTest(unittest.TestCase):
         self.assertEqual(get_list(lazy_once(lambda: 'test')), ['test'])
         self.assertEqual(get_list('test'), ['test'])
 
+    def test_merge_list(self):
+        l = ['a', 'b']
+        merge_list(l, ['c', 'a', 'd', 'c'])
+        self.assertEqual(l, ['a', 'b', 'c', 'd'])
+        merge_list(l, None)
+        self.assertEqual(l, ['a', 'b', 'c', 'd'])
+        l = ['a', ['x'], lazy_once(lambda: 'b')]
+        merge_list(l, ['b', ['x'], ['y'], 'e'])
+        self.assertEqual(l, ['a', ['x'], 'b', ['y'], 'e'])
+
     def test_get_shared_volume(self):
         assert_a = lambda a: self.assertEqual(get_shared_volume(a), SharedVolume('a', False))
         assert_b = lambda b: self.assertEqual(get_shared_volume(b), SharedVolume('b', True))
@@ -4,8 +4,11 @@ from __future__ import unicode_literals
 import unittest
 
 from docker.utils.utils import create_host_config
+from dockermap.functional import lazy
 from dockermap.api import ClientConfiguration, ContainerMap
 from dockermap.map.policy.base import BasePolicy
+from dockermap.map.policy.cache import _copy_kwargs
+from dockermap.map.policy.simple import SimplePolicy
 
 from tests import MAP_DATA_1, CLIENT_DATA_1, MAP_DATA_4
 
@@ -249,4 +252,71 @@ class TestPolicyClientKwargs(unittest.TestCase):
             domainname=None,
             ports=[80,443],
 
-        ))
\ No newline at end of file
+        ))
+
+
+class CountingPolicy(SimplePolicy):
+    create_calls = 0
+
+    @classmethod
+    def get_create_kwargs(cls, *args, **kwargs):
+        cls.create_calls += 1
+        return super(CountingPolicy, cls).get_create_kwargs(*args, **kwargs)
+
+
+class TestPolicyKwargsCache(unittest.TestCase):
+    def setUp(self):
+        self.client_config = ClientConfiguration(**CLIENT_DATA_1)
+        self.policy = CountingPolicy({'main': ContainerMap('main', MAP_DATA_1)}, {'__default__': self.client_config})
+        self.c_map = self.policy.container_maps['main']
+        CountingPolicy.create_calls = 0
+
+    def _get_create_kwargs(self, kwargs=None, include_host_config=False):
+        cfg = self.c_map.get_existing('web_server')
+        return self.policy.get_create_kwargs(self.c_map, 'web_server', cfg, '__default__', self.client_config,
+                                             'main.web_server', None, include_host_config=include_host_config,
+                                             kwargs=kwargs)
+
+    def test_cached_create_kwargs(self):
+        with self.policy.kwargs_cache_scope():
+            kwargs = self._get_create_kwargs()
+            self.assertEqual(kwargs['ports'], [80, 443])
+            kwargs['ports'].append(8080)
+            self.assertEqual(self._get_create_kwargs(kwargs=dict(ports=[22]))['ports'], [80, 443, 22])
+            self.assertEqual(self._get_create_kwargs(), dict(kwargs, ports=[80, 443]))
+            host_config = self._get_create_kwargs(include_host_config=True)['host_config']
+            self.assertIs(type(self._get_create_kwargs(include_host_config=True)['host_config']), type(host_config))
+        host_config_type = type(str('HostConfig'), (dict, ), {})
+        self.assertIsInstance(_copy_kwargs(dict(host_config=host_config_type(binds=[])))['host_config'],
+                              host_config_type)
+        self.assertEqual(CountingPolicy.create_calls, 2)
+
+    def test_cache_invalidation(self):
+        self._get_create_kwargs()
+        self._get_create_kwargs()
+        self.assertEqual(CountingPolicy.create_calls, 1)
+        cfg = self.c_map.get_existing('web_server')
+        cfg.user = 'nginx'
+        self.assertEqual(self._get_create_kwargs()['user'], 'nginx')
+        cfg.create_options = dict(mem_limit='1g')
+        self.assertEqual(self._get_create_kwargs()['mem_limit'], '1g')
+        cfg.create_options['mem_limit'] = '2g'
+        self.assertEqual(self._get_create_kwargs()['mem_limit'], '2g')
+        self.c_map.repository = 'other.example.com'
+        self.assertEqual(self._get_create_kwargs()['image'], 'other.example.com/nginx')
+        self.client_config.domainname = 'new.example.com'
+        self.assertEqual(self._get_create_kwargs()['domainname'], 'new.example.com')
+        self.assertEqual(CountingPolicy.create_calls, 6)
+        self._get_create_kwargs()
+        self.assertEqual(CountingPolicy.create_calls, 6)
+
+    def test_lazy_values(self):
+        users = ['user1', 'user2']
+        self.c_map.get_existing('web_server').user = lazy(users.pop)
+        with self.policy.kwargs_cache_scope():
+            self.assertEqual(self._get_create_kwargs()['user'], 'user2')
+            self.assertEqual(self._get_create_kwargs()['user'], 'user2')
+        self.assertEqual(CountingPolicy.create_calls, 1)
+        with self.policy.kwargs_cache_scope():
+            self.assertEqual(self._get_create_kwargs()['user'], 'user1')
+        self.assertEqual(CountingPolicy.create_calls, 2)
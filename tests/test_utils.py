@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from dockermap.map.base import DockerClientWrapper, DockerStatusError
+from dockermap.map.client import MappingDockerClient
+from dockermap.utils import iter_json_stream, write_stream
+
+
+def _split_chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class JsonStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.messages = [{'status': 'Downloading', 'id': 'layer{0}'.format(i), 'progress': '[=> ] {0} MB'.format(i)}
+                         for i in range(50)]
+        self.messages.append({'stream': 'Schritt 2/2 : RUN echo ä\n'})
+        self.data = ''.join(json.dumps(m) + '\r\n' for m in self.messages).encode('utf-8')
+
+    def test_chunk_boundaries(self):
+        for size in (1, 7, 100, len(self.data)):
+            self.assertEqual(list(iter_json_stream(_split_chunks(self.data, size))), self.messages)
+
+    def test_concatenated_objects(self):
+        data = ''.join(json.dumps(m) for m in self.messages)
+        self.assertEqual(list(iter_json_stream([data])), self.messages)
+
+    def test_invalid_lines(self):
+        chunks = [b'{"status": "a"}\r\nnot json\r\n{"sta', b'tus": "b"}\n{"incomplete']
+        self.assertEqual(list(iter_json_stream(chunks)), [{'status': 'a'}, {'status': 'b'}])
+
+    def test_status_stream(self):
+        client = DockerClientWrapper('tcp://127.0.0.1:2375')
+        result = client._docker_status_stream(_split_chunks(self.data, 13), False)
+        self.assertEqual(result, self.messages[-1])
+        error_data = b'{"status": "Pulling"}\r\n{"error": "not found", "errorDetail": {"message": "not found"}}\r\n'
+        chunks = _split_chunks(error_data + self.data, 10)
+        self.assertEqual(client._docker_status_stream(chunks, False)['error'], 'not found')
+        self.assertRaises(DockerStatusError, client._docker_status_stream, chunks, True)
+        self.assertEqual(client._docker_log_stream(_split_chunks(self.data, 5), False), 'Schritt 2/2 : RUN echo ä')
+
+
+class TransferClient(DockerClientWrapper):
+    def __init__(self, data):
+        super(TransferClient, self).__init__('tcp://127.0.0.1:2375')
+        self.data = data
+        self.read_sizes = []
+        self.log_messages = []
+        self.load_error = None
+
+    def _get_raw(self):
+        raw = io.BytesIO(self.data)
+        read = raw.read
+
+        def _read(size=-1):
+            self.read_sizes.append(size)
+            return read(size)
+
+        raw.read = _read
+        return raw
+
+    def get_image(self, image):
+        return self._get_raw()
+
+    def copy(self, container, resource):
+        return self._get_raw()
+
+    def push_log(self, info, level, *args, **kwargs):
+        self.log_messages.append(info % args)
+
+    def load_image(self, data):
+        if self.load_error:
+            self.data = data
+            next(data)
+            raise self.load_error
+        chunks = list(data)
+        self.read_sizes.extend(len(chunk) for chunk in chunks)
+        self.data = b''.join(chunks)
+
+    def images(self, *args, **kwargs):
+        if not self.data:
+            return []
+        return [{'Id': 'image_id', 'RepoTags': ['loaded:latest']}]
+
+
+class TransferTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.local_filename = os.path.join(self.temp_dir, 'image.tar')
+        self.data = os.urandom(3 * 1024 * 1024 + 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _read_file(self):
+        with open(self.local_filename, 'rb') as f:
+            return f.read()
+
+    def test_save_image(self):
+        client = TransferClient(self.data)
+        stats = client.save_image('image', self.local_filename, buffer_size=1024 * 1024, checksum='sha256')
+        self.assertEqual(self._read_file(), self.data)
+        self.assertEqual(stats.size, len(self.data))
+        self.assertEqual(stats.written, len(self.data))
+        self.assertEqual(stats.checksum, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(set(client.read_sizes), {1024 * 1024})
+
+    def test_resume(self):
+        with open(self.local_filename, 'wb') as f:
+            f.write(self.data[:2 * 1024 * 1024 + 10] + b'corrupt')
+        stats = TransferClient(self.data).save_image('image', self.local_filename, resume=True, checksum='md5')
+        self.assertEqual(self._read_file(), self.data)
+        self.assertEqual(stats.written, len(self.data) - 2 * 1024 * 1024 - 10)
+        self.assertEqual(stats.checksum, hashlib.md5(self.data).hexdigest())
+        with open(self.local_filename, 'ab') as f:
+            f.write(b'trailing')
+        self.assertEqual(write_stream(io.BytesIO(self.data), self.local_filename, resume=True), 0)
+        self.assertEqual(self._read_file(), self.data)
+
+    def test_copy_resource_extract(self):
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode='w') as tf:
+            for name, content in (('config/app.conf', b'setting = 1\n'), ('../outside', b'')):
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(content)
+                tf.addfile(tarinfo, io.BytesIO(content))
+        extract_path = os.path.join(self.temp_dir, 'extracted')
+        client = TransferClient(tar_buffer.getvalue())
+        stats = client.copy_resource('container', '/etc/app', extract_path=extract_path)
+        with open(os.path.join(extract_path, 'config', 'app.conf'), 'rb') as f:
+            self.assertEqual(f.read(), b'setting = 1\n')
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'outside')))
+        self.assertEqual(stats.size, len(tar_buffer.getvalue()))
+        self.assertEqual(stats.written, 12)
+        self.assertRaises(ValueError, client.copy_resource, 'container', '/etc/app')
+
+    def test_copy_resource_links(self):
+        outside_dir = os.path.join(self.temp_dir, 'outside')
+        os.mkdir(outside_dir)
+        with open(os.path.join(outside_dir, 'secret'), 'wb') as f:
+            f.write(b'secret')
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode='w') as tf:
+            def _add_link(name, linkname, link_type):
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.type = link_type
+                tarinfo.linkname = linkname
+                tf.addfile(tarinfo)
+
+            def _add_file(name, content):
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(content)
+                tf.addfile(tarinfo, io.BytesIO(content))
+
+            _add_file('app.conf', b'setting = 1\n')
+            _add_link('local', 'app.conf', tarfile.SYMTYPE)
+            _add_link('local_hard', 'app.conf', tarfile.LNKTYPE)
+            _add_link('absolute', outside_dir, tarfile.SYMTYPE)
+            _add_link('relative', '../outside', tarfile.SYMTYPE)
+            _add_link('hard', os.path.join(outside_dir, 'secret'), tarfile.LNKTYPE)
+            _add_link('hard_relative', '../outside/secret', tarfile.LNKTYPE)
+            _add_file('absolute/written', b'escaped')
+            _add_file('relative/written', b'escaped')
+            _add_file(os.path.join(outside_dir, 'written_absolute'), b'escaped')
+        extract_path = os.path.join(self.temp_dir, 'extracted')
+        TransferClient(tar_buffer.getvalue()).copy_resource('container', '/etc/app', extract_path=extract_path)
+        self.assertEqual(os.listdir(outside_dir), ['secret'])
+        with open(os.path.join(outside_dir, 'secret'), 'rb') as f:
+            self.assertEqual(f.read(), b'secret')
+        self.assertTrue(os.path.islink(os.path.join(extract_path, 'local')))
+        with open(os.path.join(extract_path, 'local_hard'), 'rb') as f:
+            self.assertEqual(f.read(), b'setting = 1\n')
+        for name in ('absolute', 'relative', 'hard', 'hard_relative'):
+            self.assertFalse(os.path.islink(os.path.join(extract_path, name)))
+            self.assertFalse(os.path.isfile(os.path.join(extract_path, name)))
+
+    def test_load_image(self):
+        with open(self.local_filename, 'wb') as f:
+            f.write(self.data)
+        client = TransferClient(b'')
+        mapping_client = MappingDockerClient(docker_client=client)
+        images = mapping_client.get_policy().images['__default__']
+        self.assertNotIn('loaded:latest', images)
+        stats = mapping_client.load_image(self.local_filename, buffer_size=1024 * 1024, checksum='sha256')
+        self.assertEqual(client.data, self.data)
+        self.assertEqual(client.read_sizes, [1024 * 1024] * 3 + [100])
+        self.assertEqual(stats.size, len(self.data))
+        self.assertEqual(stats.checksum, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(mapping_client.get_policy().images['__default__']['loaded:latest'], 'image_id')
+        self.assertTrue(client.log_messages[-1].endswith('{0} bytes uploaded.'.format(len(self.data))))
+
+    def test_load_image_error(self):
+        with open(self.local_filename, 'wb') as f:
+            f.write(self.data)
+        client = TransferClient(b'')
+        client.load_error = IOError("Connection reset.")
+        self.assertRaises(IOError, client.load_image_file, self.local_filename)
+        # The file mapping is closed, so that the remaining data cannot be read anymore.
+        self.assertRaises(ValueError, next, client.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,15 @@
 from __future__ import unicode_literals
 
 from collections import namedtuple
+import threading
+import time
 import unittest
 from six import text_type
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.request import urlopen
 
-from dockermap.functional import lazy, register_type, uses_type_registry, LazyOnceObject, resolve_value, resolve_deep
+from dockermap.functional import (lazy, register_type, uses_type_registry, LazyOnceObject, resolve_value, resolve_deep,
+                                  preresolve, ResolutionContext)
 
 LOOKUP_DICT = {
     'a': '/test/path_a',
@@ -113,3 +118,108 @@ class LazyValueResolutionTest(unittest.TestCase):
         self.assertFalse(data['d'][2]['a'].evaluated)
         # Placing functions as dictionary keys may not be a good idea, but should work at least for tuples.
         self.assertDictContainsSubset(dict(test_value_2='e'), data)
+
+    def test_resolution_context(self):
+        calls = []
+
+        def _lookup(key):
+            calls.append(key)
+            return LOOKUP_DICT.get(key)
+
+        a = lazy(_lookup, 'a')
+        ct = CustomType('d', 'd1')
+        with ResolutionContext():
+            self.assertEqual(resolve_value(a), '/test/path_a')
+            self.assertEqual(resolve_deep([a, {'a': a}]), ['/test/path_a', {'a': '/test/path_a'}])
+            with ResolutionContext() as inner:
+                self.assertEqual(resolve_value(a), '/test/path_a')
+                self.assertEqual(resolve_value(ct), 'test_value_1')
+                self.assertEqual(inner.get(ct), (True, 'test_value_1'))
+            self.assertIs(ResolutionContext.current().get(ct)[0], True)
+        self.assertEqual(calls, ['a'])
+        self.assertIsNone(ResolutionContext.current())
+        self.assertEqual(resolve_value(a), '/test/path_a')
+        self.assertEqual(calls, ['a', 'a'])
+
+    def test_resolve_deep_nested(self):
+        nested = []
+        for __ in range(5000):
+            nested = [nested]
+        data = resolve_deep(nested, max_depth=10000)
+        for __ in range(5000):
+            data = data[0]
+        self.assertEqual(data, [])
+
+
+class LookupRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.condition:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.condition.notify_all()
+            # Holds each request until the expected number of requests has been in flight at the same time.
+            deadline = time.time() + server.wait_timeout
+            while server.max_active < server.expected_active and time.time() < deadline:
+                server.condition.wait(deadline - time.time())
+        with server.condition:
+            server.active -= 1
+        body = LOOKUP_DICT.get(self.path[1:], '').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LookupServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 32
+    wait_timeout = 2
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), LookupRequestHandler)
+        self.requests = []
+        self.condition = threading.Condition()
+        self.expected_active = 1
+        self.active = 0
+        self.max_active = 0
+
+
+class ConcurrentResolutionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LookupServer()
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _lookup(self, key):
+        url = 'http://127.0.0.1:{0}/{1}'.format(self.server.server_address[1], key)
+        return urlopen(url).read().decode('utf-8')
+
+    def _failing_lookup(self):
+        raise ValueError("Service unavailable.")
+
+    def test_preresolve(self):
+        values = [lazy_once(self._lookup, 'a'), {'b': lazy_once(self._lookup, 'b')}]
+        values.extend(lazy(self._lookup, 'a') for __ in range(8))
+        failing = lazy(self._failing_lookup)
+        values.append((failing, ))
+        self.server.expected_active = 10
+        with ResolutionContext():
+            self.assertEqual(preresolve(values, workers=10), 10)
+            self.assertEqual(sorted(self.server.requests), ['/a'] * 9 + ['/b'])
+            self.assertEqual(self.server.max_active, 10)
+            self.server.expected_active = 1
+            self.assertEqual(resolve_deep(values[:2]), ['/test/path_a', {'b': '/test/path_b'}])
+            self.assertRaises(ValueError, resolve_value, failing)
+            self.assertEqual(preresolve(values), 0)
+            self.assertEqual(len(self.server.requests), 10)
+        self.assertRaises(ValueError, preresolve, values)
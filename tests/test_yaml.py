@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dockermap.functional import lazy_type
+from dockermap.map import yaml
+from dockermap.map.client import MappingDockerClient
+
+
+MAP_YAML = '''
+name: yaml_map
+host_root: !path $DOCKERMAP_TEST_ROOT/site
+volumes:
+  app_data: /var/lib/app/data
+  app_log: /var/log/app
+  app_config: /etc/app
+host:
+  app_config: !path_lazy $DOCKERMAP_TEST_ROOT/config
+app_server:
+  image: app
+  instances: [instance1, instance2]
+  attaches: app_log
+  binds: {app_config: ro}
+'''
+
+MULTI_MAP_YAML = '''
+name: map1
+app_server:
+  image: app
+---
+name: map2
+worker:
+  image: worker
+---
+- not a map
+'''
+
+MULTI_CLIENT_YAML = '''
+client1:
+  base_url: unix://var/run/docker.sock
+---
+client2:
+  base_url: tcp://10.0.0.12:2375
+  interfaces:
+    private: 10.0.0.12
+'''
+
+
+class YamlLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.map_file = os.path.join(self.temp_dir, 'map.yaml')
+        with open(self.map_file, 'w') as f:
+            f.write(MAP_YAML)
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        os.environ['DOCKERMAP_TEST_ROOT'] = '/var/lib/test'
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        del os.environ['DOCKERMAP_TEST_ROOT']
+
+    def assertMap(self, c_map):
+        self.assertEqual(c_map.name, 'yaml_map')
+        self.assertEqual(c_map.host.root, '/var/lib/test/site')
+        self.assertIsInstance(c_map.host['app_config'], lazy_type)
+        self.assertEqual(c_map.host.get('app_config'), '/var/lib/test/config')
+        self.assertEqual(c_map.get_existing('app_server').instances, ['instance1', 'instance2'])
+
+    def test_load_map(self):
+        with open(self.map_file) as f:
+            self.assertMap(yaml.load_map(f))
+
+    def test_load_map_file_cached(self):
+        self.assertMap(yaml.load_map_file(self.map_file, cache_dir=self.cache_dir))
+        cache_files = os.listdir(self.cache_dir)
+        self.assertEqual(len(cache_files), 1)
+        self.assertMap(yaml.load_map_file(self.map_file, cache_dir=self.cache_dir))
+        self.assertEqual(os.listdir(self.cache_dir), cache_files)
+        os.environ['DOCKERMAP_TEST_ROOT'] = '/srv'
+        c_map = yaml.load_map_file(self.map_file, cache_dir=self.cache_dir)
+        self.assertEqual(c_map.host.root, '/srv/site')
+        self.assertEqual(c_map.host.get('app_config'), '/srv/config')
+        self.assertEqual(os.listdir(self.cache_dir), cache_files)
+        self.assertEqual(yaml.load_map_file(self.map_file, name='renamed', cache_dir=self.cache_dir).name, 'renamed')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def _write_service_files(self):
+        service_dir = os.path.join(self.temp_dir, 'services')
+        os.mkdir(service_dir)
+        with open(os.path.join(service_dir, '10_base.yaml'), 'w') as f:
+            f.write("name: services\nvolumes: !include ../volumes/*.yml\n"
+                    "worker:\n  image: worker\n  instances: [w1]\n")
+        with open(os.path.join(service_dir, '20_worker.yaml'), 'w') as f:
+            f.write("worker:\n  instances: [w2]\n  attaches: worker_log\n")
+        with open(os.path.join(service_dir, 'ignored.txt'), 'w') as f:
+            f.write("not a map")
+        volume_dir = os.path.join(self.temp_dir, 'volumes')
+        os.mkdir(volume_dir)
+        with open(os.path.join(volume_dir, 'logs.yml'), 'w') as f:
+            f.write("worker_log: /var/log/worker\n")
+        return service_dir
+
+    def test_include(self):
+        with open(self.map_file, 'a') as f:
+            f.write("worker: !include containers/worker.yml\n")
+        with open(self.map_file) as f:
+            self.assertRaises(IOError, yaml.load_map, f)
+        include_dir = os.path.join(self.temp_dir, 'containers')
+        os.mkdir(include_dir)
+        include_file = os.path.join(include_dir, 'worker.yml')
+        with open(include_file, 'w') as f:
+            f.write("attaches: worker_log\n")
+        c_map = yaml.load_map_file(self.map_file, check_integrity=False, cache_dir=self.cache_dir)
+        self.assertEqual(c_map.get_existing('worker').attaches, ['worker_log'])
+        with open(include_file, 'a') as f:
+            f.write("user: worker_user\n")
+        c_map = yaml.load_map_file(self.map_file, check_integrity=False, cache_dir=self.cache_dir)
+        self.assertEqual(c_map.get_existing('worker').user, 'worker_user')
+        with open(self.map_file, 'a') as f:
+            f.write("volumes: !include volumes/*.yml\n")
+        os.mkdir(os.path.join(self.temp_dir, 'volumes'))
+        with open(os.path.join(self.temp_dir, 'volumes', 'a.yml'), 'w') as f:
+            f.write("worker_log: /var/log/worker\n")
+        c_map = yaml.load_map_file(self.map_file, check_integrity=False, cache_dir=self.cache_dir)
+        self.assertNotIn('worker_data', c_map.volumes)
+        with open(os.path.join(self.temp_dir, 'volumes', 'b.yml'), 'w') as f:
+            f.write("worker_data: /var/lib/worker\n")
+        c_map = yaml.load_map_file(self.map_file, check_integrity=False, cache_dir=self.cache_dir)
+        self.assertEqual(c_map.volumes.worker_data, '/var/lib/worker')
+
+    def test_circular_include(self):
+        include_file = os.path.join(self.temp_dir, 'worker.yml')
+        with open(include_file, 'w') as f:
+            f.write("attaches: worker_log\nnested: !include worker.yml\n")
+        with open(self.map_file, 'a') as f:
+            f.write("worker: !include worker.yml\n")
+        self.assertRaises(ValueError, yaml.load_map_file, self.map_file, check_integrity=False)
+        self.assertRaises(ValueError, yaml.load_map_file, self.map_file, check_integrity=False,
+                          cache_dir=self.cache_dir)
+        with open(include_file, 'w') as f:
+            f.write("attaches: worker_log\nnested: !include map.yaml\n")
+        with open(self.map_file) as f:
+            self.assertRaises(ValueError, yaml.load_map, f, check_integrity=False)
+        with open(include_file, 'w') as f:
+            f.write("attaches: !include logs/*.yml\n")
+        os.mkdir(os.path.join(self.temp_dir, 'logs'))
+        for name in ('a.yml', 'b.yml'):
+            with open(os.path.join(self.temp_dir, 'logs', name), 'w') as f:
+                f.write("[worker_log]\n")
+        c_map = yaml.load_map_file(self.map_file, check_integrity=False)
+        self.assertEqual(c_map.get_existing('worker').attaches, ['worker_log', 'worker_log'])
+
+    def test_load_map_files(self):
+        service_dir = self._write_service_files()
+        for processes in (1, 2):
+            c_map = yaml.load_map_files(service_dir, processes=processes)
+            self.assertEqual(c_map.name, 'services')
+            worker = c_map.get_existing('worker')
+            self.assertEqual(worker.image, 'worker')
+            self.assertEqual(worker.instances, ['w1', 'w2'])
+            self.assertEqual(worker.attaches, ['worker_log'])
+            self.assertEqual(c_map.volumes.worker_log, '/var/log/worker')
+        c_map = yaml.load_map_files([os.path.join(service_dir, '2*.yaml')], name='partial', check_integrity=False)
+        self.assertEqual(c_map.name, 'partial')
+        self.assertEqual(c_map.get_existing('worker').instances, ['w2'])
+
+    def test_iter_maps(self):
+        map_iter = yaml.iter_maps(MULTI_MAP_YAML)
+        self.assertEqual(next(map_iter).name, 'map1')
+        map2 = next(map_iter)
+        self.assertEqual(map2.name, 'map2')
+        self.assertEqual(map2.get_existing('worker').image, 'worker')
+        self.assertRaises(ValueError, next, map_iter)
+
+    def test_iter_clients(self):
+        maps = yaml.iter_maps(MULTI_MAP_YAML.rpartition('---')[0])
+        clients = yaml.iter_clients(MULTI_CLIENT_YAML)
+        mapping_client = MappingDockerClient(maps, clients=clients)
+        self.assertEqual(set(mapping_client.maps), {'map1', 'map2'})
+        self.assertEqual(set(mapping_client.clients), {'client1', 'client2'})
+        self.assertEqual(mapping_client.clients['client2'].interfaces.private, '10.0.0.12')
+
+
+if __name__ == '__main__':
+    unittest.main()